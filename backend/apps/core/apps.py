@@ -0,0 +1,20 @@
+from django.apps import AppConfig
+
+
+class CoreConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.core'
+    label = 'core'
+
+    def ready(self):
+        from django.core.signals import request_finished
+        from django.db.backends.signals import connection_created
+        from django.utils.module_loading import autodiscover_modules
+        from . import checks  # noqa: F401
+        from .slow_queries import flush_slow_queries, install_slow_query_wrapper
+        from .sqlite import configure_sqlite
+        connection_created.connect(configure_sqlite, dispatch_uid='core.configure_sqlite')
+        connection_created.connect(install_slow_query_wrapper, dispatch_uid='core.slow_query_wrapper')
+        request_finished.connect(flush_slow_queries, dispatch_uid='core.flush_slow_queries')
+        # Register the @task functions of every app
+        autodiscover_modules('tasks')
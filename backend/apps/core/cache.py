@@ -0,0 +1,281 @@
+"""
+Two-tier cache: a process-local LRU (L1) in front of a shared cache (L2).
+
+CACHES['default'] is a TieredCache, so every ``cache.get``/``cache.set`` in
+the project goes through it. Reads are answered from L1 while its copy is
+younger than L1_TIMEOUT seconds, otherwise from the L2 cache named by the
+SHARED option (Redis, file-based or database-backed, see CACHE_URL) and
+copied into L1. Writes and deletes go to both tiers.
+
+Other processes keep their L1 copy of a key changed elsewhere for up to
+L1_TIMEOUT seconds, so keep it short. Keys of data invalidated as a group
+belong in a namespace (see namespaced_key): bumping the namespace version
+retires all of its keys with one write, within the same bound.
+
+cached() adds negative caching, so lookups that found nothing are not
+repeated on every call, and cache_stats() reports this process's L1 hit
+rate.
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+_MISSING = object()
+
+
+class NegativeResult:
+    """Stored in place of a value that was looked up and not found"""
+
+    def __reduce__(self):
+        return 'NEGATIVE'
+
+
+NEGATIVE = NegativeResult()
+
+
+class LocalLRU:
+    """Process-wide LRU of pickled values with per-entry expiry"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = self.misses = 0
+        self.shared_hits = self.shared_misses = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return _MISSING
+            self.entries.move_to_end(key)
+            self.hits += 1
+        # Unpickled per read, so callers can never mutate the cached copy
+        return pickle.loads(entry[1])
+
+    def set(self, key, value, ttl):
+        if ttl <= 0:
+            self.delete(key)
+            return
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self.entries[key] = (time.monotonic() + ttl, pickled)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def count_shared(self, hits, misses):
+        with self.lock:
+            self.shared_hits += hits
+            self.shared_misses += misses
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'shared_hits': self.shared_hits,
+                'shared_misses': self.shared_misses,
+            }
+
+    def reset_stats(self):
+        with self.lock:
+            self.hits = self.misses = self.shared_hits = self.shared_misses = 0
+
+
+# One L1 per configured cache, shared by all threads of the process like LocMemCache's store
+_local_stores = {}
+_local_stores_lock = threading.Lock()
+
+
+class TieredCache(BaseCache):
+    """Cache backend with a per-process LRU in front of another configured cache.
+
+    OPTIONS: SHARED (alias of the L2 cache), L1_MAX_ENTRIES (default 1000)
+    and L1_TIMEOUT (seconds an L1 copy is trusted, default 5).
+    """
+
+    def __init__(self, name, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.shared_alias = options.get('SHARED', 'shared')
+        self.l1_timeout = options.get('L1_TIMEOUT', 5)
+        with _local_stores_lock:
+            self.local = _local_stores.setdefault(name or 'default', LocalLRU(options.get('L1_MAX_ENTRIES', 1000)))
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    def _version(self, version):
+        return self.version if version is None else version
+
+    def _timeout(self, timeout):
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+
+    def _local_ttl(self, timeout):
+        """Seconds an L1 copy may be served for an entry with this timeout"""
+        timeout = self._timeout(timeout)
+        return self.l1_timeout if timeout is None else min(timeout, self.l1_timeout)
+
+    def get(self, key, default=None, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        value = self.local.get(local_key)
+        if value is not _MISSING:
+            return value
+        value = self.shared.get(key, _MISSING, version=self._version(version))
+        if value is _MISSING:
+            self.local.count_shared(0, 1)
+            return default
+        self.local.count_shared(1, 0)
+        self.local.set(local_key, value, self.l1_timeout)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        self.shared.set(key, value, self._timeout(timeout), version=self._version(version))
+        self.local.set(local_key, value, self._local_ttl(timeout))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        added = self.shared.add(key, value, self._timeout(timeout), version=self._version(version))
+        if added:
+            self.local.set(local_key, value, self._local_ttl(timeout))
+        else:
+            # Another process's value wins; do not serve a stale local copy
+            self.local.delete(local_key)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self.local.delete(self.make_and_validate_key(key, version=version))
+        return self.shared.touch(key, self._timeout(timeout), version=self._version(version))
+
+    def delete(self, key, version=None):
+        self.local.delete(self.make_and_validate_key(key, version=version))
+        return self.shared.delete(key, version=self._version(version))
+
+    def has_key(self, key, version=None):
+        if self.local.get(self.make_and_validate_key(key, version=version)) is not _MISSING:
+            return True
+        return self.shared.has_key(key, version=self._version(version))
+
+    def incr(self, key, delta=1, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        try:
+            value = self.shared.incr(key, delta, version=self._version(version))
+        except ValueError:
+            self.local.delete(local_key)
+            raise
+        self.local.set(local_key, value, self.l1_timeout)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        missing = []
+        for key in keys:
+            value = self.local.get(self.make_and_validate_key(key, version=version))
+            if value is _MISSING:
+                missing.append(key)
+            else:
+                found[key] = value
+        if missing:
+            shared = self.shared.get_many(missing, version=self._version(version))
+            self.local.count_shared(len(shared), len(missing) - len(shared))
+            for key, value in shared.items():
+                self.local.set(self.make_and_validate_key(key, version=version), value, self.l1_timeout)
+            found.update(shared)
+        return found
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, self._timeout(timeout), version=self._version(version))
+        for key, value in data.items():
+            local_key = self.make_and_validate_key(key, version=version)
+            if key in failed:
+                self.local.delete(local_key)
+            else:
+                self.local.set(local_key, value, self._local_ttl(timeout))
+        return failed
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        for key in keys:
+            self.local.delete(self.make_and_validate_key(key, version=version))
+        self.shared.delete_many(keys, version=self._version(version))
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+
+    def clear_local(self):
+        """Drop this process's L1 copies only"""
+        self.local.clear()
+
+    def stats(self):
+        return {'l1_timeout': self.l1_timeout, 'shared': self.shared_alias, **self.local.stats()}
+
+
+def namespace_version(namespace, cache=None):
+    """Current version of a namespace's keys"""
+    cache = cache or caches['default']
+    return cache.get_or_set(f'{namespace}:version', 1, None)
+
+
+def bump_namespace(namespace, cache=None):
+    """Retire every key of a namespace at once"""
+    cache = cache or caches['default']
+    try:
+        cache.incr(f'{namespace}:version')
+    except ValueError:
+        cache.set(f'{namespace}:version', 2, None)
+
+
+def namespaced_key(namespace, key, cache=None):
+    """Key under the namespace's current version"""
+    return f'{namespace}:{namespace_version(namespace, cache)}:{key}'
+
+
+def cached(key, build, timeout=DEFAULT_TIMEOUT, *, namespace=None, negative_timeout=None, cache=None):
+    """Cached result of build(), computing and storing it on a miss.
+
+    A None result is cached for negative_timeout seconds (not at all when
+    negative_timeout is None), so repeated lookups of something that does
+    not exist stay cheap too.
+    """
+    cache = cache or caches['default']
+    if namespace is not None:
+        key = namespaced_key(namespace, key, cache)
+    value = cache.get(key, _MISSING)
+    if value is NEGATIVE:
+        return None
+    if value is not _MISSING:
+        return value
+    value = build()
+    if value is not None:
+        cache.set(key, value, timeout)
+    elif negative_timeout:
+        cache.set(key, NEGATIVE, negative_timeout)
+    return value
+
+
+def cache_stats(cache=None):
+    """L1 hit rate and counters of this process, or None for a plain cache"""
+    cache = cache or caches['default']
+    return cache.stats() if isinstance(cache, TieredCache) else None
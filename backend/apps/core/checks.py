@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+from django.utils.module_loading import import_string
+
+# Middleware the silenced admin.E408-E410 and security.W002/W003 checks look for
+REQUIRED_MIDDLEWARE = (
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+)
+
+
+@register(Tags.security, Tags.admin)
+def check_admin_middleware(app_configs, **kwargs):
+    """The admin's middleware must run, directly or through PathMiddlewareDispatcher"""
+    dispatched = 'apps.core.middleware.PathMiddlewareDispatcher' in settings.MIDDLEWARE
+    installed = [
+        import_string(path) for path in
+        list(settings.MIDDLEWARE) + (list(settings.ADMIN_MIDDLEWARE) if dispatched else [])
+    ]
+    return [
+        Error(
+            f"'{path}' must be in MIDDLEWARE or ADMIN_MIDDLEWARE.",
+            hint='ADMIN_MIDDLEWARE only takes effect with PathMiddlewareDispatcher in MIDDLEWARE.',
+            id='core.E001',
+        )
+        for path in REQUIRED_MIDDLEWARE
+        if not any(issubclass(middleware, import_string(path)) for middleware in installed)
+    ]
+
+
+@register(Tags.database)
+def check_sqlite_profile(app_configs, **kwargs):
+    """SQLITE_PROFILE must name a known profile"""
+    from .sqlite import PROFILES
+    if settings.SQLITE_PROFILE in PROFILES:
+        return []
+    return [Error(
+        f'Unknown SQLITE_PROFILE {settings.SQLITE_PROFILE!r}.',
+        hint=f"Use one of: {', '.join(PROFILES)}.",
+        id='core.E002',
+    )]
+
+
+@register()
+def check_task_heartbeat(app_configs, **kwargs):
+    """Running jobs must refresh their lock several times per TASK_LOCK_TIMEOUT"""
+    if 0 < settings.TASK_HEARTBEAT_INTERVAL * 3 <= settings.TASK_LOCK_TIMEOUT:
+        return []
+    return [Error(
+        'TASK_HEARTBEAT_INTERVAL must be positive and at most a third of TASK_LOCK_TIMEOUT.',
+        hint='Otherwise jobs still running are requeued and run twice.',
+        id='core.E003',
+    )]
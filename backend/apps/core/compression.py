@@ -0,0 +1,80 @@
+"""
+Content-negotiated response compression (Brotli when available, else gzip).
+"""
+import gzip
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from rest_framework.settings import api_settings
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; gzip is always available
+    brotli = None
+
+
+def available_encodings():
+    """Encodings this server can produce, in order of preference"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def parse_accept_encoding(header):
+    """Map each encoding in an Accept-Encoding header to its q-value"""
+    accepted = {}
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    return accepted
+
+
+def choose_encoding(header, offered=None):
+    """Pick the best encoding the client accepts, or None for identity"""
+    accepted = parse_accept_encoding(header or '')
+    if offered is None:
+        offered = available_encodings()
+    for encoding in offered:
+        quality = accepted.get(encoding, accepted.get('*', 0.0))
+        if quality > 0:
+            return encoding
+    return None
+
+
+def compress(data, encoding):
+    """Compress bytes with the given content coding"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=settings.COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+def precompressed_json_response(request, key, timeout, build_data, refresh=False):
+    """Serve JSON from a cache that holds the body already encoded and compressed.
+
+    A cache hit skips both rendering and compression: the stored variant
+    matching the client's Accept-Encoding is written out as-is.
+    """
+    variants = None if refresh else cache.get(key)
+    if variants is None:
+        body = api_settings.DEFAULT_RENDERER_CLASSES[0]().render(build_data())
+        variants = {'identity': body}
+        if len(body) >= settings.COMPRESSION_MIN_SIZE:
+            for encoding in available_encodings():
+                variants[encoding] = compress(body, encoding)
+        cache.set(key, variants, timeout)
+
+    offered = [encoding for encoding in available_encodings() if encoding in variants]
+    encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING'), offered)
+    response = HttpResponse(variants[encoding or 'identity'], content_type='application/json')
+    if encoding:
+        response['Content-Encoding'] = encoding
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
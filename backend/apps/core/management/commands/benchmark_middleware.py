@@ -0,0 +1,101 @@
+"""
+Management command to measure the per-request cost of the middleware chains
+Usage: python manage.py benchmark_middleware --requests 20000 --repeat 5
+
+Sends GET requests through Django's request handler to a no-op view under
+/api/ (lean chain) and /admin/ (full chain), and once more with no
+middleware at all; the difference to that baseline is the middleware's
+own overhead per request.
+"""
+import json
+import statistics
+import time
+from django.conf import settings
+from django.core.handlers.base import BaseHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.urls import path
+
+
+def noop(request):
+    return HttpResponse(b'ok', content_type='text/plain')
+
+
+urlpatterns = [
+    path('api/benchmark/', noop),
+    path('admin/benchmark/', noop),
+]
+
+
+def load_handler(middleware=None):
+    """Request handler with the configured (or the given) middleware"""
+    handler = BaseHandler()
+    if middleware is None:
+        handler.load_middleware()
+    else:
+        with override_settings(MIDDLEWARE=middleware):
+            handler.load_middleware()
+    return handler
+
+
+def time_requests(handler, url, requests, repeat):
+    """Median microseconds per request over `repeat` runs of `requests` GETs"""
+    factory = RequestFactory()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(requests):
+            response = handler.get_response(factory.get(url))
+        timings.append((time.perf_counter() - start) * 1e6 / requests)
+        if response.status_code != 200:
+            raise CommandError(f'{url} answered {response.status_code}')
+    return statistics.median(timings)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the per-request overhead of the lean /api/ and full /admin/ middleware chains'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20000, help='Requests per run')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per chain (median is reported)')
+        parser.add_argument('--json', dest='json_path', help="Also write the results as JSON to this file ('-' for stdout)")
+
+    def handle(self, *args, **options):
+        for name in ('requests', 'repeat'):
+            if options[name] < 1:
+                raise CommandError(f'--{name} must be at least 1')
+        requests, repeat = options['requests'], options['repeat']
+
+        with override_settings(ROOT_URLCONF=__name__, ALLOWED_HOSTS=['testserver'], PROFILING_SAMPLE_RATE=0):
+            baseline = time_requests(load_handler([]), '/api/benchmark/', requests, repeat)
+            configured = load_handler()
+            lean = time_requests(configured, '/api/benchmark/', requests, repeat)
+            full = time_requests(configured, '/admin/benchmark/', requests, repeat)
+
+        results = {
+            'requests': requests,
+            'repeat': repeat,
+            'baseline_us': round(baseline, 2),
+            'api_us': round(lean, 2),
+            'admin_us': round(full, 2),
+            'api_overhead_us': round(lean - baseline, 2),
+            'admin_overhead_us': round(full - baseline, 2),
+            'lean_prefixes': list(settings.LEAN_MIDDLEWARE_PREFIXES),
+            'skipped_middleware': list(settings.ADMIN_MIDDLEWARE),
+        }
+
+        self.stdout.write(f"{'chain':<28}  {'us/request':>10}  {'overhead':>10}")
+        self.stdout.write(f"{'no middleware':<28}  {results['baseline_us']:>10.1f}  {'':>10}")
+        self.stdout.write(f"{'/api/ (lean)':<28}  {results['api_us']:>10.1f}  {results['api_overhead_us']:>10.1f}")
+        self.stdout.write(f"{'/admin/ (full)':<28}  {results['admin_us']:>10.1f}  {results['admin_overhead_us']:>10.1f}")
+        saved = results['admin_overhead_us'] - results['api_overhead_us']
+        self.stdout.write(self.style.SUCCESS(f'/api/ requests skip {saved:.1f} us of middleware each'))
+
+        if options['json_path']:
+            report = json.dumps(results, indent=2)
+            if options['json_path'] == '-':
+                self.stdout.write(report)
+            else:
+                with open(options['json_path'], 'w') as f:
+                    f.write(report + '\n')
@@ -0,0 +1,51 @@
+"""
+Management command to run background tasks from the database queue
+Usage: python manage.py runworker --concurrency 4 --pool threads --queues default,media
+
+Stops after the running jobs finish on SIGINT or SIGTERM. With --burst it
+exits as soon as no job is ready, e.g. for a cron-driven worker.
+"""
+import signal
+from django.core.management.base import BaseCommand, CommandError
+from apps.core.taskqueue import Worker
+
+
+class Command(BaseCommand):
+    help = 'Run queued background tasks with a pool of threads or processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=2, help='Jobs run at once')
+        parser.add_argument('--pool', choices=('threads', 'processes'), default='threads', help='Run jobs in threads or forked processes')
+        parser.add_argument('--queues', default='', help='Comma-separated queues to take jobs from (default: all)')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to wait when no job is ready')
+        parser.add_argument('--burst', action='store_true', help='Exit once no job is ready')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1:
+            raise CommandError('--concurrency must be at least 1')
+        if options['poll_interval'] <= 0:
+            raise CommandError('--poll-interval must be positive')
+        queues = [queue.strip() for queue in options['queues'].split(',') if queue.strip()]
+
+        worker = Worker(
+            concurrency=options['concurrency'],
+            pool=options['pool'],
+            queues=queues or None,
+            poll_interval=options['poll_interval'],
+            burst=options['burst'],
+        )
+
+        def shutdown(signum, frame):
+            worker.stop.set()
+
+        previous = {sig: signal.signal(sig, shutdown) for sig in (signal.SIGINT, signal.SIGTERM)}
+        self.stdout.write(
+            f"Worker {worker.name} running {options['concurrency']} {options['pool']} "
+            f"on {', '.join(queues) or 'all queues'}"
+        )
+        try:
+            worker.run()
+        finally:
+            for sig, handler in previous.items():
+                signal.signal(sig, handler)
+        self.stdout.write(self.style.SUCCESS('Worker stopped'))
@@ -0,0 +1,60 @@
+"""
+Management command to list the slowest recorded statements
+Usage: python manage.py slow_queries --limit 10 --order total --plans
+
+Statements are recorded while SLOW_QUERY_THRESHOLD_MS is set and grouped
+by normalized fingerprint, so the same query with different parameters is
+reported once.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F
+from apps.core.models import SlowQuery
+
+ORDERINGS = {
+    'total': '-total_ms',
+    'calls': '-calls',
+    'max': '-max_ms',
+    'mean': F('total_ms') / F('calls'),
+}
+
+
+class Command(BaseCommand):
+    help = 'Show the slow queries with the highest total time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=10, help='Number of fingerprints to show')
+        parser.add_argument('--order', choices=ORDERINGS, default='total', help='Rank by total, calls, max or mean time')
+        parser.add_argument('--plans', action='store_true', help='Print the full SQL, parameters and EXPLAIN plan')
+        parser.add_argument('--reset', action='store_true', help='Delete all recorded slow queries')
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            deleted, _ = SlowQuery.objects.all().delete()
+            self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} slow query record(s)'))
+            return
+        if options['limit'] < 1:
+            raise CommandError('--limit must be at least 1')
+
+        ordering = ORDERINGS[options['order']]
+        if not isinstance(ordering, str):
+            ordering = ordering.desc()
+        offenders = SlowQuery.objects.order_by(ordering, 'fingerprint')[:options['limit']]
+        if not offenders:
+            self.stdout.write('No slow queries recorded')
+            return
+
+        self.stdout.write(f"{'total_ms':>10}  {'calls':>6}  {'mean_ms':>8}  {'max_ms':>8}  {'view':<28}  sql")
+        for query in offenders:
+            sql = ' '.join(query.sql.split())
+            self.stdout.write(
+                f'{query.total_ms:>10.1f}  {query.calls:>6}  {query.mean_ms:>8.1f}  {query.max_ms:>8.1f}  '
+                f'{(query.view or "-")[:28]:<28}  {sql[:100]}'
+            )
+            if options['plans']:
+                self.stdout.write(f'  fingerprint: {query.fingerprint}')
+                self.stdout.write(f'  database:    {query.alias} ({query.vendor})')
+                self.stdout.write(f'  source:      {query.source or "-"}')
+                self.stdout.write(f'  sql:         {sql}')
+                self.stdout.write(f'  params:      {"-" if query.params is None else query.params}')
+                plan = query.plan or '(no plan captured)'
+                self.stdout.write('  plan:\n' + '\n'.join(f'    {line}' for line in plan.splitlines()) + '\n')
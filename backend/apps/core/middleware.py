@@ -0,0 +1,200 @@
+import random
+import threading
+import time
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.handlers.exception import convert_exception_to_response
+from django.utils.cache import patch_vary_headers
+from django.utils.encoding import escape_uri_path
+from django.utils.module_loading import import_string
+from rest_framework.exceptions import AuthenticationFailed
+from apps.users.authentication import VersionedJWTAuthentication
+from .compression import choose_encoding, compress
+from .models import RequestProfile
+from .profiling import SQLTimeline, StackSampler
+
+
+class PathMiddlewareDispatcher:
+    """Run ADMIN_MIDDLEWARE for every path except LEAN_MIDDLEWARE_PREFIXES.
+
+    Sessions, CSRF, messages, session authentication and X-Frame-Options
+    serve the admin and other browser pages only. JWT API requests skip
+    them after a single prefix check instead of passing through each one.
+    The wrapped middleware's view, template response and exception hooks
+    are forwarded like Django's handler does, on the full chain only.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.view_hooks = []
+        self.template_response_hooks = []
+        self.exception_hooks = []
+        handler = get_response
+        for middleware_path in reversed(settings.ADMIN_MIDDLEWARE):
+            try:
+                instance = import_string(middleware_path)(handler)
+            except MiddlewareNotUsed:
+                continue
+            if hasattr(instance, 'process_view'):
+                self.view_hooks.insert(0, instance.process_view)
+            if hasattr(instance, 'process_template_response'):
+                self.template_response_hooks.append(instance.process_template_response)
+            if hasattr(instance, 'process_exception'):
+                self.exception_hooks.append(instance.process_exception)
+            handler = convert_exception_to_response(instance)
+        self.full_chain = handler
+
+    def __call__(self, request):
+        if self.is_lean(request):
+            return self.get_response(request)
+        return self.full_chain(request)
+
+    def is_lean(self, request):
+        return request.path_info.startswith(settings.LEAN_MIDDLEWARE_PREFIXES)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if self.is_lean(request):
+            return None
+        for hook in self.view_hooks:
+            response = hook(request, view_func, view_args, view_kwargs)
+            if response is not None:
+                return response
+        return None
+
+    def process_template_response(self, request, response):
+        if self.is_lean(request):
+            return response
+        for hook in self.template_response_hooks:
+            response = hook(request, response)
+        return response
+
+    def process_exception(self, request, exception):
+        if self.is_lean(request):
+            return None
+        for hook in self.exception_hooks:
+            response = hook(request, exception)
+            if response is not None:
+                return response
+        return None
+
+
+class CompressionMiddleware:
+    """Compress API responses with the best encoding the client accepts"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        if not self.should_compress(request, response):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING'))
+        if encoding is None:
+            return response
+
+        compressed = compress(response.content, encoding)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        # The body changed, so a strong ETag no longer applies
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
+
+    def should_compress(self, request, response):
+        """Only compress large, uncompressed JSON responses under API paths"""
+        if not request.path.startswith(settings.COMPRESSION_PATH_PREFIXES):
+            return False
+        if response.streaming or response.has_header('Content-Encoding'):
+            return False
+        if not response.get('Content-Type', '').startswith(settings.COMPRESSION_CONTENT_TYPES):
+            return False
+        return len(response.content) >= settings.COMPRESSION_MIN_SIZE
+
+
+# Query parameters that carry credentials, e.g. the metrics stream's ?ticket=
+REDACTED_QUERY_PARAMS = ('ticket', 'token')
+
+
+def recorded_path(request):
+    """Path and query string of a request without its credential parameters"""
+    query = request.GET.copy()
+    for name in REDACTED_QUERY_PARAMS:
+        query.pop(name, None)
+    path = escape_uri_path(request.path)
+    return f'{path}?{query.urlencode()}' if query else path
+
+
+class ProfilingMiddleware:
+    """Profile requests an admin asks for via header, plus a random sample"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        trigger = self.profile_trigger(request)
+        if trigger is None:
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        sampler = StackSampler(threading.get_ident(), settings.PROFILING_INTERVAL)
+        sampler.start()
+        try:
+            with SQLTimeline(started) as timeline:
+                response = self.get_response(request)
+        finally:
+            sampler.stop()
+        duration_ms = (time.perf_counter() - started) * 1000
+
+        # DRF copies the authenticated user back onto the Django request
+        user = getattr(request, 'user', None)
+        profile = RequestProfile.objects.create(
+            method=request.method,
+            path=recorded_path(request)[:500],
+            status_code=response.status_code,
+            duration_ms=round(duration_ms, 3),
+            trigger=trigger,
+            user_id=user.pk if user is not None and user.is_authenticated else None,
+            sample_count=sampler.sample_count,
+            query_count=len(timeline.queries),
+            sql_ms=timeline.total_ms,
+            folded_stacks=sampler.folded(),
+            sql_timeline=timeline.queries,
+        )
+        self.prune()
+        response['X-Profile-Id'] = str(profile.pk)
+        return response
+
+    def profile_trigger(self, request):
+        """Why this request should be profiled, or None"""
+        if not settings.PROFILING_ENABLED or not request.path.startswith(settings.PROFILING_PATH_PREFIXES):
+            return None
+        if request.META.get(settings.PROFILING_HEADER) and self.is_admin(request):
+            return RequestProfile.Trigger.HEADER
+        if settings.PROFILING_SAMPLE_RATE and random.random() < settings.PROFILING_SAMPLE_RATE:
+            return RequestProfile.Trigger.SAMPLE
+        return None
+
+    def is_admin(self, request):
+        """Whether the session or bearer token belongs to an admin"""
+        user = getattr(request, 'user', None)
+        if user is None or not user.is_authenticated:
+            try:
+                user, _ = VersionedJWTAuthentication().authenticate(request) or (None, None)
+            except AuthenticationFailed:
+                return False
+        return bool(user is not None and getattr(user, 'is_admin', False))
+
+    def prune(self):
+        """Keep only the most recent PROFILING_MAX_PROFILES profiles"""
+        keep = settings.PROFILING_MAX_PROFILES
+        oldest_kept = list(RequestProfile.objects.order_by('-id').values_list('id', flat=True)[keep - 1:keep])
+        if oldest_kept:
+            RequestProfile.objects.filter(id__lt=oldest_kept[0]).delete()
@@ -0,0 +1,25 @@
+from urllib.parse import parse_qsl, urlencode
+from django.db import migrations
+
+
+def redact_profile_tokens(apps, schema_editor):
+    """Drop ?token= access tokens from the paths of stored request profiles"""
+    RequestProfile = apps.get_model('core', 'RequestProfile')
+    db_alias = schema_editor.connection.alias
+    profiles = RequestProfile.objects.using(db_alias).filter(path__contains='token=').only('pk', 'path')
+    for profile in profiles.iterator():
+        path, _, query = profile.path.partition('?')
+        kept = [(name, value) for name, value in parse_qsl(query, keep_blank_values=True) if name != 'token']
+        profile.path = f'{path}?{urlencode(kept)}' if kept else path
+        profile.save(update_fields=['path'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_task'),
+    ]
+
+    operations = [
+        migrations.RunPython(redact_profile_tokens, migrations.RunPython.noop),
+    ]
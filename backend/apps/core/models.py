@@ -0,0 +1,103 @@
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+
+class RequestProfile(models.Model):
+    """Sampled stacks and SQL timeline captured for one profiled request"""
+
+    class Trigger(models.TextChoices):
+        HEADER = 'HEADER', 'Requested by header'
+        SAMPLE = 'SAMPLE', 'Random sample'
+
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    trigger = models.CharField(max_length=10, choices=Trigger.choices)
+    # Plain id rather than a foreign key: users may live on another shard
+    user_id = models.BigIntegerField(null=True, blank=True)
+    sample_count = models.PositiveIntegerField(default=0)
+    query_count = models.PositiveIntegerField(default=0)
+    sql_ms = models.FloatField(default=0)
+    folded_stacks = models.TextField(blank=True)
+    sql_timeline = models.JSONField(default=list, blank=True)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+
+    def __str__(self):
+        return f'{self.method} {self.path} ({self.duration_ms:.0f} ms)'
+
+
+class SlowQuery(models.Model):
+    """Aggregated executions of one slow statement, keyed by normalized fingerprint"""
+
+    fingerprint = models.CharField(max_length=40, unique=True)
+    # Latest example of the statement and its parameters
+    sql = models.TextField()
+    params = models.JSONField(null=True, blank=True)
+    alias = models.CharField(max_length=100)
+    vendor = models.CharField(max_length=20)
+    view = models.CharField(max_length=200, blank=True)
+    source = models.CharField(max_length=255, blank=True)
+    calls = models.PositiveIntegerField(default=0)
+    total_ms = models.FloatField(default=0)
+    max_ms = models.FloatField(default=0)
+    # EXPLAIN output for the slowest execution recorded
+    plan = models.TextField(blank=True)
+    first_seen = models.DateTimeField(auto_now_add=True)
+    last_seen = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-total_ms']
+        verbose_name_plural = 'Slow queries'
+
+    def __str__(self):
+        return f'{self.fingerprint[:12]} ({self.calls} calls, {self.total_ms:.0f} ms)'
+
+    @property
+    def mean_ms(self):
+        return self.total_ms / self.calls if self.calls else 0
+
+
+class Task(models.Model):
+    """One queued call of a registered background task (see apps.core.taskqueue)"""
+
+    class Status(models.TextChoices):
+        QUEUED = 'QUEUED', 'Queued'
+        RUNNING = 'RUNNING', 'Running'
+        SUCCEEDED = 'SUCCEEDED', 'Succeeded'
+        FAILED = 'FAILED', 'Failed'
+
+    name = models.CharField(max_length=200)
+    queue = models.CharField(max_length=50, default='default')
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.QUEUED)
+    # Not claimed before this time; pushed back by retry backoff
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            # Claim order over ready jobs only, so finished rows do not bloat it
+            models.Index(
+                fields=['queue', '-priority', 'run_at', 'id'],
+                condition=Q(status='QUEUED'),
+                name='core_task_ready_idx',
+            ),
+            models.Index(fields=['status', 'locked_at'], name='core_task_status_locked_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk} ({self.status})'
@@ -0,0 +1,31 @@
+import io
+import re
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+from .renderers import FastJSONRenderer, orjson
+
+# orjson turns integers wider than 64 bits into floats; bodies that might
+# contain one are left to the stdlib parser
+LONG_NUMBER = re.compile(rb'\d{19,}')
+
+
+class FastJSONParser(JSONParser):
+    """JSONParser that decodes UTF-8 bodies with orjson when it is installed"""
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        """Parse the request body, deferring to JSONParser for anything unusual"""
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+
+        raw = stream.read() if stream is not None else b''
+        if LONG_NUMBER.search(raw):
+            return super().parse(io.BytesIO(raw), media_type, parser_context)
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            # Invalid JSON or NaN constants: get JSONParser's exact result or
+            # error message
+            return super().parse(io.BytesIO(raw), media_type, parser_context)
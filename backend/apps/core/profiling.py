@@ -0,0 +1,110 @@
+"""
+Per-request sampling profiler and SQL timeline.
+
+A background thread snapshots the request thread's Python stack every
+PROFILING_INTERVAL seconds via sys._current_frames(), so the profiled code
+runs unmodified (no tracing hooks). Stacks are aggregated in the "folded"
+format understood by flamegraph.pl, speedscope and inferno:
+
+    module.py:outer;module.py:inner 12
+
+Queries run while profiling are recorded with their start offset and
+duration on every configured database alias.
+"""
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+from django.conf import settings
+from django.db import connections
+
+# Longest SQL statement kept in a timeline entry
+MAX_SQL_LENGTH = 2000
+
+_frame_labels = {}
+
+
+def _frame_label(code):
+    """Short, stable name for a code object, cached per code object"""
+    label = _frame_labels.get(code)
+    if label is None:
+        filename = code.co_filename
+        # Strip the longest matching import root to keep module paths short
+        for root in sorted(filter(None, sys.path), key=len, reverse=True):
+            if filename.startswith(root):
+                filename = filename[len(root):].lstrip('/\\')
+                break
+        label = _frame_labels[code] = f'{filename}:{code.co_qualname}'
+    return label
+
+
+class StackSampler:
+    """Sample one thread's call stack at a fixed interval"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if labels:
+                self.stacks[';'.join(reversed(labels))] += 1
+
+    @property
+    def sample_count(self):
+        return sum(self.stacks.values())
+
+    def folded(self):
+        """Samples in folded-stack format, heaviest stacks first"""
+        return '\n'.join(f'{stack} {count}' for stack, count in self.stacks.most_common())
+
+
+class SQLTimeline:
+    """Record every query executed on any database while active"""
+
+    def __init__(self, started):
+        self.started = started
+        self.queries = []
+        self._stack = ExitStack()
+
+    def __enter__(self):
+        for alias in settings.DATABASES:
+            self._stack.enter_context(connections[alias].execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            # Parameters are left out so the stored profile holds no user data
+            self.queries.append({
+                'alias': context['connection'].alias,
+                'start_ms': round((started - self.started) * 1000, 3),
+                'duration_ms': round((time.perf_counter() - started) * 1000, 3),
+                'sql': sql[:MAX_SQL_LENGTH],
+                'many': many,
+            })
+
+    @property
+    def total_ms(self):
+        return round(sum(query['duration_ms'] for query in self.queries), 3)
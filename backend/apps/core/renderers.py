@@ -0,0 +1,43 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer that encodes with orjson when it is installed.
+
+    Output matches DRF's JSONRenderer byte for byte for the values our API
+    produces: datetimes, dates, times and UUIDs are encoded natively, and
+    anything orjson does not know (Decimal, lazy strings, querysets, ...) goes
+    through DRF's own encoder. Known differences are limited to the exponent
+    spelling of very large or very small floats (``1e16`` vs ``1e+16``), and
+    to non-finite floats: orjson writes NaN and +/-Infinity as ``null``
+    where JSONRenderer (with DRF's default STRICT_JSON) raises ValueError,
+    so e.g. a NaN from a numpy aggregate over no rows is sent as null
+    instead of failing the request.
+    Indented output (e.g. the browsable API) uses the stdlib path.
+    """
+    options = (orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+    def __init__(self):
+        self._default = JSONEncoder().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Render `data` into JSON bytes"""
+        if orjson is None or data is None or not self.compact or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self._default, option=self.options)
+        except orjson.JSONEncodeError:
+            # e.g. integers wider than 64 bits: let the stdlib decide
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Same strict-javascript escaping of U+2028/U+2029 as JSONRenderer
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
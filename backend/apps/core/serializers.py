@@ -0,0 +1,20 @@
+from rest_framework import serializers
+from .models import RequestProfile
+
+
+class RequestProfileSerializer(serializers.ModelSerializer):
+    """Serializer for profile listings"""
+    class Meta:
+        model = RequestProfile
+        fields = (
+            'id', 'created_at', 'method', 'path', 'status_code', 'duration_ms',
+            'trigger', 'user_id', 'sample_count', 'query_count', 'sql_ms'
+        )
+        read_only_fields = fields
+
+
+class RequestProfileDetailSerializer(RequestProfileSerializer):
+    """Serializer for a single profile including its SQL timeline"""
+    class Meta(RequestProfileSerializer.Meta):
+        fields = RequestProfileSerializer.Meta.fields + ('sql_timeline',)
+        read_only_fields = fields
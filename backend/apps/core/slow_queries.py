@@ -0,0 +1,210 @@
+"""
+Slow-query log.
+
+A wrapper installed on every database connection (see CoreConfig.ready)
+times each statement. Statements slower than SLOW_QUERY_THRESHOLD_MS are
+folded into one SlowQuery row per normalized fingerprint, along with the
+DRF view and project code that issued them, an EXPLAIN plan for the
+slowest execution seen so far and, with SLOW_QUERY_CAPTURE_PARAMS on, the
+latest parameters.
+
+Only statements that succeeded are recorded. A slow statement is only
+noted when it runs; the EXPLAIN and the write happen once the database is
+back in autocommit (the next statement outside atomic(), or the end of the
+request), so the log never joins or lengthens the caller's transaction.
+Locking reads (SELECT ... FOR UPDATE) are never re-run by EXPLAIN.
+"""
+import hashlib
+import re
+import sys
+import threading
+import time
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, IntegrityError, connections, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from rest_framework.views import APIView
+from .models import SlowQuery
+
+_STRING_LITERAL = re.compile(r"'(?:''|[^'])*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|\$\d+|\?')
+_IN_LIST = re.compile(r'\bIN\s*\((?:\s*\?\s*,)*\s*\?\s*\)', re.IGNORECASE)
+_WHITESPACE = re.compile(r'\s+')
+_LOCKING_CLAUSE = re.compile(r'\bFOR\s+(?:NO\s+KEY\s+)?(?:UPDATE|SHARE|KEY\s+SHARE)\b', re.IGNORECASE)
+
+# Longest parameter value kept verbatim
+MAX_PARAM_LENGTH = 200
+# Slow statements noted per thread while waiting for a transaction to end
+MAX_PENDING = 100
+BASE_DIR = str(settings.BASE_DIR)
+PROJECT_ROOT = str(settings.BASE_DIR / 'apps')
+
+_local = threading.local()
+
+
+def normalize_sql(sql):
+    """SQL with literals and placeholders replaced, so similar queries compare equal"""
+    sql = _STRING_LITERAL.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def fingerprint(sql):
+    return hashlib.sha1(normalize_sql(sql).encode()).hexdigest()
+
+
+def _clean_params(params, many):
+    """JSON-safe, truncated copy of the statement's parameters"""
+    if params is None:
+        return None
+    if many:
+        # executemany: keep the first row only
+        params = next(iter(params), None)
+        if params is None:
+            return None
+    if isinstance(params, dict):
+        params = list(params.values())
+    cleaned = []
+    for value in params:
+        if not isinstance(value, (str, int, float, bool, type(None))):
+            value = str(value)
+        if isinstance(value, str) and len(value) > MAX_PARAM_LENGTH:
+            value = value[:MAX_PARAM_LENGTH] + '...'
+        cleaned.append(value)
+    return cleaned
+
+
+def _caller():
+    """(view, source) of the code that issued the current statement"""
+    view = source = ''
+    frame = sys._getframe(2)
+    while frame is not None and not (view and source):
+        filename = frame.f_code.co_filename
+        if not source and filename.startswith(PROJECT_ROOT) and filename != __file__:
+            source = f'{filename[len(BASE_DIR) + 1:]}:{frame.f_lineno} {frame.f_code.co_name}'
+        instance = frame.f_locals.get('self')
+        if not view and isinstance(instance, APIView):
+            action = getattr(instance, 'action', None) or getattr(instance.request, 'method', '').lower()
+            view = f'{type(instance).__name__}.{action}'
+        frame = frame.f_back
+    return view, source
+
+
+def explain(connection, sql, params):
+    """Query plan for a SELECT on PostgreSQL or SQLite, or '' if unsupported"""
+    if not sql.lstrip().upper().startswith(('SELECT', 'WITH')) or _LOCKING_CLAUSE.search(sql):
+        return ''
+    if connection.vendor == 'postgresql':
+        prefix = 'EXPLAIN (ANALYZE, BUFFERS) ' if settings.SLOW_QUERY_EXPLAIN_ANALYZE else 'EXPLAIN '
+    elif connection.vendor == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    else:
+        return ''
+
+    # Run in autocommit, so no transaction (or SQLite write lock) is opened for it
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + sql, params)
+        rows = cursor.fetchall()
+    if connection.vendor == 'sqlite':
+        # (id, parent, notused, detail)
+        return '\n'.join(row[-1] for row in rows)
+    return '\n'.join(row[0] for row in rows)
+
+
+def record_slow_query(connection, sql, params, many, duration_ms, view='', source=''):
+    """Fold one slow execution into its fingerprint's SlowQuery row"""
+    key = fingerprint(sql)
+    changes = {
+        'sql': sql[:settings.SLOW_QUERY_MAX_SQL_LENGTH],
+        'params': _clean_params(params, many) if settings.SLOW_QUERY_CAPTURE_PARAMS else None,
+        'alias': connection.alias,
+        'vendor': connection.vendor,
+        'view': view,
+        'source': source[:255],
+        'last_seen': timezone.now(),
+    }
+
+    previous_max = SlowQuery.objects.filter(fingerprint=key).values_list('max_ms', flat=True).first()
+    if settings.SLOW_QUERY_EXPLAIN and not many and (previous_max is None or duration_ms > previous_max):
+        # Keep the plan of the slowest execution
+        try:
+            changes['plan'] = explain(connection, sql, params)
+        except DatabaseError as exc:
+            changes['plan'] = f'EXPLAIN failed: {exc}'
+
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        updated = SlowQuery.objects.filter(fingerprint=key).update(
+            calls=F('calls') + 1,
+            total_ms=F('total_ms') + duration_ms,
+            max_ms=Greatest('max_ms', Value(duration_ms)),
+            **changes,
+        )
+        if not updated:
+            try:
+                with transaction.atomic(using=DEFAULT_DB_ALIAS):
+                    SlowQuery.objects.create(
+                        fingerprint=key, calls=1, total_ms=duration_ms, max_ms=duration_ms, **changes
+                    )
+            except IntegrityError:
+                # Another worker created the row first
+                SlowQuery.objects.filter(fingerprint=key).update(
+                    calls=F('calls') + 1, total_ms=F('total_ms') + duration_ms, **changes
+                )
+
+
+def _in_transaction(aliases):
+    return any(connections[alias].in_atomic_block for alias in aliases)
+
+
+def flush_slow_queries(**kwargs):
+    """Record this thread's noted slow statements once no transaction involved is open.
+
+    Also a request_finished receiver, for statements whose transaction was
+    the last thing the request did.
+    """
+    pending = getattr(_local, 'pending', None)
+    if not pending or getattr(_local, 'recording', False):
+        return
+    if _in_transaction({DEFAULT_DB_ALIAS, *(entry[0] for entry in pending)}):
+        return
+
+    _local.pending = []
+    _local.recording = True
+    try:
+        for alias, sql, params, many, duration_ms, view, source in pending:
+            try:
+                record_slow_query(connections[alias], sql, params, many, duration_ms, view, source)
+            except DatabaseError:
+                # Losing a log entry is preferable to failing the request
+                pass
+    finally:
+        _local.recording = False
+
+
+def slow_query_wrapper(execute, sql, params, many, context):
+    """Connection execute wrapper that notes statements over the threshold"""
+    threshold = settings.SLOW_QUERY_THRESHOLD_MS
+    if not threshold or getattr(_local, 'recording', False):
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration_ms = (time.perf_counter() - started) * 1000
+    if duration_ms >= threshold:
+        pending = _local.__dict__.setdefault('pending', [])
+        if len(pending) < MAX_PENDING:
+            # The caller is only on the stack now
+            view, source = _caller()
+            pending.append((context['connection'].alias, sql, params, many, duration_ms, view, source))
+    flush_slow_queries()
+    return result
+
+
+def install_slow_query_wrapper(sender, connection, **kwargs):
+    """connection_created receiver: time every statement on the new connection"""
+    if slow_query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(slow_query_wrapper)
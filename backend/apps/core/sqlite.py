@@ -0,0 +1,65 @@
+"""
+SQLite tuning for small deployments.
+
+With SQLITE_PROFILE = 'tuned' (the default) every new SQLite connection is
+switched to the settings below (see CoreConfig.ready); 'default' leaves
+SQLite's own. In WAL mode readers no longer block the writer or each other,
+and with synchronous=NORMAL a commit no longer waits for an fsync (a power
+loss can lose the last commits, never corrupt the database). mmap plus a
+larger page cache serve hot pages without a read() call.
+
+Transactions opened by atomic() start with BEGIN IMMEDIATE, taking the
+write lock up front. A plain (deferred) BEGIN only asks for it at the
+first write, and if another worker committed in between SQLite fails that
+upgrade with "database is locked" at once, without waiting. An immediate
+BEGIN instead waits up to the busy timeout for the other writer. Python's
+sqlite3 already waits 5 s, so SQLITE_BUSY_TIMEOUT_MS only changes anything
+when set to another value.
+
+Other databases are left alone.
+"""
+from django.conf import settings
+
+PROFILES = ('default', 'tuned')
+
+
+def tuned_pragmas():
+    """PRAGMA name and value pairs of the tuned profile"""
+    return [
+        ('journal_mode', 'WAL'),
+        ('synchronous', 'NORMAL'),
+        ('busy_timeout', settings.SQLITE_BUSY_TIMEOUT_MS),
+        ('mmap_size', settings.SQLITE_MMAP_SIZE),
+        # Negative sizes are in KiB rather than pages
+        ('cache_size', -settings.SQLITE_CACHE_SIZE_KB),
+        ('temp_store', 'MEMORY'),
+    ]
+
+
+def immediate_transactions(execute, sql, params, many, context):
+    """Execute wrapper starting atomic() transactions with the write lock held"""
+    if sql == 'BEGIN':
+        sql = 'BEGIN IMMEDIATE'
+    return execute(sql, params, many, context)
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """connection_created receiver applying the configured profile"""
+    if connection.vendor != 'sqlite' or settings.SQLITE_PROFILE != 'tuned':
+        return
+    with connection.cursor() as cursor:
+        for name, value in tuned_pragmas():
+            # An in-memory database silently stays in its own journal mode
+            cursor.execute(f'PRAGMA {name} = {value}')
+    if immediate_transactions not in connection.execute_wrappers:
+        connection.execute_wrappers.append(immediate_transactions)
+
+
+def current_pragmas(connection):
+    """Values of the tuned profile's PRAGMAs on a connection, for checking which profile is in effect"""
+    with connection.cursor() as cursor:
+        values = {}
+        for name, _ in tuned_pragmas():
+            cursor.execute(f'PRAGMA {name}')
+            values[name] = cursor.fetchone()[0]
+    return values
@@ -0,0 +1,297 @@
+"""
+Database-backed background task queue.
+
+Functions decorated with ``@task`` in an app's ``tasks`` module can be
+enqueued from views and run later by ``manage.py runworker``. Jobs are rows
+of the Task table, so enqueuing inside a transaction only publishes the job
+if the transaction commits.
+
+Workers claim ready jobs by priority with ``SELECT ... FOR UPDATE SKIP
+LOCKED`` where the database supports it (PostgreSQL), so concurrent workers
+never block on or double-run a job. SQLite has no row locks; there a job
+is claimed by a conditional UPDATE of its status, and a worker that loses
+the race simply moves on.
+
+Failed jobs are retried with exponential backoff until max_attempts.
+While a job runs, its worker refreshes the job's lock every
+TASK_HEARTBEAT_INTERVAL seconds; jobs of a worker that died mid-run stop
+being refreshed and are retried once TASK_LOCK_TIMEOUT has passed.
+"""
+import logging
+import multiprocessing
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+from django.conf import settings
+from django.db import DatabaseError, OperationalError, close_old_connections, connection, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+# Tries at recording a job's outcome, e.g. while SQLite is locked by another writer
+SETTLE_ATTEMPTS = 5
+
+
+class TaskFunction:
+    """A registered task; call it to run inline or .enqueue() it for a worker"""
+
+    def __init__(self, func, name, queue, priority, max_attempts, retry_backoff):
+        self.func = func
+        self.name = name
+        self.queue = queue
+        self.priority = priority
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.__doc__ = func.__doc__
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def __repr__(self):
+        return f'<task {self.name}>'
+
+    def enqueue(self, *args, **kwargs):
+        """Queue a call with the task's default options"""
+        return enqueue(self, args, kwargs)
+
+
+def task(func=None, *, name=None, queue='default', priority=0, max_attempts=3, retry_backoff=None):
+    """Register a function as a background task.
+
+    Higher priorities run first. retry_backoff is the delay in seconds before
+    the first retry, doubled for each further attempt (TASK_RETRY_BACKOFF
+    when not given). Arguments must be JSON-serializable.
+    """
+    def register(func):
+        task_name = name or f'{func.__module__}.{func.__qualname__}'
+        task_function = TaskFunction(func, task_name, queue, priority, max_attempts, retry_backoff)
+        _registry[task_name] = task_function
+        return task_function
+
+    return register(func) if func is not None else register
+
+
+def get_task(name):
+    """Registered task by name, or None"""
+    return _registry.get(name)
+
+
+def enqueue(task_function, args=(), kwargs=None, *, priority=None, queue=None, delay=0):
+    """Store a job for `task_function`, or run it after commit when TASKS_EAGER (or its queue's) is set"""
+    kwargs = kwargs or {}
+    queue = queue or task_function.queue
+    if settings.TASKS_EAGER or queue in settings.TASKS_EAGER_QUEUES:
+        transaction.on_commit(lambda: task_function(*args, **kwargs))
+        return None
+    return Task.objects.create(
+        name=task_function.name,
+        queue=queue,
+        args=list(args),
+        kwargs=kwargs,
+        priority=task_function.priority if priority is None else priority,
+        max_attempts=task_function.max_attempts,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def retry_delay(attempts, base=None):
+    """Seconds to wait after the given number of failed attempts, with jitter"""
+    base = settings.TASK_RETRY_BACKOFF if base is None else base
+    delay = min(base * 2 ** (attempts - 1), settings.TASK_RETRY_BACKOFF_MAX)
+    # Half fixed, half random, so jobs failing together do not retry together
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def claim(worker_id, queues=None, limit=1):
+    """Mark up to `limit` ready jobs as running for this worker and return them"""
+    now = timezone.now()
+    ready = Task.objects.filter(status=Task.Status.QUEUED, run_at__lte=now)
+    if queues:
+        ready = ready.filter(queue__in=queues)
+    ready = ready.order_by('-priority', 'run_at', 'id')
+    running = {
+        'status': Task.Status.RUNNING,
+        'locked_by': worker_id,
+        'locked_at': now,
+        'attempts': F('attempts') + 1,
+    }
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            claimed = list(ready.select_for_update(skip_locked=True).values_list('pk', flat=True)[:limit])
+            Task.objects.filter(pk__in=claimed).update(**running)
+    else:
+        claimed = [
+            pk for pk in ready.values_list('pk', flat=True)[:limit]
+            if Task.objects.filter(pk=pk, status=Task.Status.QUEUED).update(**running)
+        ]
+    return list(Task.objects.filter(pk__in=claimed).order_by('-priority', 'run_at', 'id'))
+
+
+def _heartbeat(job, stop):
+    """Refresh a running job's lock until `stop` is set, so requeue_stale leaves it alone"""
+    running = Task.objects.filter(pk=job.pk, locked_by=job.locked_by, status=Task.Status.RUNNING)
+    try:
+        while not stop.wait(settings.TASK_HEARTBEAT_INTERVAL):
+            try:
+                running.update(locked_at=timezone.now())
+            except DatabaseError:
+                # Missing one beat is harmless; the lock timeout spans several
+                logger.warning('Could not refresh the lock of task %s #%s', job.name, job.pk)
+    finally:
+        connection.close()
+
+
+def execute(job):
+    """Run a claimed job and record its outcome; returns the final status"""
+    task_function = get_task(job.name)
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat, args=(job, stop), daemon=True)
+    heartbeat.start()
+    try:
+        if task_function is None:
+            raise LookupError(f"No task registered as '{job.name}'")
+        task_function(*job.args, **job.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            backoff = task_function.retry_backoff if task_function else None
+            status = Task.Status.QUEUED
+            changes = {'run_at': timezone.now() + timedelta(seconds=retry_delay(job.attempts, backoff))}
+            logger.warning('Task %s #%s failed (attempt %s), retrying', job.name, job.pk, job.attempts)
+        else:
+            status = Task.Status.FAILED
+            changes = {'finished_at': timezone.now()}
+            logger.error('Task %s #%s failed permanently:\n%s', job.name, job.pk, error)
+        changes['last_error'] = error
+    else:
+        status = Task.Status.SUCCEEDED
+        changes = {'finished_at': timezone.now()}
+    finally:
+        stop.set()
+        heartbeat.join()
+
+    # Only the worker still holding the job may settle it
+    settle = Task.objects.filter(pk=job.pk, locked_by=job.locked_by, status=Task.Status.RUNNING)
+    for attempt in range(1, SETTLE_ATTEMPTS + 1):
+        try:
+            settle.update(status=status, locked_by='', locked_at=None, **changes)
+            break
+        except OperationalError:
+            # Left running, the job is retried after TASK_LOCK_TIMEOUT
+            if attempt == SETTLE_ATTEMPTS:
+                raise
+            time.sleep(0.05 * attempt)
+    return status
+
+
+def requeue_stale(timeout=None):
+    """Retry jobs whose worker stopped reporting back; returns how many were requeued or failed"""
+    timeout = settings.TASK_LOCK_TIMEOUT if timeout is None else timeout
+    stale = Task.objects.filter(
+        status=Task.Status.RUNNING, locked_at__lt=timezone.now() - timedelta(seconds=timeout)
+    )
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Task.Status.FAILED, locked_by='', locked_at=None,
+        finished_at=timezone.now(), last_error='Worker lost while running the task',
+    )
+    requeued = stale.update(status=Task.Status.QUEUED, locked_by='', locked_at=None, run_at=timezone.now())
+    return requeued + failed
+
+
+def prune_succeeded():
+    """Delete succeeded jobs older than TASK_SUCCEEDED_TTL_HOURS"""
+    cutoff = timezone.now() - timedelta(hours=settings.TASK_SUCCEEDED_TTL_HOURS)
+    deleted, _ = Task.objects.filter(status=Task.Status.SUCCEEDED, finished_at__lt=cutoff).delete()
+    return deleted
+
+
+def work(worker_id, stop, queues=None, poll_interval=1.0, burst=False):
+    """Claim and run jobs until `stop` is set (or, in burst mode, none are ready)"""
+    processed = 0
+    try:
+        while not stop.is_set():
+            close_old_connections()
+            try:
+                jobs = claim(worker_id, queues)
+            except DatabaseError:
+                logger.exception('Worker %s could not claim jobs', worker_id)
+                connection.close()
+                stop.wait(poll_interval)
+                continue
+            if not jobs:
+                if burst:
+                    break
+                stop.wait(poll_interval)
+                continue
+            for job in jobs:
+                execute(job)
+                processed += 1
+    finally:
+        connection.close()
+    return processed
+
+
+def _work_in_process(worker_id, stop, queues, poll_interval, burst):
+    """Process pool entry point"""
+    work(worker_id, stop, queues, poll_interval, burst)
+
+
+class Worker:
+    """Runs `concurrency` job loops in threads or forked processes"""
+
+    def __init__(self, concurrency=1, pool='threads', queues=None, poll_interval=1.0, burst=False):
+        self.concurrency = concurrency
+        self.pool = pool
+        self.queues = queues
+        self.poll_interval = poll_interval
+        self.burst = burst
+        self.name = f'{socket.gethostname()}:{os.getpid()}'
+        if pool == 'processes':
+            self.stop = multiprocessing.get_context('fork').Event()
+        else:
+            self.stop = threading.Event()
+
+    def housekeeping(self):
+        """Recover jobs of lost workers and drop old results"""
+        requeued = requeue_stale()
+        if requeued:
+            logger.warning('Requeued %s task(s) from lost workers', requeued)
+        prune_succeeded()
+
+    def run(self):
+        """Start the pool and block until it has stopped"""
+        self.housekeeping()
+        args = (self.queues, self.poll_interval, self.burst)
+        if self.pool == 'processes':
+            # Forked children must open their own database connections
+            connections.close_all()
+            context = multiprocessing.get_context('fork')
+            members = [
+                context.Process(target=_work_in_process, args=(f'{self.name}/p{index}', self.stop, *args))
+                for index in range(self.concurrency)
+            ]
+        else:
+            members = [
+                threading.Thread(target=work, args=(f'{self.name}/t{index}', self.stop, *args), daemon=True)
+                for index in range(self.concurrency)
+            ]
+        for member in members:
+            member.start()
+
+        while True:
+            alive = [member for member in members if member.is_alive()]
+            if not alive:
+                break
+            alive[0].join(settings.TASK_HOUSEKEEPING_INTERVAL)
+            if alive[0].is_alive() and not self.stop.is_set():
+                close_old_connections()
+                self.housekeeping()
+        connection.close()
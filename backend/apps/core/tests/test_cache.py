@@ -0,0 +1,167 @@
+import pytest
+from django.core.cache import caches
+from django.urls import reverse
+from rest_framework.test import APIClient
+from apps.core import cache as tiered
+from apps.core.cache import bump_namespace, cache_stats, cached, namespaced_key
+from apps.users.models import User
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time for L1 expiry"""
+    now = [1000.0]
+    monkeypatch.setattr(tiered.time, 'monotonic', lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def two_processes(settings):
+    """Two tiered caches with separate L1s over one shared L2, like two workers"""
+    options = {'SHARED': 'shared', 'L1_MAX_ENTRIES': 3, 'L1_TIMEOUT': 5}
+    settings.CACHES = {
+        'default': {'BACKEND': 'apps.core.cache.TieredCache', 'LOCATION': 'test-one', 'OPTIONS': options},
+        'other': {'BACKEND': 'apps.core.cache.TieredCache', 'LOCATION': 'test-two', 'OPTIONS': options},
+        'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-shared'},
+    }
+    one, two = caches['default'], caches['other']
+    for cache in (one, two):
+        cache.clear()
+        cache.local.reset_stats()
+    yield one, two
+    one.clear()
+
+
+class TestTieredCache:
+    """Tests for the L1 + L2 cache backend"""
+
+    def test_reads_served_from_l1(self, two_processes):
+        """Test a fresh L1 copy is returned without asking L2"""
+        one, _ = two_processes
+        one.set('key', {'a': 1})
+        caches['shared'].delete('key')
+
+        assert one.get('key') == {'a': 1}
+        assert cache_stats(one)['hits'] == 1
+
+    def test_other_process_reads_through_l2(self, two_processes):
+        """Test a value written by one process is found by another via L2"""
+        one, two = two_processes
+        one.set('key', 'value')
+
+        assert two.get('key') == 'value'
+        assert two.get('key') == 'value'
+        stats = cache_stats(two)
+        assert (stats['hits'], stats['misses'], stats['shared_hits']) == (1, 1, 1)
+        assert stats['hit_rate'] == 0.5
+
+    def test_stale_l1_copy_bounded_by_timeout(self, two_processes, clock):
+        """Test another process's change shows up once the L1 copy expires"""
+        one, two = two_processes
+        one.set('key', 'old')
+        assert two.get('key') == 'old'
+
+        one.set('key', 'new')
+        assert two.get('key') == 'old'
+        clock[0] += 6
+        assert two.get('key') == 'new'
+
+    def test_l1_copy_never_outlives_entry_timeout(self, two_processes, clock):
+        """Test an entry with a shorter timeout than L1_TIMEOUT leaves L1 with it"""
+        one, _ = two_processes
+        one.set('key', 'value', timeout=2)
+        caches['shared'].delete('key')
+
+        clock[0] += 3
+        assert one.get('key') is None
+
+    def test_least_recently_used_evicted(self, two_processes):
+        """Test L1 keeps at most L1_MAX_ENTRIES, dropping the coldest first"""
+        one, _ = two_processes
+        for key in ('a', 'b', 'c'):
+            one.set(key, key)
+        one.get('a')
+        one.set('d', 'd')
+
+        assert len(one.local.entries) == 3
+        assert one.make_key('b') not in one.local.entries
+        assert one.make_key('a') in one.local.entries
+
+    def test_cached_values_are_copies(self, two_processes):
+        """Test mutating a returned value does not change the cached one"""
+        one, _ = two_processes
+        one.set('key', {'perms': {'a'}})
+
+        one.get('key')['perms'].add('b')
+
+        assert one.get('key') == {'perms': {'a'}}
+
+    def test_delete_incr_and_many(self, two_processes):
+        """Test writes keep both tiers consistent"""
+        one, two = two_processes
+        one.set_many({'x': 1, 'y': 2})
+        assert two.get_many(['x', 'y', 'z']) == {'x': 1, 'y': 2}
+
+        assert one.incr('x', 10) == 11
+        assert one.get('x') == 11
+        one.delete('y')
+        assert one.get('y') is None
+        assert caches['shared'].get('y') is None
+        with pytest.raises(ValueError):
+            one.incr('missing')
+
+
+class TestCacheHelpers:
+    """Tests for namespaces and negative caching"""
+
+    def test_namespace_bump_retires_keys(self, two_processes):
+        """Test bumping a namespace moves its keys to a new version"""
+        one, _ = two_processes
+        before = namespaced_key('perms', 7)
+        one.set(before, 'cached')
+
+        bump_namespace('perms')
+
+        assert namespaced_key('perms', 7) != before
+        assert one.get(namespaced_key('perms', 7)) is None
+
+    def test_negative_results_cached(self, two_processes):
+        """Test a None result is remembered for negative_timeout seconds"""
+        calls = []
+
+        def lookup():
+            calls.append(1)
+            return None
+
+        assert cached('missing', lookup, negative_timeout=30) is None
+        assert cached('missing', lookup, negative_timeout=30) is None
+        assert len(calls) == 1
+
+        assert cached('uncached', lookup) is None
+        assert cached('uncached', lookup) is None
+        assert len(calls) == 3
+
+    def test_cached_builds_once(self, two_processes):
+        """Test a value is computed on the first call only"""
+        calls = []
+
+        def build():
+            calls.append(1)
+            return {'count': 3}
+
+        assert cached('stats', build, namespace='stats') == {'count': 3}
+        assert cached('stats', build, namespace='stats') == {'count': 3}
+        assert len(calls) == 1
+
+
+@pytest.mark.django_db
+def test_cache_stats_endpoint():
+    """Test admins can read this process's L1 hit rate"""
+    admin = User.objects.create_user(email='admin@example.com', full_name='Admin', password=None, role=User.Role.ADMIN)
+    client = APIClient()
+    client.force_authenticate(admin)
+
+    response = client.get(reverse('cache-stats'))
+
+    assert response.status_code == 200
+    assert {'hits', 'misses', 'hit_rate', 'entries'} <= set(response.data)
@@ -0,0 +1,53 @@
+import gzip
+import json
+import pytest
+from django.http import HttpResponse
+from django.test import RequestFactory
+from apps.core.compression import choose_encoding
+from apps.core.middleware import CompressionMiddleware
+
+
+def json_view(size):
+    """Build a view returning a JSON body of roughly the given size"""
+    def view(request):
+        body = json.dumps({'items': ['x' * 10] * (size // 14)})
+        return HttpResponse(body, content_type='application/json')
+    return view
+
+
+class TestChooseEncoding:
+    """Tests for Accept-Encoding negotiation"""
+    
+    def test_prefers_first_offered_encoding(self):
+        """Test the server preference order wins among accepted encodings"""
+        assert choose_encoding('gzip, br', offered=('br', 'gzip')) == 'br'
+    
+    def test_respects_zero_quality(self):
+        """Test an encoding with q=0 is never chosen"""
+        assert choose_encoding('br;q=0, gzip;q=0.5', offered=('br', 'gzip')) == 'gzip'
+        assert choose_encoding('gzip;q=0', offered=('gzip',)) is None
+    
+    def test_identity_without_header(self):
+        """Test no Accept-Encoding means an uncompressed response"""
+        assert choose_encoding('', offered=('br', 'gzip')) is None
+
+
+class TestCompressionMiddleware:
+    """Tests for the API compression middleware"""
+    
+    def test_compresses_large_api_json(self):
+        """Test large JSON API responses are gzipped when brotli is not accepted"""
+        request = RequestFactory().get('/api/users/', HTTP_ACCEPT_ENCODING='gzip')
+        response = CompressionMiddleware(json_view(4096))(request)
+        
+        assert response['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in response['Vary']
+        assert json.loads(gzip.decompress(response.content))['items']
+    
+    @pytest.mark.parametrize('path, size', [('/api/users/', 100), ('/admin/', 4096)])
+    def test_skips_small_or_non_api_responses(self, path, size):
+        """Test responses under the threshold or outside /api/ are untouched"""
+        request = RequestFactory().get(path, HTTP_ACCEPT_ENCODING='gzip')
+        response = CompressionMiddleware(json_view(size))(request)
+        
+        assert not response.has_header('Content-Encoding')
@@ -0,0 +1,101 @@
+import json
+from io import StringIO
+import pytest
+from django.core.management import call_command
+from django.test import Client
+from django.urls import reverse
+from apps.users.models import User
+
+
+@pytest.fixture(autouse=True)
+def plain_static_storage(settings):
+    """Render admin pages without a collected static files manifest"""
+    settings.STORAGES = {
+        **settings.STORAGES,
+        'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    }
+
+
+@pytest.fixture
+def superuser(db):
+    return User.objects.create_superuser(email='root@example.com', full_name='Root', password='RootPass123!@#')
+
+
+@pytest.mark.django_db
+class TestPathMiddlewareDispatcher:
+    """Tests for the lean /api/ and full admin middleware chains"""
+    
+    def test_api_skips_admin_middleware(self, client):
+        """Test API responses carry none of the browser middleware's traces"""
+        response = client.get(reverse('jwks'))
+        
+        assert response.status_code == 200
+        assert 'X-Frame-Options' not in response
+        assert not hasattr(response.wsgi_request, 'session')
+        assert 'csrftoken' not in response.cookies
+    
+    def test_admin_keeps_full_stack(self, client):
+        """Test admin pages still get sessions, CSRF cookies and X-Frame-Options"""
+        response = client.get('/admin/login/')
+        
+        assert response.status_code == 200
+        assert response['X-Frame-Options'] == 'DENY'
+        assert 'csrftoken' in response.cookies
+        assert hasattr(response.wsgi_request, 'session')
+    
+    def test_admin_csrf_enforced(self, superuser):
+        """Test CSRF's view hook still runs for the admin through the dispatcher"""
+        client = Client(enforce_csrf_checks=True)
+        credentials = {'username': 'root@example.com', 'password': 'RootPass123!@#', 'next': '/admin/'}
+        
+        assert client.post('/admin/login/', credentials).status_code == 403
+        
+        client.get('/admin/login/')
+        response = client.post('/admin/login/', {**credentials, 'csrfmiddlewaretoken': client.cookies['csrftoken'].value})
+        
+        assert response.status_code == 302
+        assert 'sessionid' in response.cookies
+        assert client.get('/admin/').status_code == 200
+    
+    def test_api_post_needs_no_csrf_token(self):
+        """Test JWT API endpoints accept POSTs without a CSRF cookie"""
+        client = Client(enforce_csrf_checks=True)
+        
+        response = client.post(
+            reverse('login'), json.dumps({'email': 'nobody@example.com', 'password': 'x'}),
+            content_type='application/json',
+        )
+        
+        assert response.status_code == 401
+
+
+class TestAdminMiddlewareCheck:
+    """Tests for the core.E001 system check"""
+    
+    def test_passes_with_dispatched_middleware(self):
+        """Test the default settings satisfy the check"""
+        from apps.core.checks import check_admin_middleware
+        
+        assert check_admin_middleware(None) == []
+    
+    def test_fails_without_admin_middleware(self, settings):
+        """Test removing the admin middleware is reported"""
+        from apps.core.checks import check_admin_middleware
+        settings.ADMIN_MIDDLEWARE = ['django.middleware.clickjacking.XFrameOptionsMiddleware']
+        
+        errors = check_admin_middleware(None)
+        
+        assert {error.id for error in errors} == {'core.E001'}
+        assert len(errors) == 4
+
+
+@pytest.mark.django_db
+def test_benchmark_middleware_command():
+    """Test the benchmark reports both chains against the baseline"""
+    out = StringIO()
+    
+    call_command('benchmark_middleware', '--requests', '20', '--repeat', '1', '--json', '-', stdout=out)
+    
+    report = json.loads(out.getvalue()[out.getvalue().index('{'):])
+    assert report['admin_us'] > 0 and report['api_us'] > 0
+    assert 'django.contrib.sessions.middleware.SessionMiddleware' in report['skipped_middleware']
@@ -0,0 +1,144 @@
+import threading
+import time
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from apps.core.models import RequestProfile
+from apps.core.profiling import StackSampler
+from apps.users.models import User
+
+
+def busy_wait(seconds):
+    """Spin so the sampler sees this frame on the stack"""
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+@pytest.fixture
+def api_client():
+    """Provide an API client for tests"""
+    return APIClient()
+
+
+@pytest.fixture
+def admin_user(db):
+    """Create an admin user"""
+    return User.objects.create_user(
+        email='admin@example.com', full_name='Admin User', password='TestPass123!@#', role=User.Role.ADMIN
+    )
+
+
+@pytest.fixture
+def regular_user(db):
+    """Create a regular user"""
+    return User.objects.create_user(email='user@example.com', full_name='Regular User', password='TestPass123!@#')
+
+
+class TestStackSampler:
+    """Tests for the thread stack sampler"""
+
+    def test_collects_folded_stacks(self):
+        """Test samples are folded root-first with the sampled function"""
+        sampler = StackSampler(threading.get_ident(), 0.001)
+        sampler.start()
+        busy_wait(0.05)
+        sampler.stop()
+
+        assert sampler.sample_count > 0
+        stack, count = sampler.folded().splitlines()[0].rsplit(' ', 1)
+        assert 'busy_wait' in stack.split(';')[-1]
+        assert int(count) > 0
+
+
+@pytest.mark.django_db
+class TestProfilingMiddleware:
+    """Tests for header-triggered and sampled request profiling"""
+
+    def test_admin_header_profiles_request(self, api_client, admin_user):
+        """Test an admin's bearer token plus X-Profile stores a profile"""
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(admin_user)}')
+
+        response = api_client.get(reverse('user-list'), HTTP_X_PROFILE='1')
+
+        assert response.status_code == 200
+        profile = RequestProfile.objects.get(pk=response['X-Profile-Id'])
+        assert profile.trigger == RequestProfile.Trigger.HEADER
+        assert profile.path == '/api/users/'
+        assert profile.user_id == admin_user.pk
+        assert profile.query_count == len(profile.sql_timeline) > 0
+        assert any('users_user' in query['sql'] for query in profile.sql_timeline)
+
+    def test_token_query_parameter_not_recorded(self, api_client, admin_user):
+        """Test an access token passed in the query string never reaches the stored path"""
+        token = str(AccessToken.for_user(admin_user))
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        response = api_client.get(reverse('user-list'), {'token': token, 'role': 'ADMIN'}, HTTP_X_PROFILE='1')
+
+        profile = RequestProfile.objects.get(pk=response['X-Profile-Id'])
+        assert profile.path == '/api/users/?role=ADMIN'
+        assert token not in profile.path
+
+    def test_header_ignored_for_regular_users(self, api_client, regular_user):
+        """Test non-admins cannot trigger profiling"""
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(regular_user)}')
+
+        response = api_client.get(reverse('user-me'), HTTP_X_PROFILE='1')
+
+        assert response.status_code == 200
+        assert 'X-Profile-Id' not in response
+        assert not RequestProfile.objects.exists()
+
+    def test_random_sample_and_retention(self, api_client, settings):
+        """Test sampled requests are profiled and old profiles pruned"""
+        settings.PROFILING_SAMPLE_RATE = 1.0
+        settings.PROFILING_MAX_PROFILES = 2
+
+        for _ in range(3):
+            response = api_client.get(reverse('user-me'))
+            assert response.status_code == 401
+
+        assert RequestProfile.objects.count() == 2
+        assert set(RequestProfile.objects.values_list('trigger', flat=True)) == {RequestProfile.Trigger.SAMPLE}
+
+
+@pytest.mark.django_db
+class TestRequestProfileAPI:
+    """Tests for the admin profile browsing endpoints"""
+
+    @pytest.fixture
+    def profile(self):
+        """Create a stored profile"""
+        return RequestProfile.objects.create(
+            method='GET', path='/api/users/', status_code=200, duration_ms=12.5,
+            trigger=RequestProfile.Trigger.HEADER, sample_count=3,
+            folded_stacks='views.py:list;db.py:execute 3',
+            sql_timeline=[{'alias': 'default', 'start_ms': 1.0, 'duration_ms': 0.5, 'sql': 'SELECT 1', 'many': False}],
+        )
+
+    def test_list_detail_and_download(self, api_client, admin_user, profile):
+        """Test admins can list profiles and download folded stacks"""
+        api_client.force_authenticate(user=admin_user)
+
+        response = api_client.get(reverse('profile-list'))
+        assert response.status_code == 200
+        assert response.data['results'][0]['id'] == profile.pk
+        assert 'sql_timeline' not in response.data['results'][0]
+
+        response = api_client.get(reverse('profile-detail', kwargs={'pk': profile.pk}))
+        assert response.data['sql_timeline'][0]['sql'] == 'SELECT 1'
+
+        response = api_client.get(reverse('profile-download', kwargs={'pk': profile.pk}))
+        assert response.status_code == 200
+        assert response['Content-Disposition'] == f'attachment; filename="profile-{profile.pk}.folded"'
+        assert response.content == b'views.py:list;db.py:execute 3'
+
+    def test_regular_user_forbidden(self, api_client, regular_user, profile):
+        """Test non-admins cannot read profiles"""
+        api_client.force_authenticate(user=regular_user)
+
+        response = api_client.get(reverse('profile-list'))
+
+        assert response.status_code == 403
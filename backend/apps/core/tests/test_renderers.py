@@ -0,0 +1,84 @@
+import datetime
+import decimal
+import io
+import uuid
+import pytest
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ErrorDetail, ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from apps.core import parsers, renderers
+from apps.core.parsers import FastJSONParser
+from apps.core.renderers import FastJSONRenderer
+
+UTC = datetime.timezone.utc
+
+SAMPLES = [
+    {'created_at': datetime.datetime(2026, 1, 2, 3, 4, 5, tzinfo=UTC)},
+    {'created_at': datetime.datetime(2026, 1, 2, 3, 4, 5, 123456, tzinfo=UTC)},
+    {'ist': datetime.datetime(2026, 1, 2, 3, 4, 5, tzinfo=datetime.timezone(datetime.timedelta(hours=5, minutes=30)))},
+    {'naive': datetime.datetime(2026, 1, 2, 3, 4, 5), 'date': datetime.date(2026, 1, 2)},
+    {'time': datetime.time(1, 2, 3, 4), 'delta': datetime.timedelta(days=1, seconds=5)},
+    {'decimal': decimal.Decimal('12.50'), 'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678')},
+    {'text': 'café     "quoted" \\ \n\t\x1f', 'lazy': gettext_lazy('Users')},
+    {'error': [ErrorDetail('Email already exists.', code='invalid')], 'set': {1}},
+    {1: 'int key', 'nested': {'rate': [100.0, 33.3, 0.1], 'none': None, 'flag': True}},
+    {'big': 2 ** 70, 'tuple': (1, 2)},
+    [],
+]
+
+
+class TestFastJSONRenderer:
+    """Tests that FastJSONRenderer output matches DRF's JSONRenderer"""
+    
+    @pytest.mark.parametrize('data', SAMPLES)
+    def test_matches_json_renderer(self, data):
+        """Test the rendered bytes are identical to the stdlib renderer"""
+        assert FastJSONRenderer().render(data) == JSONRenderer().render(data)
+    
+    def test_indented_output_matches(self):
+        """Test indented rendering (browsable API) is unchanged"""
+        data = SAMPLES[0]
+        media_type = 'application/json; indent=4'
+        assert FastJSONRenderer().render(data, media_type) == JSONRenderer().render(data, media_type)
+    
+    def test_fallback_without_orjson(self, monkeypatch):
+        """Test the renderer still works when orjson is not installed"""
+        monkeypatch.setattr(renderers, 'orjson', None)
+        data = SAMPLES[1]
+        assert FastJSONRenderer().render(data) == JSONRenderer().render(data)
+    
+    @pytest.mark.skipif(renderers.orjson is None, reason='orjson is not installed')
+    @pytest.mark.parametrize('value', [float('nan'), float('inf'), float('-inf')])
+    def test_non_finite_floats_render_as_null(self, value):
+        """Test the documented difference: non-finite floats become null instead of raising"""
+        assert FastJSONRenderer().render({'rate': value}) == b'{"rate":null}'
+        with pytest.raises(ValueError):
+            JSONRenderer().render({'rate': value})
+
+
+class TestFastJSONParser:
+    """Tests that FastJSONParser results match DRF's JSONParser"""
+    
+    @pytest.mark.parametrize('body', [
+        b'{"email": "a@example.com", "n": 1, "f": 1.5, "l": [null, true]}',
+        b'{"big": 123456789012345678901234567890}',
+        'café'.join(['"', '"']).encode(),
+    ])
+    def test_matches_json_parser(self, body):
+        """Test parsed values are identical to the stdlib parser"""
+        assert FastJSONParser().parse(io.BytesIO(body)) == JSONParser().parse(io.BytesIO(body))
+    
+    @pytest.mark.parametrize('body', [b'{"a": ', b'{"a": NaN}', b''])
+    def test_errors_match_json_parser(self, body):
+        """Test invalid input raises the same ParseError as the stdlib parser"""
+        with pytest.raises(ParseError) as fast:
+            FastJSONParser().parse(io.BytesIO(body))
+        with pytest.raises(ParseError) as stdlib:
+            JSONParser().parse(io.BytesIO(body))
+        assert str(fast.value) == str(stdlib.value)
+    
+    def test_fallback_without_orjson(self, monkeypatch):
+        """Test the parser still works when orjson is not installed"""
+        monkeypatch.setattr(parsers, 'orjson', None)
+        assert FastJSONParser().parse(io.BytesIO(b'{"a": 1}')) == {'a': 1}
@@ -0,0 +1,77 @@
+import pytest
+from django.core.management import CommandError, call_command
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connection, connections
+from apps.core.checks import check_sqlite_profile
+from apps.core.sqlite import current_pragmas
+
+pytestmark = pytest.mark.skipif(connection.vendor != 'sqlite', reason='SQLite profiles only apply to SQLite')
+
+
+@pytest.fixture
+def file_connection(tmp_path):
+    """A new connection to a SQLite file, closed afterwards"""
+    opened = []
+
+    def connect():
+        default = connections[DEFAULT_DB_ALIAS]
+        wrapper = type(default)({**default.settings_dict, 'NAME': str(tmp_path / 'profile.sqlite3')}, 'profile_test')
+        wrapper.ensure_connection()
+        opened.append(wrapper)
+        return wrapper
+
+    yield connect
+    for wrapper in opened:
+        wrapper.close()
+
+
+@pytest.mark.django_db
+class TestSQLiteProfile:
+    """Tests for the SQLite connection profile"""
+
+    def test_tuned_profile_applied_on_connect(self, file_connection, settings):
+        """Test new connections get WAL, synchronous=NORMAL and the configured sizes"""
+        settings.SQLITE_PROFILE = 'tuned'
+        settings.SQLITE_CACHE_SIZE_KB = 8192
+
+        pragmas = current_pragmas(file_connection())
+
+        assert pragmas['journal_mode'] == 'wal'
+        assert pragmas['synchronous'] == 1
+        assert pragmas['busy_timeout'] == settings.SQLITE_BUSY_TIMEOUT_MS
+        assert pragmas['mmap_size'] == settings.SQLITE_MMAP_SIZE
+        assert pragmas['cache_size'] == -8192
+
+    def test_tuned_profile_begins_immediate(self, file_connection, settings):
+        """Test the BEGIN of atomic() takes the write lock, so a second writer waits there"""
+        settings.SQLITE_PROFILE = 'tuned'
+        first, second = file_connection(), file_connection()
+        second.cursor().execute('PRAGMA busy_timeout = 0')
+
+        # What atomic() runs on a SQLite connection in autocommit mode
+        first.cursor().execute('BEGIN')
+        try:
+            with pytest.raises(OperationalError, match='locked'):
+                second.cursor().execute('BEGIN')
+        finally:
+            first.cursor().execute('ROLLBACK')
+
+    def test_default_profile_leaves_sqlite_settings(self, file_connection, settings):
+        """Test the default profile keeps SQLite's rollback journal and full syncs"""
+        settings.SQLITE_PROFILE = 'default'
+
+        pragmas = current_pragmas(file_connection())
+
+        assert pragmas['journal_mode'] == 'delete'
+        assert pragmas['synchronous'] == 2
+
+    def test_unknown_profile_fails_check(self, settings):
+        """Test a misspelt SQLITE_PROFILE is reported as core.E002"""
+        assert check_sqlite_profile(None) == []
+        settings.SQLITE_PROFILE = 'fast'
+
+        assert [error.id for error in check_sqlite_profile(None)] == ['core.E002']
+
+    def test_benchmark_rejects_unknown_profile(self):
+        """Test the benchmark validates --profiles before touching any database"""
+        with pytest.raises(CommandError):
+            call_command('benchmark_sqlite', '--profiles', 'default,fast')
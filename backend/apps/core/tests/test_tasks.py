@@ -0,0 +1,219 @@
+import time
+from datetime import timedelta
+from io import StringIO
+import pytest
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+from apps.core import taskqueue
+from apps.core.checks import check_task_heartbeat
+from apps.core.models import Task
+from apps.core.taskqueue import claim, execute, requeue_stale, task
+from apps.users.models import User
+
+calls = []
+
+
+@task(name='tests.record')
+def record(value):
+    """Remember the value"""
+    calls.append(value)
+
+
+@task(name='tests.fail', max_attempts=2, retry_backoff=60)
+def fail():
+    """Always raise"""
+    raise RuntimeError('boom')
+
+
+@task(name='tests.long_running')
+def long_running():
+    """Outlive a few heartbeats, then report how old the job's lock is"""
+    time.sleep(0.3)
+    locked_at = Task.objects.get(name='tests.long_running').locked_at
+    calls.append((timezone.now() - locked_at).total_seconds())
+
+
+@pytest.fixture(autouse=True)
+def reset_calls():
+    """Start every test with no recorded calls"""
+    calls.clear()
+
+
+def png_upload(size=(800, 600)):
+    """An in-memory PNG upload"""
+    image = Image.new('RGBA', size, (255, 0, 0, 128))
+    upload = SimpleUploadedFile('avatar.png', b'', content_type='image/png')
+    image.save(upload.file, 'PNG')
+    upload.file.seek(0)
+    upload.size = len(upload.file.getvalue())
+    return upload
+
+
+@pytest.mark.django_db
+class TestTaskQueue:
+    """Tests for enqueuing, claiming and retrying jobs"""
+
+    def test_claim_by_priority_then_age(self):
+        """Test higher priorities are claimed first and claimed jobs are not handed out again"""
+        low = record.enqueue('low')
+        high = taskqueue.enqueue(record, ('high',), priority=10)
+        taskqueue.enqueue(record, ('later',), delay=3600)
+
+        first = claim('worker-a')
+        second = claim('worker-b')
+
+        assert [job.pk for job in first] == [high.pk]
+        assert [job.pk for job in second] == [low.pk]
+        assert first[0].status == Task.Status.RUNNING and first[0].attempts == 1
+        assert claim('worker-c') == []
+
+    def test_success_and_retry_with_backoff(self):
+        """Test a failing job is retried later and fails after max_attempts"""
+        record.enqueue('ok')
+        job = fail.enqueue()
+
+        assert execute(claim('w')[0]) == Task.Status.SUCCEEDED
+        assert calls == ['ok']
+        assert execute(claim('w')[0]) == Task.Status.QUEUED
+
+        job.refresh_from_db()
+        assert 'RuntimeError: boom' in job.last_error
+        assert timezone.now() + timedelta(seconds=25) < job.run_at <= timezone.now() + timedelta(seconds=60)
+
+        Task.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        assert execute(claim('w')[0]) == Task.Status.FAILED
+        job.refresh_from_db()
+        assert job.attempts == 2 and job.finished_at
+
+    def test_lost_worker_jobs_are_requeued(self):
+        """Test a running job whose worker vanished becomes claimable again"""
+        job = record.enqueue('x')
+        claim('dead-worker')
+        Task.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+
+        assert requeue_stale(timeout=60) == 1
+        assert claim('w')[0].pk == job.pk
+
+    def test_unknown_task_fails(self):
+        """Test a job for an unregistered name ends up failed with the reason"""
+        Task.objects.create(name='tests.missing', max_attempts=1)
+
+        assert execute(claim('w')[0]) == Task.Status.FAILED
+        assert "No task registered as 'tests.missing'" in Task.objects.get().last_error
+
+    def test_eager_mode_runs_after_commit(self, settings, django_capture_on_commit_callbacks):
+        """Test TASKS_EAGER skips the table and runs once the transaction commits"""
+        settings.TASKS_EAGER = True
+
+        with django_capture_on_commit_callbacks(execute=True):
+            record.enqueue('eager')
+            assert calls == []
+
+        assert calls == ['eager']
+        assert not Task.objects.exists()
+
+    def test_eager_queues_run_after_commit(self, settings, django_capture_on_commit_callbacks):
+        """Test jobs of TASKS_EAGER_QUEUES run inline while other queues are stored"""
+        settings.TASKS_EAGER_QUEUES = ['media']
+
+        with django_capture_on_commit_callbacks(execute=True):
+            taskqueue.enqueue(record, ('media',), queue='media')
+            record.enqueue('default')
+
+        assert calls == ['media']
+        assert Task.objects.get().queue == 'default'
+
+
+@pytest.mark.django_db(transaction=True)
+class TestRunWorker:
+    """Tests for the runworker command"""
+
+    def test_burst_runs_ready_jobs_in_threads(self):
+        """Test a burst worker drains the ready jobs and exits"""
+        for value in range(5):
+            record.enqueue(value)
+        out = StringIO()
+
+        call_command('runworker', '--concurrency', '3', '--burst', stdout=out)
+
+        assert sorted(calls) == [0, 1, 2, 3, 4]
+        assert Task.objects.filter(status=Task.Status.SUCCEEDED).count() == 5
+        assert 'Worker stopped' in out.getvalue()
+
+    def test_heartbeat_keeps_long_jobs_locked(self, settings):
+        """Test a job running past TASK_LOCK_TIMEOUT keeps its lock instead of being requeued"""
+        settings.TASK_HEARTBEAT_INTERVAL = 0.05
+        long_running.enqueue()
+        job = claim('w')[0]
+        Task.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+
+        assert execute(job) == Task.Status.SUCCEEDED
+        assert calls[0] < 60
+
+    def test_heartbeat_interval_checked(self, settings):
+        """Test a heartbeat slower than the lock timeout is reported as core.E003"""
+        assert check_task_heartbeat(None) == []
+        settings.TASK_HEARTBEAT_INTERVAL = settings.TASK_LOCK_TIMEOUT
+
+        assert [error.id for error in check_task_heartbeat(None)] == ['core.E003']
+
+    def test_queues_filter(self, settings):
+        """Test a worker only takes jobs from its queues"""
+        settings.TASKS_EAGER_QUEUES = []
+        taskqueue.enqueue(record, ('media',), queue='media')
+        record.enqueue('default')
+
+        call_command('runworker', '--queues', 'media', '--burst', stdout=StringIO())
+
+        assert calls == ['media']
+
+    def test_profile_picture_optimized_in_background(self, settings, tmp_path):
+        """Test uploading returns at once and the worker shrinks the picture"""
+        settings.MEDIA_ROOT = str(tmp_path)
+        settings.TASKS_EAGER_QUEUES = []
+        user = User.objects.create_user(email='user@example.com', full_name='Regular User', password='TestPass123!@#')
+        client = APIClient()
+        client.force_authenticate(user=user)
+
+        response = client.post(
+            reverse('user-upload-profile-picture'), {'profile_picture': png_upload()}, format='multipart'
+        )
+
+        assert response.status_code == 200
+        name = User.objects.get(pk=user.pk).profile_picture.name
+        assert Image.open(default_storage.path(name)).size == (800, 600)
+        assert Task.objects.get().name == 'apps.users.tasks.optimize_profile_picture'
+
+        call_command('runworker', '--burst', stdout=StringIO())
+
+        assert Image.open(default_storage.path(name)).size == (400, 300)
+
+        response = client.delete(reverse('user-delete-profile-picture'))
+        assert response.status_code == 200
+        call_command('runworker', '--burst', stdout=StringIO())
+        assert not default_storage.exists(name)
+
+    def test_profile_picture_optimized_in_web_process_by_default(self, settings, tmp_path):
+        """Test media jobs run in the process holding MEDIA_ROOT unless a worker can reach it"""
+        settings.MEDIA_ROOT = str(tmp_path)
+        user = User.objects.create_user(email='user@example.com', full_name='Regular User', password='TestPass123!@#')
+        client = APIClient()
+        client.force_authenticate(user=user)
+
+        response = client.post(
+            reverse('user-upload-profile-picture'), {'profile_picture': png_upload()}, format='multipart'
+        )
+
+        assert response.status_code == 200
+        name = User.objects.get(pk=user.pk).profile_picture.name
+        assert Image.open(default_storage.path(name)).size == (400, 300)
+
+        response = client.delete(reverse('user-delete-profile-picture'))
+        assert response.status_code == 200
+        assert not default_storage.exists(name)
+        assert not Task.objects.exists()
@@ -0,0 +1,10 @@
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from apps.core.views import RequestProfileViewSet
+
+router = DefaultRouter()
+router.register(r'', RequestProfileViewSet, basename='profile')
+
+urlpatterns = [
+    path('', include(router.urls)),
+]
@@ -0,0 +1,161 @@
+import io
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from apps.users.permissions import IsAdminUser
+from .cache import cache_stats
+from .models import RequestProfile
+from .serializers import RequestProfileDetailSerializer, RequestProfileSerializer
+
+BATCH_METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+
+
+class BatchView(APIView):
+    """Run several API calls in one round trip.
+
+    Sub-requests are dispatched in-process to the regular views with the
+    batch's already authenticated user, so the JWT is decoded once and the
+    middleware chain runs once. Sequential sub-requests share this request's
+    database connection; with ``"parallel": true`` a batch made only of GETs
+    runs on a thread pool, each worker using its own connection.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        """Execute a list of sub-requests and return all responses"""
+        sub_requests = request.data.get('requests')
+        if not isinstance(sub_requests, list) or not sub_requests:
+            return Response(
+                {'error': 'requests must be a non-empty list'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(sub_requests) > settings.BATCH_MAX_REQUESTS:
+            return Response(
+                {'error': f'A batch may contain at most {settings.BATCH_MAX_REQUESTS} requests'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        errors = [self.validate_sub_request(item) for item in sub_requests]
+        if any(errors):
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        read_only = all(item.get('method', 'GET').upper() == 'GET' for item in sub_requests)
+        if request.data.get('parallel') and read_only and len(sub_requests) > 1:
+            workers = min(settings.BATCH_MAX_WORKERS, len(sub_requests))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(lambda item: self.dispatch_in_thread(request, item), sub_requests))
+        else:
+            results = [self.dispatch_sub_request(request, item) for item in sub_requests]
+
+        return Response({'responses': results}, status=status.HTTP_200_OK)
+
+    def validate_sub_request(self, item):
+        """Return an error message for an invalid sub-request, or None"""
+        if not isinstance(item, dict):
+            return 'Each request must be an object'
+        method = str(item.get('method', 'GET')).upper()
+        if method not in BATCH_METHODS:
+            return f"Unsupported method '{method}'"
+        path = item.get('path')
+        if not isinstance(path, str) or not path.startswith(settings.BATCH_ALLOWED_PATH_PREFIXES):
+            return f"path must start with one of: {', '.join(settings.BATCH_ALLOWED_PATH_PREFIXES)}"
+        if {'.', '..'} & set(path.partition('?')[0].split('/')):
+            return 'path must not contain dot segments'
+        return None
+
+    def build_sub_request(self, request, item):
+        """Build a Django request for a sub-request, authenticated as the batch's user"""
+        path, _, query = item['path'].partition('?')
+        payload = b''
+        if item.get('body') is not None:
+            payload = json.dumps(item['body']).encode()
+        sub_request = WSGIRequest({
+            'REQUEST_METHOD': str(item.get('method', 'GET')).upper(),
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'CONTENT_TYPE': 'application/json',
+            'CONTENT_LENGTH': str(len(payload)),
+            'HTTP_HOST': request.get_host(),
+            'REMOTE_ADDR': request.META.get('REMOTE_ADDR', ''),
+            'SERVER_NAME': request.META.get('SERVER_NAME', ''),
+            'SERVER_PORT': request.META.get('SERVER_PORT', ''),
+            'wsgi.url_scheme': request.scheme,
+            'wsgi.input': io.BytesIO(payload),
+        })
+        # Picked up by DRF's Request, skipping JWT decoding and the user lookup
+        sub_request._force_auth_user = request.user
+        sub_request._force_auth_token = request.auth
+        return sub_request
+
+    def dispatch_sub_request(self, request, item):
+        """Run one sub-request through its view and describe the response"""
+        sub_request = self.build_sub_request(request, item)
+        result = {'id': item['id']} if 'id' in item else {}
+        try:
+            match = resolve(sub_request.path_info)
+        except Resolver404:
+            return {**result, 'status': status.HTTP_404_NOT_FOUND, 'body': {'error': 'Not found'}}
+
+        response = match.func(sub_request, *match.args, **match.kwargs)
+        if response.streaming:
+            response.close()
+            return {
+                **result,
+                'status': status.HTTP_400_BAD_REQUEST,
+                'body': {'error': 'Streaming responses are not supported in a batch'},
+            }
+
+        if hasattr(response, 'data'):
+            body = response.data
+        elif response.get('Content-Type', '').startswith('application/json') and response.content:
+            body = json.loads(response.content)
+        else:
+            body = response.content.decode(response.charset or 'utf-8')
+        return {**result, 'status': response.status_code, 'body': body}
+
+    def dispatch_in_thread(self, request, item):
+        """Run a sub-request on a worker thread and release its connection"""
+        try:
+            return self.dispatch_sub_request(request, item)
+        finally:
+            connections.close_all()
+
+
+class RequestProfileViewSet(viewsets.ReadOnlyModelViewSet):
+    """Admin: Browse recent request profiles and download their stacks"""
+    queryset = RequestProfile.objects.all()
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return RequestProfileSerializer
+        return RequestProfileDetailSerializer
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """Admin: Folded stacks, ready for flamegraph.pl or speedscope"""
+        profile = self.get_object()
+        response = HttpResponse(profile.folded_stacks, content_type='text/plain; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="profile-{profile.pk}.folded"'
+        return response
+
+
+class CacheStatsView(APIView):
+    """Admin: L1 hit rate and counters of the process serving the request"""
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def get(self, request):
+        stats = cache_stats()
+        if stats is None:
+            return Response({'error': 'The default cache is not tiered'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'pid': os.getpid(), **stats})
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.db.models import F
 from .models import User
 
 
@@ -18,10 +19,10 @@ class UserAdmin(BaseUserAdmin):
         ('Permissions', {
             'fields': ('role', 'status', 'is_staff', 'is_active', 'is_superuser', 'groups', 'user_permissions')
         }),
-        ('Important dates', {'fields': ('last_login', 'created_at', 'updated_at')}),
+        ('Important dates', {'fields': ('last_login', 'dormant_flagged_at', 'created_at', 'updated_at')}),
     )
     
-    readonly_fields = ('created_at', 'updated_at', 'last_login')
+    readonly_fields = ('created_at', 'updated_at', 'last_login', 'dormant_flagged_at')
     
     add_fieldsets = (
         (None, {
@@ -42,6 +43,10 @@ class UserAdmin(BaseUserAdmin):
         """Bulk deactivate users"""
         # Filter out admin users
         non_admin_users = queryset.exclude(role=User.Role.ADMIN)
-        updated = non_admin_users.update(status=User.Status.INACTIVE, is_active=False)
+        updated = non_admin_users.update(
+            status=User.Status.INACTIVE,
+            is_active=False,
+            token_version=F('token_version') + 1,
+        )
         self.message_user(request, f'{updated} user(s) successfully deactivated.')
     deactivate_users.short_description = "Deactivate selected users"
@@ -0,0 +1,149 @@
+"""
+Aggregate user analytics computed in the database.
+"""
+import itertools
+from datetime import timedelta
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.db.models.functions import ExtractWeekDay, TruncDate, TruncMonth
+from django.utils import timezone
+from .models import User
+from .sharding import scatter
+
+RETENTION_CACHE_KEY = 'users:retention:{months}'
+
+
+def database_statistics(using, now):
+    """Counts and histograms behind the statistics endpoint for one user database"""
+    users = User.objects.using(using)
+    thirty_days_ago = now - timedelta(days=30)
+
+    # Basic counts
+    counts = users.aggregate(
+        total_users=Count('id'),
+        active_users=Count('id', filter=Q(status='ACTIVE')),
+        inactive_users=Count('id', filter=Q(status='INACTIVE')),
+        admin_users=Count('id', filter=Q(role='ADMIN')),
+        regular_users=Count('id', filter=Q(role='USER')),
+        # Recent registrations (last 30 days)
+        recent_registrations=Count('id', filter=Q(created_at__gte=thirty_days_ago)),
+        # Dormant accounts (no last_login or last login > 30 days ago)
+        dormant_accounts=Count('id', filter=Q(last_login__isnull=True) | Q(last_login__lt=thirty_days_ago)),
+    )
+
+    # Growth data (last 30 days, grouped by day)
+    growth_data = list(
+        users.filter(created_at__gte=thirty_days_ago)
+        .annotate(date=TruncDate('created_at'))
+        .values('date')
+        .annotate(count=Count('id'))
+        .order_by('date')
+    )
+
+    # Monthly registrations (last 12 months)
+    twelve_months_ago = now - timedelta(days=365)
+    monthly_data = list(
+        users.filter(created_at__gte=twelve_months_ago)
+        .annotate(month=TruncMonth('created_at'))
+        .values('month')
+        .annotate(count=Count('id'))
+        .order_by('month')
+    )
+
+    # Day of week distribution
+    day_of_week_data = list(
+        users.annotate(day_of_week=ExtractWeekDay('created_at'))
+        .values('day_of_week')
+        .annotate(count=Count('id'))
+        .order_by('day_of_week')
+    )
+
+    # Account age distribution
+    age_distribution = {}
+    for created_at in users.values_list('created_at', flat=True).iterator():
+        days_old = (now - created_at).days
+        if days_old < 30:
+            category = '0-30 days'
+        elif days_old < 90:
+            category = '30-90 days'
+        elif days_old < 180:
+            category = '90-180 days'
+        elif days_old < 365:
+            category = '180-365 days'
+        else:
+            category = '1+ years'
+        age_distribution[category] = age_distribution.get(category, 0) + 1
+
+    return {
+        **counts,
+        'growth_data': growth_data,
+        'monthly_data': monthly_data,
+        'day_of_week_data': day_of_week_data,
+        'age_distribution': age_distribution,
+    }
+
+
+def _month_start(value):
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _months_between(start, end):
+    return (end.year - start.year) * 12 + end.month - start.month
+
+
+def cohort_retention(months=12, now=None):
+    """Monthly signup cohorts and how many users were still seen N months later.
+
+    A user counts as retained at month N if their last login falls N or more
+    months after their signup month. One grouped query returns at most
+    months x months rows, so the Python work is independent of table size.
+    """
+    now = now or timezone.now()
+    start = _month_start(now)
+    for _ in range(months - 1):
+        start = _month_start(start - timedelta(days=1))
+
+    rows = (
+        User.objects.filter(created_at__gte=start)
+        .annotate(cohort=TruncMonth('created_at'), last_seen=TruncMonth('last_login'))
+        .values('cohort', 'last_seen')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+
+    cohorts = {}
+    # Each user database reports its own groups; counts of the same group add up
+    for row in itertools.chain.from_iterable(scatter(lambda alias: list(rows.using(alias)))):
+        cohort = row['cohort']
+        age = _months_between(cohort, now)
+        retained = cohorts.setdefault(cohort, [0] * (age + 1))
+        # Never logged in (or clock skew) only counts towards the signup month
+        offset = 0
+        if row['last_seen'] is not None:
+            offset = min(max(_months_between(cohort, row['last_seen']), 0), age)
+        for month in range(offset + 1):
+            retained[month] += row['count']
+
+    return [
+        {
+            'cohort': cohort.date().isoformat(),
+            'size': retained[0],
+            'retention': retained,
+            'retention_rate': [round(count / retained[0] * 100, 1) for count in retained],
+        }
+        for cohort, retained in sorted(cohorts.items())
+    ]
+
+
+def cached_cohort_retention(months=12, timeout=300, refresh=False):
+    """Return the retention matrix from cache, computing it on a miss"""
+    key = RETENTION_CACHE_KEY.format(months=months)
+    snapshot = None if refresh else cache.get(key)
+    if snapshot is None:
+        snapshot = {
+            'months': months,
+            'generated_at': timezone.now().isoformat(),
+            'cohorts': cohort_retention(months),
+        }
+        cache.set(key, snapshot, timeout)
+    return snapshot
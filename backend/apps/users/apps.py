@@ -5,3 +5,11 @@ class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.users'
     label = 'users'
+    
+    def ready(self):
+        from django.conf import settings
+        from . import checks, signals  # noqa: F401
+        
+        if settings.JWT_KEYS_DIR:
+            from .jwt_keys import install_key_ring_backend
+            install_key_ring_backend()
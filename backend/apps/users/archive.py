@@ -0,0 +1,114 @@
+"""
+Archive tier for long-inactive users.
+
+Users matching the archive policy are moved from the hot User table into
+ArchivedUser in primary-key batches, so authentication, list and statistics
+queries only touch live rows. Archived users can be restored on demand with
+their id, password, groups and permissions intact.
+"""
+import time
+from datetime import timedelta
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.utils import timezone
+from .maintenance import dormant_users
+from .managers import is_email_conflict
+from .models import ArchivedUser, User
+from .sharding import shard_for_user_id, sharding_enabled, user_databases
+
+# Concrete columns copied verbatim between User and ArchivedUser
+ARCHIVED_FIELDS = (
+    'id', 'password', 'email', 'email_domain', 'full_name', 'role', 'status',
+    'token_version', 'last_login', 'dormant_flagged_at', 'created_at', 'updated_at',
+    'is_staff', 'is_active', 'is_superuser',
+)
+
+
+class RestoreConflict(Exception):
+    """The archived user's email has since been taken by a live user"""
+
+
+def archivable_users(days):
+    """Inactive non-admin users with no login for more than `days` days"""
+    cutoff = timezone.now() - timedelta(days=days)
+    return dormant_users(cutoff).filter(status=User.Status.INACTIVE)
+
+
+def archive_users(days=365, batch_size=500, sleep=0.0, dry_run=False, log=None):
+    """Move users matching the archive policy, from every user database, into ArchivedUser.
+
+    Returns the number of users archived (or that would be, for a dry run).
+    """
+    archived = 0
+    for alias in user_databases():
+        candidates = archivable_users(days).using(alias)
+        last_pk = 0
+        while True:
+            batch_pks = list(
+                candidates.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not batch_pks:
+                break
+            last_pk = batch_pks[-1]
+
+            if dry_run:
+                archived += len(batch_pks)
+                continue
+
+            # The archive lives on 'default', the users on their own database
+            with transaction.atomic(), transaction.atomic(using=alias):
+                # Re-check the policy under lock in case a user logged in meanwhile
+                users = list(
+                    candidates.filter(pk__in=batch_pks)
+                    .select_for_update()
+                    .prefetch_related('groups', 'user_permissions')
+                )
+                ArchivedUser.objects.bulk_create([
+                    ArchivedUser(
+                        profile_picture=user.profile_picture.name or None,
+                        group_ids=[group.pk for group in user.groups.all()],
+                        permission_ids=[permission.pk for permission in user.user_permissions.all()],
+                        **{field: getattr(user, field) for field in ARCHIVED_FIELDS},
+                    )
+                    for user in users
+                ])
+                User.objects.using(alias).filter(pk__in=[user.pk for user in users]).delete()
+
+            archived += len(users)
+            if log:
+                log(f'Archived {len(users)} user(s) from {alias} up to id {last_pk}')
+            if sleep:
+                time.sleep(sleep)
+
+    return archived
+
+
+def restore_user(archived_user):
+    """Move an archived user back into the User table and return it"""
+    # Back onto the shard encoded in the user's id, which tokens and lookups by id expect
+    using = shard_for_user_id(archived_user.id) if sharding_enabled() else DEFAULT_DB_ALIAS
+    try:
+        # The archive stays on 'default'; the user's rows go to their own database
+        with transaction.atomic(), transaction.atomic(using=using):
+            user = User(
+                profile_picture=archived_user.profile_picture,
+                **{field: getattr(archived_user, field) for field in ARCHIVED_FIELDS},
+            )
+            # Not a new registration as far as the live metrics are concerned
+            user._restored_from_archive = True
+            user.save(using=using, force_insert=True)
+            # auto_now_add overwrites the signup date on insert; updated_at stays
+            # at now so the change feed reports the user again
+            User.objects.using(using).filter(pk=user.pk).update(created_at=archived_user.created_at)
+            user.groups.set(archived_user.group_ids)
+            user.user_permissions.set(archived_user.permission_ids)
+            archived_user.delete()
+    except IntegrityError as e:
+        # Left to the email unique index, so a concurrent sign-up cannot slip in
+        if not is_email_conflict(e):
+            raise
+        raise RestoreConflict(f'A user with email {archived_user.email} already exists.') from e
+
+    user.refresh_from_db()
+    return user
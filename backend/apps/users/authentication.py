@@ -0,0 +1,111 @@
+from datetime import timedelta
+from django.conf import settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+from rest_framework_simplejwt.tokens import BlacklistMixin, RefreshToken, Token
+from rest_framework_simplejwt.utils import datetime_from_epoch
+from .sharding import shard_for_user_id, sharding_enabled, user_databases
+
+# Tokens issued before this claim existed are treated as version 0
+TOKEN_VERSION_CLAIM = 'token_version'
+# Database alias of the user's shard, only set when sharding is enabled
+USER_SHARD_CLAIM = 'shard'
+
+
+def user_database_for_token(token):
+    """Alias of the database holding the token's user"""
+    alias = token.get(USER_SHARD_CLAIM)
+    if alias in user_databases():
+        return alias
+    return shard_for_user_id(token[api_settings.USER_ID_CLAIM])
+
+
+class ShardedRefreshToken(RefreshToken):
+    """Refresh token that can be issued to users living on a shard"""
+
+    @classmethod
+    def for_user(cls, user):
+        """Record the outstanding token without a cross-database user reference"""
+        if not sharding_enabled():
+            return super().for_user(user)
+
+        # The blacklist tables stay in the default database, which has no
+        # row for a sharded user, so the token is tracked by jti alone
+        token = super(BlacklistMixin, cls).for_user(user)
+        OutstandingToken.objects.create(
+            jti=token[api_settings.JTI_CLAIM],
+            token=str(token),
+            created_at=token.current_time,
+            expires_at=datetime_from_epoch(token['exp']),
+        )
+        return token
+
+
+class VersionedJWTAuthentication(JWTAuthentication):
+    """JWT authentication that rejects tokens revoked by a version bump"""
+
+    def get_user(self, validated_token):
+        """Return the token's user if the token has not been revoked"""
+        if sharding_enabled():
+            user = self.get_sharded_user(validated_token)
+        else:
+            user = super().get_user(validated_token)
+
+        if validated_token.get(TOKEN_VERSION_CLAIM, 0) != user.token_version:
+            raise AuthenticationFailed('Token has been revoked.', code='token_revoked')
+
+        return user
+
+    def get_sharded_user(self, validated_token):
+        """Look the user up directly on their shard"""
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken('Token contained no recognizable user identification')
+
+        alias = user_database_for_token(validated_token)
+        try:
+            user = self.user_model.objects.using(alias).get(
+                **{api_settings.USER_ID_FIELD: validated_token[api_settings.USER_ID_CLAIM]}
+            )
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+
+        if not user.is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+
+        return user
+
+
+class MetricsStreamTicket(Token):
+    """Short-lived token that only opens the metrics stream, safe to put in a logged URL"""
+    token_type = 'metrics_stream'
+
+    @property
+    def lifetime(self):
+        return timedelta(seconds=settings.METRICS_STREAM_TICKET_LIFETIME)
+
+    @classmethod
+    def for_user(cls, user):
+        """Ticket carrying the claims VersionedJWTAuthentication checks"""
+        token = super().for_user(user)
+        token[TOKEN_VERSION_CLAIM] = user.token_version
+        if sharding_enabled():
+            token[USER_SHARD_CLAIM] = user._state.db
+        return token
+
+
+class StreamTicketAuthentication(VersionedJWTAuthentication):
+    """Read a MetricsStreamTicket from ?ticket= for EventSource clients"""
+
+    def authenticate(self, request):
+        """Authenticate from the query string, or defer to other classes"""
+        raw_ticket = request.query_params.get('ticket')
+        if not raw_ticket:
+            return None
+
+        try:
+            ticket = MetricsStreamTicket(raw_ticket)
+        except TokenError as e:
+            raise InvalidToken(str(e))
+        return self.get_user(ticket), ticket
@@ -0,0 +1,64 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from apps.core.cache import bump_namespace, namespace_version, namespaced_key
+from .sharding import shard_for_user_id, sharding_enabled
+
+# Bumping the namespace version drops every cached permission set at once
+PERMISSIONS_NAMESPACE = 'users:perms'
+
+
+def get_permissions_version():
+    """Current global permissions version, shared across processes via the cache"""
+    return namespace_version(PERMISSIONS_NAMESPACE)
+
+
+def bump_permissions_version():
+    """Invalidate every cached permission set, e.g. after a group's permissions change"""
+    bump_namespace(PERMISSIONS_NAMESPACE)
+
+
+def invalidate_user_permissions(user_ids):
+    """Drop the cached permission sets of the given users"""
+    cache.delete_many([namespaced_key(PERMISSIONS_NAMESPACE, user_id) for user_id in user_ids])
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend that keeps resolved permission sets in the default cache.
+
+    Invalidations reach other processes only through the cache they share
+    (the L2 of the tiered default cache). With a per-process cache such as
+    LocMemCache, other workers serve stale sets for up to
+    PERMISSION_CACHE_TIMEOUT seconds.
+    """
+
+    def _get_permissions(self, user_obj, obj, from_name):
+        """Resolve permissions from the cache, querying only on a miss"""
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+
+        perm_cache_name = '_%s_perm_cache' % from_name
+        if not hasattr(user_obj, perm_cache_name):
+            key = namespaced_key(PERMISSIONS_NAMESPACE, user_obj.pk)
+            cached = cache.get(key) or {}
+            if from_name not in cached:
+                cached[from_name] = super()._get_permissions(user_obj, obj, from_name)
+                cache.set(key, cached, settings.PERMISSION_CACHE_TIMEOUT)
+            setattr(user_obj, perm_cache_name, cached[from_name])
+        return getattr(user_obj, perm_cache_name)
+
+    def _get_group_permissions(self, user_obj):
+        """Join through the memberships on the user's own shard"""
+        return super()._get_group_permissions(user_obj).using(user_obj._state.db)
+
+    def get_user(self, user_id):
+        """Load session users from the shard their id encodes"""
+        if not sharding_enabled():
+            return super().get_user(user_id)
+        UserModel = get_user_model()
+        try:
+            user = UserModel._default_manager.using(shard_for_user_id(user_id)).get(pk=user_id)
+        except (UserModel.DoesNotExist, ValueError):
+            return None
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,487 @@
+"""
+Bulk dump and restore of the User table, e.g. to clone production users
+into staging for load tests.
+
+A dump is a directory holding manifest.json and one CSV file per table
+(gzipped when compress=True):
+
+    users.csv             every concrete User column
+    user_groups.csv       user_id, group name
+    user_permissions.csv  user_id, app_label, model, codename
+
+Groups and permissions are written by natural key, since their ids differ
+between databases; restoring creates missing groups and skips permissions
+the target database does not know. On PostgreSQL the users table streams
+through COPY in both directions, so its rows never pass through Python.
+Other databases (SQLite) read rows in batches and insert them with
+executemany. Dumps are portable between the two.
+
+scrub=True replaces emails, names, passwords and pictures while the rows
+are read, so personal data never leaves the source database. Ids, roles,
+statuses and timestamps are kept, and the scrubbed emails stay unique.
+
+CSV cannot tell NULL from an empty string, so empty text columns come back
+as '' (which is how Django stores a missing file or string anyway).
+"""
+import csv
+import gzip
+import io
+import itertools
+import json
+import os
+from django.contrib.auth.models import Group, Permission
+from django.core.management.color import no_style
+from django.db import IntegrityError, connections, models, router, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .backends import bump_permissions_version
+from .models import User, UserTombstone
+
+FORMAT_VERSION = 1
+MANIFEST = 'manifest.json'
+SCRUBBED_DOMAIN = 'scrubbed.invalid'
+
+# SQL replacing each personal column of users_user when scrubbing
+SCRUBBED_COLUMNS = {
+    'password': "'!scrubbed'",
+    'email': f"'user' || id || '@{SCRUBBED_DOMAIN}'",
+    'email_domain': f"'{SCRUBBED_DOMAIN}'",
+    'full_name': "'User ' || id",
+    'profile_picture': "''",
+}
+
+
+class BulkCopyError(Exception):
+    """The dump cannot be written or restored"""
+
+
+class _Counter:
+    """Counts rows as they stream past and reports them every `every` rows"""
+
+    def __init__(self, table, progress, every):
+        self.table = table
+        self.progress = progress
+        self.every = every
+        self.rows = 0
+        self.reported = 0
+
+    def add(self, rows):
+        self.rows += rows
+        if self.progress and self.rows - self.reported >= self.every:
+            self.reported = self.rows
+            self.progress(self.table, self.rows)
+
+
+class _CountingFile:
+    """File wrapper counting the CSV lines COPY writes or reads through it"""
+
+    def __init__(self, file, counter):
+        self.file = file
+        self.counter = counter
+
+    def write(self, data):
+        self.counter.add(data.count('\n'))
+        return self.file.write(data)
+
+    def read(self, size=-1):
+        data = self.file.read(size)
+        self.counter.add(data.count('\n'))
+        return data
+
+    def readline(self, size=-1):
+        data = self.file.readline(size)
+        self.counter.add(data.count('\n'))
+        return data
+
+
+class _CSVStream:
+    """Readable file of CSV lines rendered from an iterable of rows, for COPY FROM"""
+
+    def __init__(self, rows):
+        self.rows = iter(rows)
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer, lineterminator='\n')
+        self.pending = ''
+
+    def read(self, size=-1):
+        while size < 0 or len(self.pending) < size:
+            chunk = list(itertools.islice(self.rows, 1000))
+            if not chunk:
+                break
+            self.buffer.seek(0)
+            self.buffer.truncate()
+            self.writer.writerows(chunk)
+            self.pending += self.buffer.getvalue()
+        if size < 0:
+            size = len(self.pending)
+        data, self.pending = self.pending[:size], self.pending[size:]
+        return data
+
+
+def _open(path, mode):
+    if path.endswith('.gz'):
+        # Level 1: most of the size win at a fraction of the CPU cost
+        return gzip.open(path, mode + 't', compresslevel=1, encoding='utf-8', newline='')
+    return open(path, mode, encoding='utf-8', newline='')
+
+
+def _membership_queries():
+    """Dump queries of the group and permission memberships, by natural key"""
+    groups = User.groups.through._meta.db_table
+    permissions = User.user_permissions.through._meta.db_table
+    return {
+        'user_groups': (
+            f'SELECT ug.user_id, g.name FROM {groups} ug '
+            f'JOIN {Group._meta.db_table} g ON g.id = ug.group_id ORDER BY ug.id'
+        ),
+        'user_permissions': (
+            f'SELECT up.user_id, ct.app_label, ct.model, p.codename FROM {permissions} up '
+            f'JOIN {Permission._meta.db_table} p ON p.id = up.permission_id '
+            'JOIN django_content_type ct ON ct.id = p.content_type_id ORDER BY up.id'
+        ),
+    }
+
+
+def _select_expression(connection, field, scrub):
+    """SQL reading a users_user column the way PostgreSQL's CSV output spells it"""
+    column = connection.ops.quote_name(field.column)
+    if scrub and field.column in SCRUBBED_COLUMNS:
+        return SCRUBBED_COLUMNS[field.column]
+    if connection.vendor == 'sqlite':
+        # SQLite stores naive UTC text and 0/1; converting here keeps Python out of the loop
+        if isinstance(field, models.DateTimeField):
+            return f"{column} || '+00:00'"
+        if isinstance(field, models.BooleanField):
+            return f"CASE {column} WHEN 1 THEN 't' WHEN 0 THEN 'f' END"
+    return column
+
+
+def _users_query(connection, scrub):
+    fields = User._meta.concrete_fields
+    selected = ', '.join(
+        f'{_select_expression(connection, field, scrub)} AS {connection.ops.quote_name(field.column)}'
+        for field in fields
+    )
+    return (
+        [field.column for field in fields],
+        f'SELECT {selected} FROM {connection.ops.quote_name(User._meta.db_table)} ORDER BY id',
+    )
+
+
+def _copy_out(connection, sql, columns, path, counter, batch_size):
+    """Write the rows of a query to a CSV file with a header; returns the row count"""
+    with _open(path, 'w') as file, connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            file.write(','.join(columns) + '\n')
+            cursor.copy_expert(f'COPY ({sql}) TO STDOUT WITH (FORMAT csv)', _CountingFile(file, counter))
+            return cursor.rowcount if cursor.rowcount >= 0 else counter.rows
+        writer = csv.writer(file, lineterminator='\n')
+        writer.writerow(columns)
+        cursor.execute(sql)
+        while rows := cursor.fetchmany(batch_size):
+            writer.writerows(rows)
+            counter.add(len(rows))
+        return counter.rows
+
+
+def dump_users(path, using='default', scrub=False, compress=False, batch_size=10000, progress=None, every=100000):
+    """Write every user with their groups and permissions to the directory `path`.
+
+    Returns the manifest, which records the row count of each table.
+    """
+    connection = connections[using]
+    os.makedirs(path, exist_ok=True)
+    suffix = '.csv.gz' if compress else '.csv'
+    columns, users_sql = _users_query(connection, scrub)
+    sections = {'users': users_sql, **_membership_queries()}
+    headers = {'users': columns, 'user_groups': ['user_id', 'name'],
+               'user_permissions': ['user_id', 'app_label', 'model', 'codename']}
+
+    tables = {}
+    # One snapshot, so the membership rows match the users written
+    with transaction.atomic(using=using):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY')
+        for name, sql in sections.items():
+            filename = name + suffix
+            counter = _Counter(name, progress, every)
+            rows = _copy_out(connection, sql, headers[name], os.path.join(path, filename), counter, batch_size)
+            tables[name] = {'file': filename, 'rows': rows, 'columns': headers[name]}
+
+    manifest = {
+        'format': FORMAT_VERSION,
+        'created_at': timezone.now().isoformat(),
+        'vendor': connection.vendor,
+        'scrubbed': scrub,
+        'tables': tables,
+    }
+    with open(os.path.join(path, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def read_manifest(path):
+    try:
+        with open(os.path.join(path, MANIFEST)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        raise BulkCopyError(f'{path} is not a user dump: {e}') from e
+    if manifest.get('format') != FORMAT_VERSION:
+        raise BulkCopyError(f"Unsupported dump format {manifest.get('format')!r}")
+    return manifest
+
+
+def _is_text(field):
+    return isinstance(field, (models.CharField, models.TextField, models.FileField))
+
+
+def _parser(field, connection):
+    """Converts a CSV value of this field into what executemany should insert, or None to pass it through"""
+    # CSV cannot tell NULL from '' once read back: empty text stays '', other empty values are NULL
+    empty = '' if _is_text(field) or not field.null else None
+    if isinstance(field, models.DateTimeField):
+        def parse(value):
+            if not value:
+                return empty
+            # UTC values, as both dump paths write them, only lose their offset
+            if value.endswith('+00'):
+                return value[:-3]
+            if value.endswith('+00:00'):
+                return value[:-6]
+            return connection.ops.adapt_datetimefield_value(parse_datetime(value))
+    elif isinstance(field, models.BooleanField):
+        def parse(value):
+            return value.lower() in ('t', 'true', '1') if value else empty
+    elif empty is None:
+        def parse(value):
+            return value if value else None
+    else:
+        # Integer text is stored as integers by SQLite's column affinity
+        return None
+    return parse
+
+
+def _converted(rows, parsers):
+    """Rows with each value that needs it converted by its column's parser"""
+    conversions = [(index, parse) for index, parse in enumerate(parsers) if parse is not None]
+    for row in rows:
+        for index, parse in conversions:
+            row[index] = parse(row[index])
+        yield row
+
+
+def _insert_sql(connection, table, columns):
+    quote = connection.ops.quote_name
+    return (
+        f'INSERT INTO {quote(table)} ({", ".join(quote(column) for column in columns)}) '
+        f'VALUES ({", ".join(["%s"] * len(columns))})'
+    )
+
+
+def _copy_in_rows(connection, table, columns, rows, counter, batch_size):
+    """Insert rows (of Python values) into a table"""
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.copy_expert(
+                f'COPY {quote(table)} ({", ".join(quote(column) for column in columns)}) FROM STDIN WITH (FORMAT csv)',
+                _CountingFile(_CSVStream(rows), counter),
+            )
+            return
+        sql = _insert_sql(connection, table, columns)
+        rows = iter(rows)
+        while batch := list(itertools.islice(rows, batch_size)):
+            cursor.executemany(sql, batch)
+            counter.add(len(batch))
+
+
+def _restore_users_table(connection, path, columns, counter, batch_size):
+    fields = {field.column: field for field in User._meta.concrete_fields}
+    unknown = [column for column in columns if column not in fields]
+    if unknown:
+        raise BulkCopyError(f"Dump has columns the users table lacks: {', '.join(unknown)}")
+    table = User._meta.db_table
+
+    with _open(path, 'r') as file:
+        if connection.vendor == 'postgresql':
+            # Unquoted empty values are NULL in CSV COPY; read them as '' in text columns,
+            # as the executemany path does
+            quote = connection.ops.quote_name
+            text = ', '.join(quote(column) for column in columns if _is_text(fields[column]))
+            with connection.cursor() as cursor:
+                cursor.copy_expert(
+                    f'COPY {quote(table)} ({", ".join(quote(column) for column in columns)}) FROM STDIN WITH '
+                    f'(FORMAT csv, HEADER true, FORCE_NOT_NULL ({text}))',
+                    _CountingFile(file, counter),
+                )
+            return
+        reader = csv.reader(file)
+        next(reader, None)
+        rows = _converted(reader, [_parser(fields[column], connection) for column in columns])
+        _copy_in_rows(connection, table, columns, rows, counter, batch_size)
+
+
+def _read_rows(path):
+    with _open(path, 'r') as file:
+        reader = csv.reader(file)
+        next(reader, None)
+        yield from reader
+
+
+def _secondary_indexes(connection, table):
+    """(name, CREATE statement) of the table's indexes that no constraint depends on"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT i.relname, pg_get_indexdef(i.oid) FROM pg_index x '
+                'JOIN pg_class i ON i.oid = x.indexrelid '
+                'WHERE x.indrelid = %s::regclass '
+                'AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = x.indexrelid)',
+                [table],
+            )
+        elif connection.vendor == 'sqlite':
+            # Indexes SQLite creates for UNIQUE/PRIMARY KEY columns have no SQL
+            cursor.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = %s AND sql IS NOT NULL",
+                [table],
+            )
+        else:
+            return []
+        return cursor.fetchall()
+
+
+def _truncate(connection):
+    """Delete every user and the rows that belong to them"""
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for relation in User._meta.related_objects:
+            if relation.many_to_many:
+                continue
+            table, column = quote(relation.related_model._meta.db_table), quote(relation.field.column)
+            if relation.on_delete is models.SET_NULL:
+                cursor.execute(f'UPDATE {table} SET {column} = NULL WHERE {column} IS NOT NULL')
+            else:
+                cursor.execute(f'DELETE FROM {table} WHERE {column} IS NOT NULL')
+        for field in User._meta.many_to_many:
+            cursor.execute(f'DELETE FROM {quote(field.remote_field.through._meta.db_table)}')
+        cursor.execute(f'DELETE FROM {quote(User._meta.db_table)}')
+
+
+def _tombstone_users(using, batch_size):
+    """Record every user as deleted, as post_delete would, before a truncate bypasses it"""
+    deleted_at = timezone.now()
+    tombstones = UserTombstone.objects.db_manager(router.db_for_write(UserTombstone))
+    ids = User.objects.using(using).values_list('pk', flat=True).order_by().iterator(chunk_size=batch_size)
+    while batch := list(itertools.islice(ids, batch_size)):
+        tombstones.filter(user_id__in=batch).delete()
+        tombstones.bulk_create([UserTombstone(user_id=pk, deleted_at=deleted_at) for pk in batch])
+
+
+def _stamp_restored(using, ids, batch_size):
+    """Move updated_at of restored users to now, so the change feed and the columnar snapshot pick them up.
+
+    ids=None stamps every user (the table held only restored ones).
+    """
+    users = User.objects.using(using)
+    stamped_at = timezone.now()
+    if ids is None:
+        users.update(updated_at=stamped_at)
+        return
+    while batch := list(itertools.islice(ids, batch_size)):
+        users.filter(pk__in=batch).update(updated_at=stamped_at)
+
+
+def restore_users(path, using='default', truncate=False, batch_size=10000, progress=None, every=100000):
+    """Load a dump written by dump_users() into a database, in one transaction.
+
+    With truncate=True the existing users are deleted first, leaving
+    tombstones for the change feed; otherwise a user id or email already
+    present aborts the restore with BulkCopyError. Restored users get a
+    fresh updated_at, so downstream mirrors see them. Returns a dict of
+    rows restored per table, plus the number of permission assignments
+    skipped because the permission does not exist here.
+    """
+    manifest = read_manifest(path)
+    tables = manifest['tables']
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    restored = {}
+
+    with transaction.atomic(using=using):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT 1 FROM {quote(User._meta.db_table)} LIMIT 1')
+            empty = truncate or cursor.fetchone() is None
+
+        # Into an empty table, building the indexes once at the end beats
+        # updating them row by row (and the truncate needs not touch them)
+        indexes = _secondary_indexes(connection, User._meta.db_table) if empty else []
+        with connection.cursor() as cursor:
+            for name, _ in indexes:
+                cursor.execute(f'DROP INDEX {quote(name)}')
+        if truncate:
+            _tombstone_users(using, batch_size)
+            _truncate(connection)
+
+        counter = _Counter('users', progress, every)
+        users_path = os.path.join(path, tables['users']['file'])
+        try:
+            _restore_users_table(connection, users_path, tables['users']['columns'], counter, batch_size)
+        except (IntegrityError, connection.Database.IntegrityError) as e:
+            # COPY errors come straight from the driver, without Django's wrapping
+            raise BulkCopyError(f'Dump clashes with existing users (restore with truncate to replace them): {e}') from e
+        restored['users'] = tables['users']['rows']
+
+        with connection.cursor() as cursor:
+            for _, create in indexes:
+                cursor.execute(create)
+
+        names = {name for _, name in _read_rows(os.path.join(path, tables['user_groups']['file']))}
+        existing = set(Group.objects.using(using).filter(name__in=names).values_list('name', flat=True))
+        Group.objects.using(using).bulk_create([Group(name=name) for name in names - existing])
+        group_ids = dict(Group.objects.using(using).filter(name__in=names).values_list('name', 'id'))
+        counter = _Counter('user_groups', progress, every)
+        _copy_in_rows(
+            connection, User.groups.through._meta.db_table, ['user_id', 'group_id'],
+            ((user_id, group_ids[name]) for user_id, name in _read_rows(os.path.join(path, tables['user_groups']['file']))),
+            counter, batch_size,
+        )
+        restored['user_groups'] = counter.rows
+
+        permission_ids = {
+            (app_label, model, codename): pk
+            for pk, app_label, model, codename in Permission.objects.using(using).values_list(
+                'pk', 'content_type__app_label', 'content_type__model', 'codename'
+            )
+        }
+        skipped = 0
+
+        def permission_rows():
+            nonlocal skipped
+            for user_id, *key in _read_rows(os.path.join(path, tables['user_permissions']['file'])):
+                pk = permission_ids.get(tuple(key))
+                if pk is None:
+                    skipped += 1
+                else:
+                    yield user_id, pk
+
+        counter = _Counter('user_permissions', progress, every)
+        _copy_in_rows(
+            connection, User.user_permissions.through._meta.db_table, ['user_id', 'permission_id'],
+            permission_rows(), counter, batch_size,
+        )
+        restored['user_permissions'] = counter.rows
+        restored['skipped_permissions'] = skipped
+
+        id_column = tables['users']['columns'].index('id')
+        _stamp_restored(using, None if empty else (row[id_column] for row in _read_rows(users_path)), batch_size)
+
+        with connection.cursor() as cursor:
+            # Explicit ids leave PostgreSQL sequences behind; SQLite needs nothing
+            for sql in connection.ops.sequence_reset_sql(no_style(), [User]):
+                cursor.execute(sql)
+            if connection.vendor == 'postgresql':
+                cursor.execute(f'ANALYZE {quote(User._meta.db_table)}')
+
+    bump_permissions_version()
+    return restored
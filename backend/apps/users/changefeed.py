@@ -0,0 +1,96 @@
+"""
+Incremental change feed of users for downstream mirrors.
+
+Changes are read in ascending ``(changed_at, id)`` order after an opaque
+cursor: upserts come from users ordered by ``(updated_at, id)`` and deletes
+from UserTombstone ordered by ``(deleted_at, user_id)``, both served by an
+index. Consumers store ``next_cursor`` and resume from it, so each poll
+reads only the rows changed since the last one.
+
+Changes younger than CHANGE_FEED_LAG_SECONDS are held back: a transaction
+that stamped updated_at earlier but commits later would otherwise land
+behind a cursor that has already moved past it.
+"""
+import base64
+import binascii
+import heapq
+import itertools
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import User, UserTombstone
+from .sharding import scatter
+
+
+class InvalidCursor(ValueError):
+    """The cursor was not produced by this feed"""
+
+
+def encode_cursor(changed_at, pk):
+    """Opaque cursor for the position just after (changed_at, pk)"""
+    return base64.urlsafe_b64encode(f'{changed_at.isoformat()}/{pk}'.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(changed_at, pk) position encoded in a cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        changed_at, pk = raw.rsplit('/', 1)
+        return datetime.fromisoformat(changed_at), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise InvalidCursor('Invalid cursor') from e
+
+
+def start_position(updated_since):
+    """Position before every change at or after an ISO 8601 timestamp"""
+    try:
+        # An unescaped '+' of the UTC offset arrives as a space
+        changed_at = parse_datetime(updated_since.strip().replace(' ', '+'))
+    except ValueError:
+        changed_at = None
+    if changed_at is None:
+        raise InvalidCursor('updated_since must be an ISO 8601 datetime')
+    if timezone.is_naive(changed_at):
+        changed_at = timezone.make_aware(changed_at, dt_timezone.utc)
+    return changed_at, -1
+
+
+def _after(position, time_field, id_field):
+    """Rows strictly after `position` in (time_field, id_field) order"""
+    if position is None:
+        return Q()
+    changed_at, pk = position
+    return Q(**{f'{time_field}__gt': changed_at}) | Q(**{time_field: changed_at, f'{id_field}__gt': pk})
+
+
+def read_changes(position=None, limit=100):
+    """Up to `limit` changes after `position`; returns (changes, next position, has_more).
+
+    Each change is ('upsert', changed_at, id, user) or ('delete', changed_at, id, None).
+    """
+    until = timezone.now() - timedelta(seconds=settings.CHANGE_FEED_LAG_SECONDS)
+
+    def upserts(alias):
+        users = (
+            User.objects.using(alias)
+            .filter(_after(position, 'updated_at', 'id'), updated_at__lt=until)
+            .order_by('updated_at', 'id')[:limit + 1]
+        )
+        return [('upsert', user.updated_at, user.pk, user) for user in users]
+
+    deletes = [
+        ('delete', tombstone.deleted_at, tombstone.user_id, None)
+        for tombstone in UserTombstone.objects
+        .filter(_after(position, 'deleted_at', 'user_id'), deleted_at__lt=until)
+        .order_by('deleted_at', 'user_id')[:limit + 1]
+    ]
+    merged = heapq.merge(*scatter(upserts), deletes, key=lambda change: (change[1], change[2]))
+    changes = list(itertools.islice(merged, limit + 1))
+
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    if changes:
+        position = (changes[-1][1], changes[-1][2])
+    return changes, position, has_more
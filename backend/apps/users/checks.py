@@ -0,0 +1,38 @@
+from pathlib import Path
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+from .jwt_keys import KID_FORMAT, key_id_time
+
+
+@register(Tags.security)
+def check_jwt_keys_dir(app_configs, **kwargs):
+    """JWT_KEYS_DIR, when set, must be a directory of <kid>.pem signing keys"""
+    if not settings.JWT_KEYS_DIR:
+        return []
+    directory = Path(settings.JWT_KEYS_DIR)
+    if not directory.is_dir():
+        return [Error(
+            f'JWT_KEYS_DIR {settings.JWT_KEYS_DIR!r} is not a directory, so no token can be signed.',
+            hint='Create a first key with `manage.py rotate_jwt_key`, or unset JWT_KEYS_DIR to sign with SECRET_KEY.',
+            id='users.E001',
+        )]
+    ignored = sorted(path.name for path in directory.glob('*.pem') if key_id_time(path.stem) is None)
+    if ignored:
+        return [Warning(
+            f"Ignoring JWT keys not named by a key id: {', '.join(ignored)}.",
+            hint=f'Name key files <kid>.pem with the key creation time as kid ({KID_FORMAT}).',
+            id='users.W001',
+        )]
+    return []
+
+
+@register(Tags.security)
+def check_jwt_accept_hs256(app_configs, **kwargs):
+    """HS256 tokens are only meant to be accepted during the switch to signing keys"""
+    if not (settings.JWT_KEYS_DIR and settings.JWT_ACCEPT_HS256):
+        return []
+    return [Warning(
+        'JWT_ACCEPT_HS256 is on, so tokens signed with SECRET_KEY stay valid whatever keys are rotated.',
+        hint='Turn it off once REFRESH_TOKEN_LIFETIME has passed since JWT_KEYS_DIR was set.',
+        id='users.W002',
+    )]
@@ -0,0 +1,281 @@
+"""
+Columnar snapshot of the user columns behind the statistics endpoint.
+
+With ANALYTICS_SNAPSHOT_DIR set (and NumPy installed), id, created_at,
+last_login, status and role of every user are kept as flat arrays: times
+as int64 epoch microseconds, status and role as int8 codes. That is 26
+bytes per user, so a million users fit in about 26 MB. The counts and
+histograms of /api/users/statistics/ are then computed with vectorized
+NumPy operations instead of grouped queries over the whole table.
+
+The arrays are saved as .npy files and memory-mapped, so all workers on a
+host share one copy through the page cache. A refresh reads only the users
+whose updated_at moved, and the tombstones of deleted users, since the
+last sync. It writes a new version next to the old one and then switches
+the CURRENT pointer, so readers never see a half-written snapshot.
+"""
+import fcntl
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+from django.conf import settings
+from django.utils import timezone
+from .models import User, UserTombstone
+from .sharding import scatter
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; statistics fall back to ORM queries
+    np = None
+
+COLUMNS = ('id', 'created_at', 'last_login', 'status', 'role')
+STATUS_CODES = {User.Status.ACTIVE: 0, User.Status.INACTIVE: 1}
+ROLE_CODES = {User.Role.USER: 0, User.Role.ADMIN: 1}
+# Sorts before every real timestamp, so a missing last_login counts as dormant
+NULL_TIME = -2 ** 63
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+DAY_US = 86_400_000_000
+AGE_BUCKETS = ((30, '0-30 days'), (90, '30-90 days'), (180, '90-180 days'), (365, '180-365 days'))
+OLDEST_AGE_BUCKET = '1+ years'
+
+
+def to_epoch_us(value):
+    """Microseconds since the epoch, or NULL_TIME for None"""
+    if value is None:
+        return NULL_TIME
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def from_epoch_us(value):
+    return EPOCH + timedelta(microseconds=int(value))
+
+
+def _read_columns(queryset):
+    """Column arrays for the users of a queryset"""
+    ids, created, last_login, statuses, roles = [], [], [], [], []
+    rows = queryset.values_list('id', 'created_at', 'last_login', 'status', 'role').order_by()
+    for pk, created_at, last_seen, status, role in rows.iterator(chunk_size=10000):
+        ids.append(pk)
+        created.append(to_epoch_us(created_at))
+        last_login.append(to_epoch_us(last_seen))
+        statuses.append(STATUS_CODES[status])
+        roles.append(ROLE_CODES[role])
+    return {
+        'id': np.array(ids, dtype=np.int64),
+        'created_at': np.array(created, dtype=np.int64),
+        'last_login': np.array(last_login, dtype=np.int64),
+        'status': np.array(statuses, dtype=np.int8),
+        'role': np.array(roles, dtype=np.int8),
+    }
+
+
+def _concat(parts):
+    """Concatenate column dicts"""
+    return {name: np.concatenate([part[name] for part in parts]) for name in COLUMNS}
+
+
+class UserSnapshot:
+    """Column arrays of all users as of `synced_until`"""
+
+    def __init__(self, columns, synced_until, version=None):
+        self.columns = columns
+        self.synced_until = synced_until
+        self.version = version
+
+    def __len__(self):
+        return len(self.columns['id'])
+
+    @classmethod
+    def build(cls, until):
+        """Read every user from every user database"""
+        parts = scatter(lambda alias: _read_columns(User.objects.using(alias)))
+        return cls(_concat(parts), until)
+
+    def refreshed(self, until):
+        """Snapshot with the users changed or deleted in [synced_until, until) applied"""
+        changed = _concat(scatter(lambda alias: _read_columns(
+            User.objects.using(alias).filter(updated_at__gte=self.synced_until, updated_at__lt=until)
+        )))
+        deleted = np.fromiter(
+            UserTombstone.objects
+            .filter(deleted_at__gte=self.synced_until, deleted_at__lt=until)
+            .values_list('user_id', flat=True),
+            dtype=np.int64,
+        )
+        if not len(changed['id']) and not len(deleted):
+            return UserSnapshot(self.columns, until, self.version)
+
+        # Drop the old version of every touched row, then append the current one
+        keep = ~np.isin(self.columns['id'], np.concatenate([changed['id'], deleted]))
+        columns = {name: np.concatenate([self.columns[name][keep], changed[name]]) for name in COLUMNS}
+        return UserSnapshot(columns, until)
+
+    def statistics(self, now):
+        """Same counts and histograms as analytics.database_statistics()"""
+        created = self.columns['created_at']
+        last_login = self.columns['last_login']
+        status = self.columns['status']
+        role = self.columns['role']
+        now_us = to_epoch_us(now)
+        thirty_days_ago = now_us - 30 * DAY_US
+        recent = created >= thirty_days_ago
+
+        counts = {
+            'total_users': len(self),
+            'active_users': int(np.count_nonzero(status == STATUS_CODES[User.Status.ACTIVE])),
+            'inactive_users': int(np.count_nonzero(status == STATUS_CODES[User.Status.INACTIVE])),
+            'admin_users': int(np.count_nonzero(role == ROLE_CODES[User.Role.ADMIN])),
+            'regular_users': int(np.count_nonzero(role == ROLE_CODES[User.Role.USER])),
+            'recent_registrations': int(np.count_nonzero(recent)),
+            'dormant_accounts': int(np.count_nonzero(last_login < thirty_days_ago)),
+        }
+
+        days = created // DAY_US
+        values, totals = np.unique(days[recent], return_counts=True)
+        growth_data = [
+            {'date': (EPOCH + timedelta(days=int(day))).date(), 'count': int(count)}
+            for day, count in zip(values, totals)
+        ]
+
+        # Whole months since January 1970
+        last_year = created >= now_us - 365 * DAY_US
+        months = created[last_year].astype('datetime64[us]').astype('datetime64[M]').astype(np.int64)
+        values, totals = np.unique(months, return_counts=True)
+        monthly_data = [
+            {
+                'month': datetime(1970 + int(month) // 12, int(month) % 12 + 1, 1, tzinfo=dt_timezone.utc),
+                'count': int(count),
+            }
+            for month, count in zip(values, totals)
+        ]
+
+        # 1970-01-01 was a Thursday; 1 = Sunday ... 7 = Saturday, as ExtractWeekDay
+        weekdays = np.bincount((days + 4) % 7, minlength=7)
+        day_of_week_data = [
+            {'day_of_week': weekday + 1, 'count': int(count)}
+            for weekday, count in enumerate(weekdays) if count
+        ]
+
+        age_days = (now_us - created) // DAY_US
+        buckets = np.bincount(
+            np.searchsorted([limit for limit, _ in AGE_BUCKETS], age_days, side='right'),
+            minlength=len(AGE_BUCKETS) + 1,
+        )
+        labels = [label for _, label in AGE_BUCKETS] + [OLDEST_AGE_BUCKET]
+        age_distribution = {label: int(count) for label, count in zip(labels, buckets) if count}
+
+        return {
+            **counts,
+            'growth_data': growth_data,
+            'monthly_data': monthly_data,
+            'day_of_week_data': day_of_week_data,
+            'age_distribution': age_distribution,
+        }
+
+    def save(self, directory):
+        """Write a new version (or only move the pointer if the columns are unchanged)"""
+        directory = Path(directory)
+        if self.version is None:
+            self.version = str(time.time_ns())
+            staging = directory / f'.{self.version}'
+            staging.mkdir(parents=True)
+            for name in COLUMNS:
+                np.save(staging / f'{name}.npy', self.columns[name])
+            staging.rename(directory / self.version)
+
+        pointer = directory / '.CURRENT'
+        pointer.write_text(json.dumps({'version': self.version, 'synced_until': to_epoch_us(self.synced_until)}))
+        os.replace(pointer, directory / 'CURRENT')
+
+        # Workers still mapping an old version keep it readable after the unlink
+        for path in directory.iterdir():
+            if path.is_dir() and path.name != self.version:
+                shutil.rmtree(path, ignore_errors=True)
+
+    @classmethod
+    def load(cls, directory, pointer=None):
+        """Memory-map the current version, or None if there is none yet"""
+        directory = Path(directory)
+        pointer = pointer or read_pointer(directory)
+        if pointer is None:
+            return None
+        columns = {
+            name: np.load(directory / pointer['version'] / f'{name}.npy', mmap_mode='r')
+            for name in COLUMNS
+        }
+        return cls(columns, from_epoch_us(pointer['synced_until']), pointer['version'])
+
+
+def read_pointer(directory):
+    """Version and sync time of the current snapshot, or None"""
+    try:
+        return json.loads((Path(directory) / 'CURRENT').read_text())
+    except FileNotFoundError:
+        return None
+
+
+def snapshot_enabled():
+    return np is not None and bool(settings.ANALYTICS_SNAPSHOT_DIR)
+
+
+def refresh_snapshot(full=False, blocking=True):
+    """Bring the shared snapshot up to date and return it.
+
+    Returns None without blocking when another process is already
+    refreshing and `blocking` is False.
+    """
+    directory = Path(settings.ANALYTICS_SNAPSHOT_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / 'LOCK', 'w') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            return None
+        # Same settling lag as the change feed, for late-committing transactions
+        until = timezone.now() - timedelta(seconds=settings.CHANGE_FEED_LAG_SECONDS)
+        current = None if full else UserSnapshot.load(directory)
+        snapshot = UserSnapshot.build(until) if current is None else current.refreshed(until)
+        snapshot.save(directory)
+    return snapshot
+
+
+_cache_lock = threading.Lock()
+_cache = {'pointer': None, 'snapshot': None}
+
+
+def user_snapshot():
+    """This process's view of the shared snapshot, refreshed when stale; None when disabled"""
+    if not snapshot_enabled():
+        return None
+    directory = settings.ANALYTICS_SNAPSHOT_DIR
+    with _cache_lock:
+        pointer = read_pointer(directory)
+        if pointer != _cache['pointer']:
+            cached = _cache['snapshot']
+            if cached is not None and pointer and cached.version == pointer['version']:
+                # Only the sync time moved; keep the mapped arrays
+                snapshot = UserSnapshot(cached.columns, from_epoch_us(pointer['synced_until']), cached.version)
+            else:
+                snapshot = UserSnapshot.load(directory, pointer)
+            _cache.update(pointer=pointer, snapshot=snapshot)
+        snapshot = _cache['snapshot']
+
+        max_age = timedelta(seconds=settings.ANALYTICS_SNAPSHOT_MAX_AGE + settings.CHANGE_FEED_LAG_SECONDS)
+        if snapshot is None or timezone.now() - snapshot.synced_until > max_age:
+            # Wait only if there is nothing to serve; otherwise another
+            # worker's refresh in progress is fine and the old one is used
+            refreshed = refresh_snapshot(blocking=snapshot is None)
+            if refreshed is not None:
+                snapshot = refreshed
+                _cache.update(pointer=read_pointer(directory), snapshot=snapshot)
+    return snapshot
+
+
+def reset_user_snapshot():
+    """Forget this process's cached snapshot"""
+    with _cache_lock:
+        _cache.update(pointer=None, snapshot=None)
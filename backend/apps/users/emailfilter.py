@@ -0,0 +1,190 @@
+"""
+In-process Bloom filter of taken emails for the signup form.
+
+``email_available()`` answers from the filter alone when it reports an
+email as absent, which a Bloom filter never gets wrong for emails it was
+given. Only a possible match is confirmed against the database, to rule
+out a false positive. Emails are compared lowercased, as by the
+users_email_ci_uniq constraint.
+
+Each process keeps its own filter. Every EMAIL_FILTER_REFRESH seconds it
+adds the emails of users updated since its last sync, read through the
+updated_at index, so sign-ups handled by other processes show up within
+that interval; registration itself is still guarded by the unique index.
+A Bloom filter cannot forget, so the emails of deleted users linger until
+the filter is rebuilt every EMAIL_FILTER_REBUILD seconds, which also
+resizes it to the current number of users.
+
+Builds and top-ups run in a background thread started by the request that
+finds them due, so no request waits on them. Until the first build is done
+the availability of an email is unknown (None).
+"""
+import hashlib
+import math
+import threading
+from datetime import timedelta
+from django.conf import settings
+from django.db import connections
+from django.db.models.functions import Lower
+from django.utils import timezone
+from .models import ArchivedUser, User
+from .sharding import scatter, user_databases
+
+# Room for growth between rebuilds before the false positive rate degrades
+CAPACITY_HEADROOM = 2
+MIN_CAPACITY = 1000
+
+
+class BloomFilter:
+    """Set of strings with no false negatives and about `error_rate` false positives"""
+
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(capacity, 1)
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        step = int.from_bytes(digest[8:], 'little') | 1
+        return ((first + index * step) % self.size for index in range(self.hash_count))
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+def _user_emails(updated_since=None):
+    """Emails of all users, or of those updated since a time, streamed from each user database in turn"""
+    for alias in user_databases():
+        users = User.objects.using(alias)
+        if updated_since is not None:
+            users = users.filter(updated_at__gte=updated_since)
+        yield from users.values_list('email', flat=True).order_by().iterator(chunk_size=10000)
+
+
+def build_email_filter():
+    """Filter of every live and archived email"""
+    archived = ArchivedUser.objects.count()
+    users = sum(scatter(lambda alias: User.objects.using(alias).count()))
+    bloom = BloomFilter(
+        max(MIN_CAPACITY, (users + archived) * CAPACITY_HEADROOM), settings.EMAIL_FILTER_ERROR_RATE
+    )
+    for email in _user_emails():
+        bloom.add(email.lower())
+    for email in ArchivedUser.objects.values_list('email', flat=True).iterator(chunk_size=10000):
+        bloom.add(email.lower())
+    return bloom
+
+
+_lock = threading.Lock()
+_state = {'filter': None, 'built_at': None, 'synced_at': None, 'refreshing': False}
+
+
+def _due(now):
+    if _state['filter'] is None:
+        return True
+    return (now - _state['built_at'] > timedelta(seconds=settings.EMAIL_FILTER_REBUILD)
+            or now - _state['synced_at'] > timedelta(seconds=settings.EMAIL_FILTER_REFRESH))
+
+
+def refresh_email_filter():
+    """Build this process's filter, or top it up with recent sign-ups when only that is due"""
+    now = timezone.now()
+    with _lock:
+        bloom, built_at, synced_at = _state['filter'], _state['built_at'], _state['synced_at']
+    if bloom is None or now - built_at > timedelta(seconds=settings.EMAIL_FILTER_REBUILD):
+        bloom, built_at = build_email_filter(), now
+    else:
+        # Overlap by the change feed lag to catch late-committing sign-ups
+        since = synced_at - timedelta(seconds=settings.CHANGE_FEED_LAG_SECONDS)
+        emails = [email.lower() for email in _user_emails(updated_since=since)]
+        with _lock:
+            for email in emails:
+                bloom.add(email)
+    # Sign-ups committed while reading are caught by the next top-up
+    with _lock:
+        _state.update(filter=bloom, built_at=built_at, synced_at=now)
+
+
+def _refresh_in_background():
+    try:
+        refresh_email_filter()
+    finally:
+        with _lock:
+            _state['refreshing'] = False
+
+
+def _start(func):
+    """Run func in a daemon thread with database connections of its own"""
+    def run():
+        try:
+            func()
+        finally:
+            connections.close_all()
+
+    threading.Thread(target=run, name='email-filter', daemon=True).start()
+
+
+def email_filter():
+    """This process's filter (None until first built), starting a refresh when one is due"""
+    with _lock:
+        start = not _state['refreshing'] and _due(timezone.now())
+        if start:
+            _state['refreshing'] = True
+    if start:
+        _start(_refresh_in_background)
+    with _lock:
+        return _state['filter']
+
+
+def remember_email(email):
+    """Add an email taken by this process to its filter, if it has one yet"""
+    with _lock:
+        if _state['filter'] is not None:
+            _state['filter'].add(email.lower())
+
+
+def reset_email_filter():
+    """Forget this process's filter"""
+    with _lock:
+        _state.update(filter=None, built_at=None, synced_at=None, refreshing=False)
+
+
+def email_archived(email):
+    """Whether an archived user has this email, ignoring case"""
+    return ArchivedUser.objects.alias(email_lower=Lower('email')).filter(email_lower=email.lower()).exists()
+
+
+def email_ruled_out(email):
+    """Whether this process's current filter shows no live or archived user has the email, without a query.
+
+    Never starts a build or top-up, so registration does not wait on one.
+    """
+    with _lock:
+        bloom = _state['filter']
+        current = bloom is not None and not _due(timezone.now())
+    return current and email.lower() not in bloom
+
+
+def email_taken(email):
+    """Whether a live or archived user has this email, ignoring case"""
+    email = email.lower()
+    if any(scatter(
+        lambda alias: User.objects.using(alias).alias(email_lower=Lower('email')).filter(email_lower=email).exists()
+    )):
+        return True
+    return email_archived(email)
+
+
+def email_available(email):
+    """Whether no live or archived user has this email, or None while the filter is being built"""
+    bloom = email_filter()
+    if bloom is None:
+        return None
+    return email.lower() not in bloom or not email_taken(email)
@@ -0,0 +1,154 @@
+"""
+In-process event bus of live user metrics for the admin dashboard stream.
+
+Model signals publish small deltas into one bounded ring buffer. Every
+connected dashboard reads from that same buffer and only remembers the id of
+the last event it sent, so an open dashboard costs a cursor rather than a
+queue or a recomputation of the statistics.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from django.db.models import Count, Q
+from django.utils import timezone
+from .sharding import scatter
+
+
+class MetricsEventBus:
+    """Thread-safe ring buffer of metric deltas with monotonically increasing ids"""
+
+    def __init__(self, maxlen=1000):
+        self._events = deque(maxlen=maxlen)
+        self._last_id = 0
+        self._condition = threading.Condition()
+
+    @property
+    def last_id(self):
+        return self._last_id
+
+    def publish(self, **deltas):
+        """Record a delta, e.g. publish(registrations=1, active_users=1)"""
+        with self._condition:
+            self._last_id += 1
+            self._events.append((self._last_id, {
+                'id': self._last_id,
+                'at': timezone.now().isoformat(),
+                **deltas,
+            }))
+            self._condition.notify_all()
+
+    def events_since(self, last_id):
+        """Events newer than `last_id`, or None if some were already dropped"""
+        with self._condition:
+            if self._events and self._events[0][0] > last_id + 1:
+                return None
+            return [event for event_id, event in self._events if event_id > last_id]
+
+    def wait(self, last_id, timeout):
+        """Block until an event newer than `last_id` arrives or the timeout passes"""
+        with self._condition:
+            self._condition.wait_for(lambda: self._last_id != last_id, timeout)
+
+
+metrics_bus = MetricsEventBus()
+
+
+def metrics_snapshot():
+    """Current headline counts, including archived users as statistics does"""
+    from .models import ArchivedUser, User
+
+    counts = {'total_users': 0, 'active_users': 0, 'inactive_users': 0}
+    for shard in scatter(lambda alias: User.objects.using(alias).aggregate(
+        total_users=Count('id'),
+        active_users=Count('id', filter=Q(status=User.Status.ACTIVE)),
+        inactive_users=Count('id', filter=Q(status=User.Status.INACTIVE)),
+    )):
+        for name, value in shard.items():
+            counts[name] += value
+    archived = ArchivedUser.objects.aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(status=User.Status.ACTIVE)),
+    )
+    counts['total_users'] += archived['total']
+    counts['active_users'] += archived['active']
+    counts['inactive_users'] += archived['total'] - archived['active']
+    return counts
+
+
+def format_sse(event, data, event_id=None):
+    """Encode one Server-Sent Events message"""
+    message = f'event: {event}\n'
+    if event_id is not None:
+        message += f'id: {event_id}\n'
+    message += f'data: {json.dumps(data, separators=(",", ":"))}\n\n'
+    return message.encode()
+
+
+class MetricsStream:
+    """One dashboard connection: a snapshot followed by deltas from the bus.
+
+    Iterate it synchronously under WSGI or asynchronously under ASGI. The
+    stream ends after `max_seconds` so sync workers are freed; EventSource
+    then reconnects and starts from a fresh snapshot, which also folds in
+    changes made by other worker processes or bulk updates.
+    """
+
+    def __init__(self, bus=metrics_bus, heartbeat=15, max_seconds=25, poll=0.5):
+        self.bus = bus
+        self.heartbeat = heartbeat
+        self.max_seconds = max_seconds
+        self.poll = poll
+
+    def _start(self):
+        """Initial snapshot; it also picks up changes made by other processes"""
+        cursor = self.bus.last_id
+        return cursor, [b'retry: 5000\n\n', format_sse('snapshot', metrics_snapshot(), cursor)]
+
+    def _drain(self, cursor):
+        """Messages for events after `cursor` and the new cursor"""
+        events = self.bus.events_since(cursor)
+        if events is None:
+            # This client fell behind the buffer: resynchronise
+            cursor = self.bus.last_id
+            return cursor, [format_sse('snapshot', metrics_snapshot(), cursor)]
+        if not events:
+            return cursor, []
+        return events[-1]['id'], [format_sse('delta', event, event['id']) for event in events]
+
+    def __iter__(self):
+        cursor, messages = self._start()
+        yield from messages
+        deadline = time.monotonic() + self.max_seconds
+        last_sent = time.monotonic()
+        while time.monotonic() < deadline:
+            self.bus.wait(cursor, timeout=self.heartbeat)
+            cursor, messages = self._drain(cursor)
+            if messages:
+                yield from messages
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= self.heartbeat:
+                yield b': keepalive\n\n'
+                last_sent = time.monotonic()
+
+    async def __aiter__(self):
+        from asgiref.sync import sync_to_async
+
+        cursor, messages = await sync_to_async(self._start)()
+        for message in messages:
+            yield message
+        deadline = time.monotonic() + self.max_seconds
+        last_sent = time.monotonic()
+        while time.monotonic() < deadline:
+            # Checking the shared cursor is a memory read, so polling is cheap
+            await asyncio.sleep(self.poll)
+            if self.bus.last_id == cursor:
+                if time.monotonic() - last_sent >= self.heartbeat:
+                    yield b': keepalive\n\n'
+                    last_sent = time.monotonic()
+                continue
+            cursor, messages = await sync_to_async(self._drain)(cursor)
+            for message in messages:
+                yield message
+            last_sent = time.monotonic()
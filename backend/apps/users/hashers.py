@@ -0,0 +1,118 @@
+"""
+Password hashers tuned to the deployment hardware.
+
+The calibrated hashers keep the stock algorithm names, so existing hashes
+keep verifying, and read their cost from settings. ``manage.py
+calibrate_hashers`` benchmarks the current machine and prints the settings
+that hit a target verify latency. Changing the cost makes the old hashes
+stale; they are re-encoded the next time their owner logs in
+(see User.check_password).
+"""
+import statistics
+import time
+from collections import Counter
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher, PBKDF2PasswordHasher, UNUSABLE_PASSWORD_PREFIX, get_hasher, identify_hasher,
+)
+from .sharding import scatter
+
+# Parameters of an encoded hash that distinguish one cost setting from another
+COST_PARAMETERS = ('iterations', 'time_cost', 'memory_cost', 'parallelism', 'work_factor')
+BENCHMARK_PASSWORD = 'Calibrate123!@#'
+
+
+class CalibratedArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2id with time/memory cost from ARGON2_TIME_COST and ARGON2_MEMORY_COST"""
+
+    @property
+    def time_cost(self):
+        return settings.ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.ARGON2_PARALLELISM
+
+
+class CalibratedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 with the iteration count from PBKDF2_ITERATIONS"""
+
+    @property
+    def iterations(self):
+        return settings.PBKDF2_ITERATIONS
+
+
+def configured_hasher(base, **params):
+    """Instance of `base` with its cost attributes overridden"""
+    return type(f'Configured{base.__name__}', (base,), params)()
+
+
+def measure_verify_ms(hasher, rounds=5):
+    """Median milliseconds the hasher takes to verify a password"""
+    encoded = hasher.encode(BENCHMARK_PASSWORD, hasher.salt())
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        hasher.verify(BENCHMARK_PASSWORD, encoded)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def calibrate_argon2(target_ms, memory_cost, parallelism, rounds=5, max_time_cost=20, min_memory_cost=8192):
+    """Highest Argon2 cost verifying within target_ms, with its measured latency.
+
+    Raises the time cost at the given memory cost; if even a time cost of 1
+    is too slow, halves the memory cost instead.
+    """
+    while True:
+        best = None
+        for time_cost in range(1, max_time_cost + 1):
+            hasher = configured_hasher(
+                Argon2PasswordHasher, time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism
+            )
+            elapsed = measure_verify_ms(hasher, rounds)
+            if elapsed > target_ms:
+                break
+            best = ({'time_cost': time_cost, 'memory_cost': memory_cost, 'parallelism': parallelism}, elapsed)
+        if best or memory_cost // 2 < min_memory_cost:
+            return best or ({'time_cost': 1, 'memory_cost': memory_cost, 'parallelism': parallelism}, elapsed)
+        memory_cost //= 2
+
+
+def calibrate_pbkdf2(target_ms, rounds=5, probe_iterations=100000, step=10000):
+    """PBKDF2 iteration count verifying within target_ms, with its measured latency"""
+    probe = measure_verify_ms(configured_hasher(PBKDF2PasswordHasher, iterations=probe_iterations), rounds)
+    # PBKDF2 time is linear in the iteration count
+    iterations = max(step, int(probe_iterations * target_ms / probe) // step * step)
+    elapsed = measure_verify_ms(configured_hasher(PBKDF2PasswordHasher, iterations=iterations), rounds)
+    return {'iterations': iterations}, elapsed
+
+
+def describe_hash(encoded):
+    """(algorithm, cost parameters, stale) for one stored password"""
+    if not encoded or encoded.startswith(UNUSABLE_PASSWORD_PREFIX):
+        return 'unusable', '', False
+    try:
+        hasher = identify_hasher(encoded)
+    except ValueError:
+        return 'unknown', '', True
+    decoded = hasher.decode(encoded)
+    params = ','.join(f'{name}={decoded[name]}' for name in COST_PARAMETERS if name in decoded)
+    # Anything but the preferred hasher at its current cost is upgraded on login
+    stale = hasher.algorithm != get_hasher('default').algorithm or hasher.must_update(encoded)
+    return hasher.algorithm, params, stale
+
+
+def hash_mix(chunk_size=2000):
+    """Count users per (algorithm, cost parameters, stale) across all user databases"""
+    from .models import User
+
+    def count(alias):
+        passwords = User.objects.using(alias).values_list('password', flat=True)
+        return Counter(describe_hash(encoded) for encoded in passwords.iterator(chunk_size=chunk_size))
+
+    return sum(scatter(count), Counter())
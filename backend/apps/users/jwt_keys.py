@@ -0,0 +1,236 @@
+"""
+Asymmetric JWT signing keys with rotation.
+
+With JWT_KEYS_DIR set, every ``<kid>.pem`` private key in that directory
+is published at /.well-known/jwks.json (kids are creation times in
+KID_FORMAT; other .pem files are ignored and flagged by the users.W001
+check), and tokens are signed with the
+newest key that has been published for at least JWT_KEY_ACTIVATION_DELAY
+seconds, so downstream JWKS caches already hold it when the first token
+signed with it arrives. RSA keys sign with RS256 and Ed25519 keys with
+EdDSA. Tokens carry the signing key's id in their ``kid`` header and are
+verified against that key, so tokens signed with an older key stay valid
+until the key file is removed.
+
+Without JWT_KEYS_DIR tokens keep using HS256 with SECRET_KEY. HS256 tokens
+issued before the switch are only accepted with JWT_ACCEPT_HS256 on, which
+the users.W002 check flags.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+from django.conf import settings
+from jwt.algorithms import OKPAlgorithm, RSAAlgorithm
+from rest_framework_simplejwt import state
+from rest_framework_simplejwt.backends import TokenBackend
+from rest_framework_simplejwt.exceptions import TokenBackendError
+from rest_framework_simplejwt.settings import api_settings
+
+KEY_ALGORITHMS = ('RS256', 'EdDSA')
+KID_FORMAT = '%Y%m%dT%H%M%SZ'
+# Seconds between checks of JWT_KEYS_DIR for added or removed keys
+RELOAD_INTERVAL = 30
+
+
+def new_key_id(now=None):
+    """Key id recording when the key was created, e.g. 20261019T120000Z"""
+    return (now or datetime.now(timezone.utc)).strftime(KID_FORMAT)
+
+
+def key_id_time(kid):
+    """Creation time (epoch seconds) recorded in a key id, or None if it is not one"""
+    try:
+        created = datetime.strptime(kid, KID_FORMAT).replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+    # strptime also takes unpadded fields, which would sort out of order
+    return created.timestamp() if new_key_id(created) == kid else None
+
+
+def key_paths(directory):
+    """Key files of a directory named by key id, oldest first; none if it is missing"""
+    return sorted(
+        (path for path in Path(directory).glob('*.pem') if key_id_time(path.stem) is not None),
+        key=lambda path: path.stem,
+    )
+
+
+def generate_private_key(algorithm):
+    """PEM-encoded private key for RS256 (RSA 2048) or EdDSA (Ed25519)"""
+    if algorithm == 'RS256':
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    elif algorithm == 'EdDSA':
+        key = ed25519.Ed25519PrivateKey.generate()
+    else:
+        raise ValueError(f"Unsupported algorithm '{algorithm}'. Choose from: {', '.join(KEY_ALGORITHMS)}")
+    return key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+
+
+class SigningKey:
+    """One private key from the key directory"""
+
+    def __init__(self, kid, private_key):
+        self.kid = kid
+        self.private_key = private_key
+        self.public_key = private_key.public_key()
+        if isinstance(private_key, rsa.RSAPrivateKey):
+            self.algorithm = 'RS256'
+            self.jwk = RSAAlgorithm.to_jwk(self.public_key, as_dict=True)
+        elif isinstance(private_key, ed25519.Ed25519PrivateKey):
+            self.algorithm = 'EdDSA'
+            self.jwk = OKPAlgorithm.to_jwk(self.public_key, as_dict=True)
+        else:
+            raise ValueError(f'Key {kid} is neither RSA nor Ed25519')
+        self.jwk.update({'kid': kid, 'alg': self.algorithm, 'use': 'sig'})
+        self.created_at = key_id_time(kid)
+        if self.created_at is None:
+            raise ValueError(f"Key id {kid!r} is not a {KID_FORMAT} creation time")
+
+    @classmethod
+    def from_file(cls, path):
+        return cls(path.stem, serialization.load_pem_private_key(path.read_bytes(), password=None))
+
+
+class KeyRing:
+    """All signing keys from a directory, plus their published JWKS document"""
+
+    def __init__(self, keys):
+        self.keys = {key.kid: key for key in sorted(keys, key=lambda key: key.kid)}
+        self.jwks = json.dumps(
+            {'keys': [key.jwk for key in self.keys.values()]}, separators=(',', ':')
+        ).encode()
+        self.etag = '"%s"' % hashlib.sha256(self.jwks).hexdigest()[:32]
+
+    @classmethod
+    def from_directory(cls, directory):
+        return cls([SigningKey.from_file(path) for path in key_paths(directory)])
+
+    def get(self, kid):
+        return self.keys.get(kid)
+
+    def active_key(self, now=None):
+        """Newest key published long enough ago, else the oldest key"""
+        if not self.keys:
+            return None
+        cutoff = (now or time.time()) - settings.JWT_KEY_ACTIVATION_DELAY
+        ready = [key for key in self.keys.values() if key.created_at <= cutoff]
+        return ready[-1] if ready else next(iter(self.keys.values()))
+
+
+_ring_lock = threading.Lock()
+_ring_cache = {'checked_at': 0, 'signature': None, 'ring': KeyRing([])}
+
+
+def _directory_signature(directory):
+    """Cheap change detector: names and modification times of the key files"""
+    try:
+        entries = list(os.scandir(directory))
+    except (FileNotFoundError, NotADirectoryError):
+        # Reported by the users.E001 check; no keys until the directory appears
+        return ()
+    return tuple(sorted((entry.name, entry.stat().st_mtime_ns) for entry in entries if entry.name.endswith('.pem')))
+
+
+def key_ring():
+    """Current key ring, reloaded when the key directory changes"""
+    directory = settings.JWT_KEYS_DIR
+    if not directory:
+        return KeyRing([])
+    now = time.monotonic()
+    if now - _ring_cache['checked_at'] < RELOAD_INTERVAL and _ring_cache['signature'] is not None:
+        return _ring_cache['ring']
+    with _ring_lock:
+        signature = _directory_signature(directory)
+        if signature != _ring_cache['signature']:
+            _ring_cache['ring'] = KeyRing.from_directory(directory)
+            _ring_cache['signature'] = signature
+        _ring_cache['checked_at'] = now
+    return _ring_cache['ring']
+
+
+def reset_key_ring():
+    """Forget the cached key ring, e.g. right after rotating keys"""
+    with _ring_lock:
+        _ring_cache.update(checked_at=0, signature=None, ring=KeyRing([]))
+
+
+class KeyRingTokenBackend(TokenBackend):
+    """simplejwt token backend that signs with the active key and verifies by kid"""
+
+    def __init__(self):
+        # The algorithm passed here only covers legacy HS256 tokens; signed
+        # tokens use the algorithm of their key
+        super().__init__(
+            'HS256',
+            api_settings.SIGNING_KEY,
+            audience=api_settings.AUDIENCE,
+            issuer=api_settings.ISSUER,
+            leeway=api_settings.LEEWAY,
+            json_encoder=api_settings.JSON_ENCODER,
+        )
+
+    def encode(self, payload):
+        """Sign with the active key and name it in the kid header"""
+        key = key_ring().active_key()
+        if key is None:
+            raise TokenBackendError('No JWT signing key found in JWT_KEYS_DIR')
+
+        jwt_payload = payload.copy()
+        if self.audience is not None:
+            jwt_payload['aud'] = self.audience
+        if self.issuer is not None:
+            jwt_payload['iss'] = self.issuer
+        return jwt.encode(
+            jwt_payload,
+            key.private_key,
+            algorithm=key.algorithm,
+            headers={'kid': key.kid},
+            json_encoder=self.json_encoder,
+        )
+
+    def decode(self, token, verify=True):
+        """Verify against the key named in the token, or SECRET_KEY for legacy HS256 tokens"""
+        try:
+            header = jwt.get_unverified_header(token)
+        except jwt.InvalidTokenError as ex:
+            raise TokenBackendError('Token is invalid or expired') from ex
+
+        if header.get('alg') == 'HS256' and settings.JWT_ACCEPT_HS256:
+            verifying_key, algorithm = self.signing_key, 'HS256'
+        else:
+            key = key_ring().get(header.get('kid'))
+            if key is None:
+                raise TokenBackendError('Token is invalid or expired')
+            verifying_key, algorithm = key.public_key, key.algorithm
+
+        try:
+            return jwt.decode(
+                token,
+                verifying_key,
+                algorithms=[algorithm],
+                audience=self.audience,
+                issuer=self.issuer,
+                leeway=self.get_leeway(),
+                options={
+                    'verify_aud': self.audience is not None,
+                    'verify_signature': verify,
+                },
+            )
+        except jwt.InvalidTokenError as ex:
+            raise TokenBackendError('Token is invalid or expired') from ex
+
+
+def install_key_ring_backend():
+    """Make simplejwt sign and verify every token class through the key ring"""
+    state.token_backend = KeyRingTokenBackend()
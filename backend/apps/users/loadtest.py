@@ -0,0 +1,383 @@
+"""
+Load generation against the user API.
+
+Virtual users log in, refresh, and read their profile, while an admin
+account reads the user list and statistics. The register endpoint, which
+signs up a new user per request, is only driven when asked for. All paths
+are resolved from the real URLconf. Requests go either through Django's
+in-process test clients, which run the full middleware stack without a
+socket, or over HTTP to a running server. Latencies are recorded per
+endpoint and summarised as throughput and p50/p95/p99.
+"""
+import asyncio
+import json
+import math
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import connections
+from django.core.handlers.asgi import ASGIHandler
+from django.test import Client
+from django.urls import reverse
+from .models import User
+from .sharding import scatter
+
+ENDPOINTS = ('login', 'refresh', 'me', 'users', 'statistics')
+# Not driven by default: every request adds a user
+OPTIONAL_ENDPOINTS = ('register',)
+LOADTEST_DOMAIN = 'loadtest.invalid'
+ADMIN_EMAIL = f'loadtest-admin@{LOADTEST_DOMAIN}'
+
+
+class LoadTestError(Exception):
+    """The load test could not get its virtual users logged in"""
+
+
+def loadtest_email(index):
+    return f'loadtest-{index}@{LOADTEST_DOMAIN}'
+
+
+def seed_loadtest_users(count, password):
+    """Create any missing load test users and return their emails.
+
+    Returns a (user_emails, created) tuple; existing users are reused with
+    their password reset to `password`.
+    """
+    emails = [loadtest_email(index) for index in range(count)]
+    hashed = make_password(password)
+
+    def reset(alias):
+        users = User.objects.using(alias).filter(email__in=emails + [ADMIN_EMAIL])
+        found = set(users.values_list('email', flat=True))
+        if found:
+            users.update(password=hashed)
+        return found
+
+    existing = set().union(*scatter(reset))
+    created = 0
+    for email in emails:
+        if email not in existing:
+            User.objects.create_user(email=email, full_name='Load Test User', password=password)
+            created += 1
+    if ADMIN_EMAIL not in existing:
+        User.objects.create_user(
+            email=ADMIN_EMAIL, full_name='Load Test Admin', password=password, role=User.Role.ADMIN
+        )
+        created += 1
+    return emails, created
+
+
+def delete_loadtest_users():
+    """Delete every load test user from all user databases"""
+    def delete(alias):
+        _, per_model = User.objects.using(alias).filter(email_domain=LOADTEST_DOMAIN).delete()
+        return per_model.get(User._meta.label, 0)
+
+    return sum(scatter(delete))
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class VirtualUser:
+    """Per-worker request state: which request comes next and the tokens to send"""
+
+    def __init__(self, email, password):
+        self.email = email
+        self.password = password
+        self.access = None
+        self.refresh = None
+        self.admin_access = None
+
+    def login_request(self, email=None):
+        return 'post', reverse('login'), {'email': email or self.email, 'password': self.password}, None
+
+    def request_for(self, endpoint):
+        """Return (method, path, data, access_token) for an endpoint"""
+        if endpoint == 'login':
+            return self.login_request()
+        if endpoint == 'register':
+            email = loadtest_email(f'new-{uuid.uuid4().hex}')
+            return 'post', reverse('register'), {
+                'email': email, 'full_name': 'Load Test User',
+                'password': self.password, 'confirm_password': self.password,
+            }, None
+        if endpoint == 'refresh':
+            return 'post', reverse('token_refresh'), {'refresh': self.refresh}, None
+        if endpoint == 'me':
+            return 'get', reverse('user-me'), None, self.access
+        if endpoint == 'users':
+            return 'get', reverse('user-list'), None, self.admin_access
+        return 'get', reverse('user-statistics'), None, self.admin_access
+
+    def handle(self, endpoint, status_code, body):
+        """Keep the tokens from login and (rotating) refresh responses"""
+        if status_code == 200 and endpoint in ('login', 'refresh'):
+            self.access = body['access']
+            self.refresh = body.get('refresh', self.refresh)
+
+
+class Recorder:
+    """Latency samples and error counts of one worker"""
+
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+
+    def record(self, endpoint, seconds, ok):
+        self.samples.setdefault(endpoint, []).append(seconds)
+        if not ok:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def merge(self, other):
+        for endpoint, samples in other.samples.items():
+            self.samples.setdefault(endpoint, []).extend(samples)
+        for endpoint, count in other.errors.items():
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + count
+
+
+def in_process_host():
+    """A hostname the in-process clients can send without tripping ALLOWED_HOSTS"""
+    return next((host.lstrip('.') for host in settings.ALLOWED_HOSTS if host and host != '*'), 'localhost')
+
+
+def _decode(content):
+    try:
+        return json.loads(content) if content else None
+    except ValueError:
+        return None
+
+
+class DjangoSession:
+    """Drive the URLconf in-process through the WSGI handler"""
+
+    def __init__(self, host):
+        self.client = Client(headers={'host': host})
+
+    def call(self, method, path, data, token):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {token}'} if token else {}
+        if method == 'post':
+            response = self.client.post(path, data, content_type='application/json', **headers)
+        else:
+            response = self.client.get(path, **headers)
+        return response.status_code, _decode(response.content)
+
+
+class AsyncDjangoSession:
+    """Drive the URLconf in-process through the ASGI handler"""
+
+    def __init__(self, host):
+        self.handler = ASGIHandler()
+        self.host = host
+
+    async def call(self, method, path, data, token):
+        payload = json.dumps(data).encode() if data is not None else b''
+        headers = [
+            (b'host', self.host.encode()),
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(payload)).encode()),
+        ]
+        if token:
+            headers.append((b'authorization', f'Bearer {token}'.encode()))
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': method.upper(),
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': b'',
+            'headers': headers,
+            'client': ('127.0.0.1', 0),
+            'server': (self.host, 80),
+        }
+        body = [payload]
+        messages = []
+
+        async def receive():
+            if body:
+                return {'type': 'http.request', 'body': body.pop(), 'more_body': False}
+            # The client never disconnects; Django cancels this wait when the response is done
+            await asyncio.Future()
+
+        async def send(message):
+            messages.append(message)
+
+        await self.handler(scope, receive, send)
+        status_code = next(message['status'] for message in messages if message['type'] == 'http.response.start')
+        content = b''.join(message.get('body', b'') for message in messages if message['type'] == 'http.response.body')
+        return status_code, _decode(content)
+
+
+class HttpSession:
+    """Send requests to a running server"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def call(self, method, path, data, token):
+        request = urllib.request.Request(
+            self.base_url + path,
+            data=json.dumps(data).encode() if data is not None else None,
+            method=method.upper(),
+            headers={'Content-Type': 'application/json', 'Accept': 'application/json'},
+        )
+        if token:
+            request.add_header('Authorization', f'Bearer {token}')
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                return response.status, _decode(response.read())
+        except urllib.error.HTTPError as exc:
+            return exc.code, _decode(exc.read())
+
+
+def _needs_admin(endpoints):
+    return any(endpoint in ('users', 'statistics') for endpoint in endpoints)
+
+
+def _check_login(status_code, body, email):
+    """Body of a successful warm-up login"""
+    if status_code != 200:
+        raise LoadTestError(f'Warm-up login for {email} failed with HTTP {status_code}')
+    return body
+
+
+def _run_threaded_worker(session, user, endpoints, iterations):
+    """Run one virtual user's request loop on the current thread"""
+    recorder = Recorder()
+    try:
+        # Warm-up logins are not measured
+        if _needs_admin(endpoints):
+            body = _check_login(*session.call(*user.login_request(ADMIN_EMAIL)), ADMIN_EMAIL)
+            user.admin_access = body['access']
+        user.handle('login', 200, _check_login(*session.call(*user.login_request()), user.email))
+
+        for _ in range(iterations):
+            for endpoint in endpoints:
+                started = time.perf_counter()
+                status_code, body = session.call(*user.request_for(endpoint))
+                recorder.record(endpoint, time.perf_counter() - started, 200 <= status_code < 300)
+                user.handle(endpoint, status_code, body)
+    finally:
+        connections.close_all()
+    return recorder
+
+
+async def _run_async_worker(session, user, endpoints, iterations):
+    """Run one virtual user's request loop as an asyncio task"""
+    recorder = Recorder()
+    if _needs_admin(endpoints):
+        body = _check_login(*await session.call(*user.login_request(ADMIN_EMAIL)), ADMIN_EMAIL)
+        user.admin_access = body['access']
+    user.handle('login', 200, _check_login(*await session.call(*user.login_request()), user.email))
+
+    for _ in range(iterations):
+        for endpoint in endpoints:
+            started = time.perf_counter()
+            status_code, body = await session.call(*user.request_for(endpoint))
+            recorder.record(endpoint, time.perf_counter() - started, 200 <= status_code < 300)
+            user.handle(endpoint, status_code, body)
+    return recorder
+
+
+class _ThreadedHttpSession:
+    """Awaitable wrapper that runs blocking HTTP calls in the default executor"""
+
+    def __init__(self, base_url):
+        self.session = HttpSession(base_url)
+
+    async def call(self, *args):
+        return await asyncio.to_thread(self.session.call, *args)
+
+
+def run_loadtest(emails, password, concurrency=10, iterations=20, endpoints=ENDPOINTS,
+                 mode='threads', base_url=None):
+    """Drive the API with `concurrency` virtual users and return a report dict"""
+    host = in_process_host()
+    users = [VirtualUser(emails[index % len(emails)], password) for index in range(concurrency)]
+
+    started = time.perf_counter()
+    if mode == 'threads':
+        def worker(user):
+            session = HttpSession(base_url) if base_url else DjangoSession(host)
+            return _run_threaded_worker(session, user, endpoints, iterations)
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            recorders = list(pool.map(worker, users))
+    else:
+        async def main():
+            return await asyncio.gather(*[
+                _run_async_worker(
+                    _ThreadedHttpSession(base_url) if base_url else AsyncDjangoSession(host),
+                    user, endpoints, iterations,
+                )
+                for user in users
+            ])
+
+        recorders = asyncio.run(main())
+    elapsed = time.perf_counter() - started
+
+    combined = Recorder()
+    for recorder in recorders:
+        combined.merge(recorder)
+    return summarize(combined, elapsed, endpoints, {
+        'mode': mode,
+        'target': base_url or 'in-process',
+        'concurrency': concurrency,
+        'iterations': iterations,
+    })
+
+
+def _row(name, samples, errors, elapsed):
+    samples = sorted(samples)
+
+    def ms(value):
+        return round(value * 1000, 2) if value is not None else None
+
+    return {
+        'endpoint': name,
+        'requests': len(samples),
+        'errors': errors,
+        'rps': round(len(samples) / elapsed, 2) if elapsed else None,
+        'mean_ms': ms(sum(samples) / len(samples)) if samples else None,
+        'p50_ms': ms(percentile(samples, 50)),
+        'p95_ms': ms(percentile(samples, 95)),
+        'p99_ms': ms(percentile(samples, 99)),
+        'max_ms': ms(samples[-1] if samples else None),
+    }
+
+
+def summarize(recorder, elapsed, endpoints, config):
+    """Per-endpoint and overall throughput and latency percentiles"""
+    rows = [
+        _row(endpoint, recorder.samples.get(endpoint, []), recorder.errors.get(endpoint, 0), elapsed)
+        for endpoint in endpoints
+    ]
+    rows.append(_row(
+        'total',
+        [sample for samples in recorder.samples.values() for sample in samples],
+        sum(recorder.errors.values()),
+        elapsed,
+    ))
+    return {**config, 'elapsed_seconds': round(elapsed, 3), 'endpoints': rows}
+
+
+def format_table(report):
+    """Render a report's endpoint rows as a fixed-width text table"""
+    columns = ('endpoint', 'requests', 'errors', 'rps', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms')
+    cells = [[str(row[column]) if row[column] is not None else '-' for column in columns] for row in report['endpoints']]
+    widths = [max(len(column), *(len(line[i]) for line in cells)) for i, column in enumerate(columns)]
+    lines = ['  '.join(column.ljust(width) for column, width in zip(columns, widths))]
+    lines.append('  '.join('-' * width for width in widths))
+    lines.extend('  '.join(cell.ljust(width) for cell, width in zip(line, widths)) for line in cells)
+    return '\n'.join(lines)
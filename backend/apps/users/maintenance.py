@@ -0,0 +1,95 @@
+"""
+Chunked maintenance jobs over the User table.
+
+Jobs walk the table in primary-key ranges so each UPDATE only locks one
+batch of rows, and record a checkpoint after every batch so an interrupted
+run picks up where it stopped. With USER_SHARDS set, each shard is walked
+in turn with a checkpoint of its own.
+"""
+import time
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import User, SweepCheckpoint
+from .sharding import sharding_enabled, user_databases
+
+DORMANT_ACTIONS = ('deactivate', 'flag')
+
+
+def dormant_users(cutoff):
+    """Non-admin users with no login since the cutoff"""
+    return User.objects.exclude(role=User.Role.ADMIN).filter(
+        Q(last_login__lt=cutoff) |
+        # Never logged in: only count accounts older than the cutoff
+        Q(last_login__isnull=True, created_at__lt=cutoff)
+    )
+
+
+def sweep_dormant_users(days=90, action='deactivate', batch_size=1000, sleep=0.0,
+                        dry_run=False, restart=False, log=None):
+    """Deactivate or flag users idle for more than `days` days, on every user database.
+
+    Returns a dict with the number of matched users and processed batches.
+    """
+    if action not in DORMANT_ACTIONS:
+        raise ValueError(f"Unknown action '{action}'. Choose from: {', '.join(DORMANT_ACTIONS)}")
+
+    now = timezone.now()
+    cutoff = now - timedelta(days=days)
+    if action == 'deactivate':
+        candidates = dormant_users(cutoff).filter(status=User.Status.ACTIVE)
+        changes = {
+            'status': User.Status.INACTIVE,
+            'is_active': False,
+            'token_version': F('token_version') + 1,
+        }
+    else:
+        candidates = dormant_users(cutoff).filter(dormant_flagged_at__isnull=True)
+        changes = {'dormant_flagged_at': now}
+
+    matched = 0
+    batches = 0
+    for alias in user_databases():
+        # One checkpoint per cutoff, so a run with other --days never resumes this one's position
+        name = f'dormant-sweep:{action}:{days}d'
+        if sharding_enabled():
+            name += f':{alias}'
+        checkpoint, _ = SweepCheckpoint.objects.get_or_create(name=name)
+        last_pk = 0 if restart else checkpoint.last_pk
+
+        while True:
+            # Bound the batch by primary key so the UPDATE is a cheap range scan
+            batch_pks = list(
+                User.objects.using(alias).filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not batch_pks:
+                break
+
+            batch = candidates.using(alias).filter(pk__gt=last_pk, pk__lte=batch_pks[-1])
+            if dry_run:
+                count = batch.count()
+            else:
+                # The checkpoint lives on 'default', the users on their own database
+                with transaction.atomic(), transaction.atomic(using=alias):
+                    count = batch.update(**changes)
+                    checkpoint.last_pk = batch_pks[-1]
+                    checkpoint.save(update_fields=['last_pk', 'updated_at'])
+
+            matched += count
+            batches += 1
+            last_pk = batch_pks[-1]
+            if log:
+                log(f'Batch {batches}: {alias} up to id {last_pk}, {count} user(s)')
+
+            if sleep:
+                time.sleep(sleep)
+
+        # A completed run starts from the beginning next time
+        if not dry_run:
+            checkpoint.last_pk = 0
+            checkpoint.save(update_fields=['last_pk', 'updated_at'])
+
+    return {'matched': matched, 'batches': batches}
@@ -0,0 +1,38 @@
+"""
+Management command to move long-inactive users into the archive table
+Usage: python manage.py archive_users --days 365 --batch-size 500 --sleep 0.1
+
+Archived users are restored on demand via POST /api/users/archived/<id>/restore/.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from apps.users.archive import archive_users
+
+
+class Command(BaseCommand):
+    help = 'Archive inactive users with no login for a number of days'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.ARCHIVE_AFTER_DAYS, help='Idle days before an inactive account is archived')
+        parser.add_argument('--batch-size', type=int, default=500, help='Users moved per transaction')
+        parser.add_argument('--sleep', type=float, default=0.0, help='Seconds to pause between batches')
+        parser.add_argument('--dry-run', action='store_true', help='Only count archivable accounts')
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError('--days must be at least 1')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        count = archive_users(
+            days=options['days'],
+            batch_size=options['batch_size'],
+            sleep=options['sleep'],
+            dry_run=options['dry_run'],
+            log=self.stdout.write if options['verbosity'] > 1 else None,
+        )
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'Dry run: {count} user(s) would be archived'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{count} user(s) archived'))
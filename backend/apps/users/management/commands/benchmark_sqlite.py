@@ -0,0 +1,122 @@
+"""
+Management command to compare SQLite's default settings with the tuned profile
+Usage: python manage.py benchmark_sqlite --concurrency 8 --requests 50
+
+For each profile (see apps.core.sqlite) a fresh database file is migrated
+and seeded, then concurrent virtual users drive a mix of logins,
+registrations and user list reads through the in-process load test. The
+requests hit the real views, so the comparison covers Django's own queries
+and locking. Passwords are hashed with MD5 unless --keep-hashers is given,
+so the database rather than Argon2 is what's measured.
+
+Only runs against a SQLite default database; the configured database file
+itself is never touched.
+"""
+import json
+import os
+import tempfile
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import override_settings
+from apps.core.sqlite import PROFILES, current_pragmas
+from apps.users.emailfilter import reset_email_filter
+from apps.users.loadtest import LoadTestError, format_table, run_loadtest, seed_loadtest_users
+from apps.users.sharding import sharding_enabled
+
+ENDPOINTS = ('login', 'register', 'users')
+PASSWORD = 'LoadTest123!@#'
+
+
+def run_profile(profile, path, users, concurrency, iterations, keep_hashers):
+    """Load test report for one profile against a new database file at `path`"""
+    overrides = {
+        'SQLITE_PROFILE': profile,
+        # Separate caches per run, so no cached permissions leak between databases
+        'CACHES': {'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': f'benchmark-sqlite-{profile}',
+        }},
+    }
+    if not keep_hashers:
+        overrides['PASSWORD_HASHERS'] = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+    database = connections.settings[DEFAULT_DB_ALIAS]
+    original_name = database['NAME']
+    connections.close_all()
+    database['NAME'] = path
+    try:
+        with override_settings(**overrides):
+            reset_email_filter()
+            call_command('migrate', verbosity=0, interactive=False)
+            emails, _ = seed_loadtest_users(users, PASSWORD)
+            report = run_loadtest(
+                emails, PASSWORD, concurrency=concurrency, iterations=iterations,
+                endpoints=ENDPOINTS, mode='threads',
+            )
+            report['profile'] = profile
+            report['pragmas'] = current_pragmas(connections[DEFAULT_DB_ALIAS])
+    finally:
+        connections.close_all()
+        database['NAME'] = original_name
+        reset_email_filter()
+    return report
+
+
+class Command(BaseCommand):
+    help = 'Benchmark mixed login, registration and list traffic on SQLite with default and tuned settings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20, help='Existing users to seed per database')
+        parser.add_argument('--concurrency', type=int, default=8, help='Virtual users running at once')
+        parser.add_argument('--requests', type=int, default=50, help='Rounds over login, register and list per virtual user')
+        parser.add_argument('--profiles', default=','.join(PROFILES), help=f"Comma-separated subset of: {', '.join(PROFILES)}")
+        parser.add_argument('--keep-hashers', action='store_true', help='Hash passwords with the configured (slow) hashers')
+        parser.add_argument('--json', dest='json_path', help="Also write the results as JSON to this file ('-' for stdout)")
+
+    def handle(self, *args, **options):
+        for name in ('users', 'concurrency', 'requests'):
+            if options[name] < 1:
+                raise CommandError(f'--{name} must be at least 1')
+        profiles = [profile.strip() for profile in options['profiles'].split(',') if profile.strip()]
+        unknown = set(profiles) - set(PROFILES)
+        if not profiles or unknown:
+            raise CommandError(f"Unknown profile(s): {', '.join(sorted(unknown)) or '(none given)'}")
+        if connections[DEFAULT_DB_ALIAS].vendor != 'sqlite':
+            raise CommandError('The default database is not SQLite')
+        if sharding_enabled():
+            raise CommandError('Disable USER_SHARDS to benchmark a single SQLite database')
+
+        reports = []
+        with tempfile.TemporaryDirectory() as directory:
+            for profile in profiles:
+                try:
+                    report = run_profile(
+                        profile, os.path.join(directory, f'{profile}.sqlite3'), options['users'],
+                        options['concurrency'], options['requests'], options['keep_hashers'],
+                    )
+                except LoadTestError as exc:
+                    raise CommandError(f'{profile} profile: {exc}')
+                reports.append(report)
+                self.stdout.write(
+                    f"{profile} profile, concurrency {report['concurrency']}, {report['elapsed_seconds']}s"
+                )
+                self.stdout.write(format_table(report))
+                self.stdout.write('')
+
+        totals = {report['profile']: report['endpoints'][-1] for report in reports}
+        self.stdout.write(f"{'profile':<10}  {'req/s':>10}  {'p99 ms':>10}  {'errors':>8}")
+        for profile, total in totals.items():
+            self.stdout.write(f"{profile:<10}  {total['rps']:>10.1f}  {total['p99_ms']:>10.1f}  {total['errors']:>8}")
+        if {'default', 'tuned'} <= set(totals) and totals['default']['rps']:
+            speedup = totals['tuned']['rps'] / totals['default']['rps']
+            self.stdout.write(self.style.SUCCESS(f'Tuned profile: {speedup:.2f}x the throughput of the defaults'))
+
+        if options['json_path']:
+            report = json.dumps({'sqlite_profile': settings.SQLITE_PROFILE, 'runs': reports}, indent=2)
+            if options['json_path'] == '-':
+                self.stdout.write(report)
+            else:
+                with open(options['json_path'], 'w') as f:
+                    f.write(report + '\n')
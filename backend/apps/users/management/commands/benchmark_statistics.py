@@ -0,0 +1,158 @@
+"""
+Management command to compare the ORM and columnar statistics engines
+Usage: python manage.py benchmark_statistics --rows 1000000 --repeat 3
+
+Seeds (or reuses) synthetic users under the benchmark.invalid domain until
+the table holds --rows users, so run it against a scratch database, e.g.
+DATABASE_URL=sqlite:////tmp/bench.sqlite3.
+"""
+import json
+import random
+import statistics
+import tempfile
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from apps.users.analytics import database_statistics
+from apps.users.columnar import UserSnapshot, np
+from apps.users.models import User, UserTombstone
+from apps.users.sharding import sharding_enabled
+
+BENCHMARK_DOMAIN = 'benchmark.invalid'
+SEED_BATCH = 10000
+
+
+def seed_benchmark_users(rows, log=None):
+    """Add synthetic users until the table holds `rows` users; returns how many were created"""
+    missing = rows - User.objects.count()
+    rng = random.Random(rows)
+    now = timezone.now()
+    offset = User.objects.filter(email_domain=BENCHMARK_DOMAIN).count()
+    created_field = User._meta.get_field('created_at')
+    created = 0
+    # Seeded signup dates must survive the insert
+    created_field.auto_now_add = False
+    try:
+        while created < missing:
+            batch = []
+            for index in range(offset + created, offset + created + min(SEED_BATCH, missing - created)):
+                created_at = now - timedelta(seconds=rng.uniform(0, 3 * 365 * 86400))
+                seen = rng.random() < 0.8
+                batch.append(User(
+                    email=f'bench{index}@{BENCHMARK_DOMAIN}',
+                    full_name='Benchmark User',
+                    password='!benchmark',
+                    status=User.Status.ACTIVE if rng.random() < 0.8 else User.Status.INACTIVE,
+                    role=User.Role.ADMIN if rng.random() < 0.05 else User.Role.USER,
+                    created_at=created_at,
+                    last_login=created_at + (now - created_at) * rng.random() if seen else None,
+                ))
+            User.objects.bulk_create(batch, ignore_conflicts=True)
+            created += len(batch)
+            if log:
+                log(f'Seeded {created}/{missing} user(s)')
+    finally:
+        created_field.auto_now_add = True
+    return created
+
+
+def delete_benchmark_users():
+    """Delete the synthetic users and their tombstones"""
+    deleted = 0
+    users = User.objects.filter(email_domain=BENCHMARK_DOMAIN)
+    while True:
+        batch = list(users.values_list('pk', flat=True)[:SEED_BATCH])
+        if not batch:
+            return deleted
+        User.objects.filter(pk__in=batch).delete()
+        UserTombstone.objects.filter(user_id__in=batch).delete()
+        deleted += len(batch)
+
+
+def timed(func, repeat=1):
+    """(result, median milliseconds) of calling func `repeat` times"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(timings)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark statistics computed by ORM queries against the columnar snapshot'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help='Users the table should hold')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement (median is reported)')
+        parser.add_argument('--touch', type=int, default=1000, help='Users changed before timing an incremental refresh')
+        parser.add_argument('--json', dest='json_path', help="Also write the results as JSON to this file ('-' for stdout)")
+        parser.add_argument('--cleanup', action='store_true', help='Delete the synthetic users afterwards')
+
+    def handle(self, *args, **options):
+        if np is None:
+            raise CommandError('NumPy is required for the columnar snapshot')
+        if sharding_enabled():
+            raise CommandError('Run the benchmark against an unsharded scratch database')
+        for name in ('rows', 'repeat'):
+            if options[name] < 1:
+                raise CommandError(f'--{name} must be at least 1')
+
+        seeded = seed_benchmark_users(options['rows'], log=self.stdout.write if options['verbosity'] > 1 else None)
+        total = User.objects.count()
+        self.stdout.write(f'{total} user(s) in the table ({seeded} seeded)')
+        repeat = options['repeat']
+        now = timezone.now()
+        results = {'rows': total}
+
+        orm, results['orm_ms'] = timed(lambda: database_statistics('default', now), repeat)
+        snapshot, results['build_ms'] = timed(lambda: UserSnapshot.build(timezone.now()))
+        columnar, results['columnar_ms'] = timed(lambda: snapshot.statistics(now), repeat)
+
+        with tempfile.TemporaryDirectory() as directory:
+            _, results['save_ms'] = timed(lambda: snapshot.save(directory))
+            mapped, results['load_ms'] = timed(lambda: UserSnapshot.load(directory), repeat)
+            _, results['columnar_mmap_ms'] = timed(lambda: mapped.statistics(now), repeat)
+
+            touched = list(User.objects.order_by('pk').values_list('pk', flat=True)[:options['touch']])
+            User.objects.filter(pk__in=touched).update(last_login=timezone.now())
+            refreshed, results['refresh_ms'] = timed(lambda: mapped.refreshed(timezone.now()))
+            results['refreshed_rows'] = len(touched)
+
+        results['identical'] = columnar == orm
+        results['speedup'] = round(results['orm_ms'] / results['columnar_ms'], 1) if results['columnar_ms'] else None
+        results['snapshot_bytes'] = sum(column.nbytes for column in refreshed.columns.values())
+
+        self.stdout.write(f"{'step':<36}  {'ms':>10}")
+        for label, key in (
+            ('ORM statistics (grouped queries)', 'orm_ms'),
+            ('Columnar full build', 'build_ms'),
+            ('Columnar statistics (in memory)', 'columnar_ms'),
+            ('Snapshot save', 'save_ms'),
+            ('Snapshot load (memory-mapped)', 'load_ms'),
+            ('Columnar statistics (memory-mapped)', 'columnar_mmap_ms'),
+            (f"Incremental refresh ({results['refreshed_rows']} changed)", 'refresh_ms'),
+        ):
+            self.stdout.write(f'{label:<36}  {results[key]:>10.1f}')
+        self.stdout.write(
+            f"\nColumnar is {results['speedup']}x faster than the ORM path; "
+            f"snapshot holds {results['snapshot_bytes'] / 1e6:.1f} MB"
+        )
+        if results['identical']:
+            self.stdout.write(self.style.SUCCESS('Both engines return identical statistics'))
+        else:
+            self.stdout.write(self.style.ERROR('The engines disagree; see the JSON output'))
+            results['orm'] = orm
+            results['columnar'] = columnar
+
+        if options['json_path']:
+            report = json.dumps(results, indent=2, default=str)
+            if options['json_path'] == '-':
+                self.stdout.write(report)
+            else:
+                with open(options['json_path'], 'w') as f:
+                    f.write(report + '\n')
+
+        if options['cleanup']:
+            self.stdout.write(f'Deleted {delete_benchmark_users()} benchmark user(s)')
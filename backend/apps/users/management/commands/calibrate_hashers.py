@@ -0,0 +1,52 @@
+"""
+Management command to tune password hasher cost to this machine
+Usage: python manage.py calibrate_hashers --target-ms 250
+
+Run it on the production instance size. It prints the settings to put in
+the environment; users' hashes are upgraded to the new cost as they log in.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from apps.users.hashers import calibrate_argon2, calibrate_pbkdf2
+
+
+class Command(BaseCommand):
+    help = 'Benchmark password hashers and print the cost settings for a target verify latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target-ms', type=float, default=250, help='Desired time to verify one password')
+        parser.add_argument('--memory-kib', type=int, default=settings.ARGON2_MEMORY_COST, help='Argon2 memory cost to start from')
+        parser.add_argument('--parallelism', type=int, default=settings.ARGON2_PARALLELISM, help='Argon2 lanes')
+        parser.add_argument('--rounds', type=int, default=5, help='Verifications timed per candidate (median is used)')
+        parser.add_argument('--skip-pbkdf2', action='store_true', help='Only calibrate Argon2')
+
+    def handle(self, *args, **options):
+        if options['target_ms'] <= 0:
+            raise CommandError('--target-ms must be positive')
+        for name in ('memory_kib', 'parallelism', 'rounds'):
+            if options[name] < 1:
+                raise CommandError(f"--{name.replace('_', '-')} must be at least 1")
+
+        argon2, argon2_ms = calibrate_argon2(
+            options['target_ms'], options['memory_kib'], options['parallelism'], rounds=options['rounds']
+        )
+        self.stdout.write(
+            f"Argon2: time_cost={argon2['time_cost']} memory_cost={argon2['memory_cost']} KiB "
+            f"parallelism={argon2['parallelism']} verifies in {argon2_ms:.1f} ms"
+        )
+        env = {
+            'ARGON2_TIME_COST': argon2['time_cost'],
+            'ARGON2_MEMORY_COST': argon2['memory_cost'],
+            'ARGON2_PARALLELISM': argon2['parallelism'],
+        }
+        if argon2_ms > options['target_ms']:
+            self.stdout.write(self.style.WARNING('Argon2 cannot reach the target on this machine; using the cheapest setting tried'))
+
+        if not options['skip_pbkdf2']:
+            pbkdf2, pbkdf2_ms = calibrate_pbkdf2(options['target_ms'], rounds=options['rounds'])
+            self.stdout.write(f"PBKDF2: iterations={pbkdf2['iterations']} verifies in {pbkdf2_ms:.1f} ms")
+            env['PBKDF2_ITERATIONS'] = pbkdf2['iterations']
+
+        self.stdout.write('\nSet in the environment:')
+        for name, value in env.items():
+            self.stdout.write(f'{name}={value}')
@@ -0,0 +1,54 @@
+"""
+Management command to dump all users, with their groups and permissions, in bulk
+Usage: python manage.py dump_users /tmp/users-dump --scrub --compress
+
+Much faster than dumpdata for large tables: PostgreSQL streams the rows
+with COPY, other databases read them in batches. Load the dump elsewhere
+with restore_users.
+"""
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from apps.users.bulkcopy import dump_users
+
+
+class Command(BaseCommand):
+    help = 'Dump users with their groups and permissions to a directory of CSV files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Directory to write the dump to')
+        parser.add_argument('--database', default='default', help='Database alias to read the users from')
+        parser.add_argument('--scrub', action='store_true', help='Replace emails, names, passwords and pictures')
+        parser.add_argument('--compress', action='store_true', help='Gzip the CSV files')
+        parser.add_argument('--batch-size', type=int, default=10000, help='Rows fetched at a time without COPY')
+        parser.add_argument('--progress-every', type=int, default=100000, help='Report progress every this many rows')
+
+    def handle(self, *args, **options):
+        if options['database'] not in settings.DATABASES:
+            raise CommandError(f"Unknown database {options['database']!r}")
+        for name in ('batch_size', 'progress_every'):
+            if options[name] < 1:
+                raise CommandError(f"--{name.replace('_', '-')} must be at least 1")
+
+        start = time.perf_counter()
+        manifest = dump_users(
+            options['path'],
+            using=options['database'],
+            scrub=options['scrub'],
+            compress=options['compress'],
+            batch_size=options['batch_size'],
+            progress=self.report if options['verbosity'] > 0 else None,
+            every=options['progress_every'],
+        )
+        elapsed = time.perf_counter() - start
+
+        for name, table in manifest['tables'].items():
+            self.stdout.write(f"{name:<18}  {table['rows']:>12,} rows  {table['file']}")
+        users = manifest['tables']['users']['rows']
+        scrubbed = ' (scrubbed)' if options['scrub'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"Dumped {users:,} user(s){scrubbed} to {options['path']} in {elapsed:.1f}s"
+        ))
+
+    def report(self, table, rows):
+        self.stdout.write(f'  {table}: {rows:,} rows')
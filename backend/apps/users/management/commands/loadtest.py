@@ -0,0 +1,84 @@
+"""
+Management command to measure API throughput and latency percentiles
+Usage: python manage.py loadtest --users 50 --concurrency 20 --requests 50 --mode threads
+
+Seeds (or reuses) users under the loadtest.invalid domain plus one admin
+account, with a random password per run unless --password is given, and
+deletes them afterwards unless --keep-users is given. Without --base-url
+requests run in-process through the full middleware stack; with it they go
+to a running server, which must share this database so the seeded users
+can log in.
+"""
+import json
+import secrets
+from django.core.management.base import BaseCommand, CommandError
+from apps.users.loadtest import (
+    ENDPOINTS, OPTIONAL_ENDPOINTS, LoadTestError, delete_loadtest_users, format_table, run_loadtest, seed_loadtest_users,
+)
+
+
+class Command(BaseCommand):
+    help = 'Drive the user API with concurrent virtual users and report p50/p95/p99 latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help='Regular users to seed or reuse')
+        parser.add_argument('--concurrency', type=int, default=10, help='Virtual users running at once')
+        parser.add_argument('--requests', type=int, default=20, help='Rounds over the endpoints per virtual user')
+        parser.add_argument('--mode', choices=('threads', 'asyncio'), default='threads', help='How virtual users run concurrently')
+        parser.add_argument('--base-url', help='Target a running server (e.g. http://localhost:8000) instead of running in-process')
+        parser.add_argument('--endpoints', default=','.join(ENDPOINTS), help=f"Comma-separated subset of: {', '.join(ENDPOINTS + OPTIONAL_ENDPOINTS)}")
+        parser.add_argument('--password', help='Password of the seeded users (random per run by default)')
+        parser.add_argument('--json', dest='json_path', help="Also write the report as JSON to this file ('-' for stdout)")
+        parser.add_argument('--keep-users', action='store_true', help='Keep the seeded users (and the admin) afterwards')
+
+    def handle(self, *args, **options):
+        for name in ('users', 'concurrency', 'requests'):
+            if options[name] < 1:
+                raise CommandError(f"--{name} must be at least 1")
+        endpoints = [endpoint.strip() for endpoint in options['endpoints'].split(',') if endpoint.strip()]
+        unknown = set(endpoints) - set(ENDPOINTS + OPTIONAL_ENDPOINTS)
+        if not endpoints or unknown:
+            raise CommandError(f"Unknown endpoint(s): {', '.join(sorted(unknown)) or '(none given)'}")
+
+        # A kept admin with a well-known password would be a way into a shared database
+        password = options['password'] or secrets.token_urlsafe(24)
+        emails, created = seed_loadtest_users(options['users'], password)
+        if options['verbosity'] > 1:
+            self.stdout.write(f'Seeded {created} user(s), reusing {len(emails) + 1 - created}')
+            if options['keep_users'] and not options['password']:
+                self.stdout.write(f'Password of the load test users: {password}')
+
+        try:
+            report = run_loadtest(
+                emails,
+                password,
+                concurrency=options['concurrency'],
+                iterations=options['requests'],
+                endpoints=endpoints,
+                mode=options['mode'],
+                base_url=options['base_url'],
+            )
+        except LoadTestError as exc:
+            raise CommandError(f'{exc}. With --base-url, the server must use this database.')
+        finally:
+            if not options['keep_users']:
+                deleted = delete_loadtest_users()
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'Deleted {deleted} load test user(s)')
+
+        if options['json_path'] == '-':
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(
+            f"{report['target']}, {report['mode']}, concurrency {report['concurrency']}, "
+            f"{report['elapsed_seconds']}s"
+        )
+        self.stdout.write(format_table(report))
+        if options['json_path']:
+            with open(options['json_path'], 'w') as output:
+                json.dump(report, output, indent=2)
+
+        errors = report['endpoints'][-1]['errors']
+        if errors:
+            self.stdout.write(self.style.WARNING(f'{errors} request(s) failed'))
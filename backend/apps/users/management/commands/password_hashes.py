@@ -0,0 +1,28 @@
+"""
+Management command to report which hashers protect stored passwords
+Usage: python manage.py password_hashes
+
+Stale hashes (legacy algorithm or outdated cost) are re-encoded with the
+preferred hasher the next time their owner logs in.
+"""
+from django.core.management.base import BaseCommand
+from apps.users.hashers import hash_mix
+
+
+class Command(BaseCommand):
+    help = 'Show how many users are stored with each password hash algorithm and cost'
+
+    def handle(self, *args, **options):
+        mix = hash_mix()
+        total = sum(mix.values())
+        if not total:
+            self.stdout.write('No users found')
+            return
+
+        self.stdout.write(f"{'algorithm':<16}  {'parameters':<48}  {'users':>8}  {'share':>6}  status")
+        for (algorithm, params, stale), count in sorted(mix.items(), key=lambda item: -item[1]):
+            status = 'stale' if stale else 'current'
+            self.stdout.write(f'{algorithm:<16}  {params or "-":<48}  {count:>8}  {count / total:>6.1%}  {status}')
+
+        stale_count = sum(count for (_, _, stale), count in mix.items() if stale)
+        self.stdout.write(f'\n{stale_count} of {total} user(s) will be rehashed on their next login')
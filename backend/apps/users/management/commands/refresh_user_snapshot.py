@@ -0,0 +1,26 @@
+"""
+Management command to refresh the columnar statistics snapshot
+Usage: python manage.py refresh_user_snapshot [--full]
+
+Requests refresh the snapshot on their own once it is older than
+ANALYTICS_SNAPSHOT_MAX_AGE; run this from cron or a release step to keep
+that work off the request path.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from apps.users.columnar import refresh_snapshot, snapshot_enabled
+
+
+class Command(BaseCommand):
+    help = 'Apply user changes since the last sync to the columnar snapshot'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rebuild from every user instead of applying changes')
+
+    def handle(self, *args, **options):
+        if not snapshot_enabled():
+            raise CommandError('Set ANALYTICS_SNAPSHOT_DIR and install NumPy to use the columnar snapshot')
+
+        snapshot = refresh_snapshot(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Snapshot {snapshot.version} holds {len(snapshot)} user(s), synced until {snapshot.synced_until.isoformat()}'
+        ))
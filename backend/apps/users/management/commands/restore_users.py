@@ -0,0 +1,59 @@
+"""
+Management command to load a dump written by dump_users
+Usage: python manage.py restore_users /tmp/users-dump --truncate
+
+The restore runs in one transaction. Without --truncate it adds to the
+existing users and aborts on a clashing id or email; with it every existing
+user is deleted first, leaving tombstones for the change feed. Restored
+users get a fresh updated_at. Missing groups are created; permissions
+unknown to this database are skipped and counted.
+"""
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from apps.users.bulkcopy import BulkCopyError, restore_users
+
+
+class Command(BaseCommand):
+    help = 'Restore users with their groups and permissions from a dump_users directory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Directory written by dump_users')
+        parser.add_argument('--database', default='default', help='Database alias to load the users into')
+        parser.add_argument('--truncate', action='store_true', help='Delete all existing users first')
+        parser.add_argument('--batch-size', type=int, default=10000, help='Rows inserted per statement without COPY')
+        parser.add_argument('--progress-every', type=int, default=100000, help='Report progress every this many rows')
+
+    def handle(self, *args, **options):
+        if options['database'] not in settings.DATABASES:
+            raise CommandError(f"Unknown database {options['database']!r}")
+        for name in ('batch_size', 'progress_every'):
+            if options[name] < 1:
+                raise CommandError(f"--{name.replace('_', '-')} must be at least 1")
+
+        start = time.perf_counter()
+        try:
+            restored = restore_users(
+                options['path'],
+                using=options['database'],
+                truncate=options['truncate'],
+                batch_size=options['batch_size'],
+                progress=self.report if options['verbosity'] > 0 else None,
+                every=options['progress_every'],
+            )
+        except BulkCopyError as e:
+            raise CommandError(str(e)) from e
+        elapsed = time.perf_counter() - start
+
+        for name in ('users', 'user_groups', 'user_permissions'):
+            self.stdout.write(f'{name:<18}  {restored[name]:>12,} rows')
+        if restored['skipped_permissions']:
+            self.stdout.write(self.style.WARNING(
+                f"Skipped {restored['skipped_permissions']:,} permission assignment(s) unknown to this database"
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f"Restored {restored['users']:,} user(s) from {options['path']} in {elapsed:.1f}s"
+        ))
+
+    def report(self, table, rows):
+        self.stdout.write(f'  {table}: {rows:,} rows')
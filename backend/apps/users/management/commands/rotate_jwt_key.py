@@ -0,0 +1,55 @@
+"""
+Management command to add a new JWT signing key and retire old ones
+Usage: python manage.py rotate_jwt_key --algorithm EdDSA --keep 3
+
+The new key is published in /.well-known/jwks.json right away and starts
+signing tokens JWT_KEY_ACTIVATION_DELAY seconds later. Keys beyond --keep
+are deleted, which invalidates tokens they signed, so keep at least one
+refresh-token lifetime of keys around. Files not named by a key id are
+left alone.
+"""
+import os
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from apps.users.jwt_keys import KEY_ALGORITHMS, generate_private_key, key_paths, new_key_id, reset_key_ring
+
+
+class Command(BaseCommand):
+    help = 'Generate a new JWT signing key in JWT_KEYS_DIR and prune the oldest keys'
+    # Creates a missing JWT_KEYS_DIR, which the users.E001 check reports
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--algorithm', choices=KEY_ALGORITHMS, default='EdDSA', help='Signing algorithm of the new key')
+        parser.add_argument('--keep', type=int, default=3, help='Number of newest keys to keep, including the new one')
+
+    def handle(self, *args, **options):
+        if not settings.JWT_KEYS_DIR:
+            raise CommandError('Set JWT_KEYS_DIR to the directory holding the signing keys')
+        if options['keep'] < 2:
+            raise CommandError('--keep must be at least 2 so tokens signed with the current key stay valid')
+
+        directory = Path(settings.JWT_KEYS_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        kid = new_key_id()
+        path = directory / f'{kid}.pem'
+        if path.exists():
+            raise CommandError(f'Key {kid} already exists; try again in a second')
+
+        # Private keys are readable by the owner only
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, 'wb') as key_file:
+            key_file.write(generate_private_key(options['algorithm']))
+
+        retired = key_paths(directory)[:-options['keep']]
+        for old_path in retired:
+            old_path.unlink()
+        reset_key_ring()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Added {options['algorithm']} key {kid}; it signs tokens after "
+            f"{settings.JWT_KEY_ACTIVATION_DELAY}s"
+        ))
+        if retired:
+            self.stdout.write(f"Retired {len(retired)} key(s): {', '.join(p.stem for p in retired)}")
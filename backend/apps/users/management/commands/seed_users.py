@@ -1,6 +1,6 @@
 ﻿"""
 Management command to generate mock user data
-Usage: python manage.py seed_users --count 50
+Usage: python manage.py seed_users --count 50 [--background]
 """
 import requests
 from django.core.management.base import BaseCommand
@@ -14,11 +14,18 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument('--count', type=int, default=20, help='Number of users to create')
         parser.add_argument('--clear', action='store_true', help='Clear existing non-admin users before seeding')
+        parser.add_argument('--background', action='store_true', help='Queue the seeding for `runworker` and return')
 
     def handle(self, *args, **options):
         count = options['count']
         clear = options['clear']
 
+        if options['background']:
+            from apps.users.tasks import seed_users
+            seed_users.enqueue(count, clear=clear)
+            self.stdout.write(self.style.SUCCESS(f'Queued seeding of {count} users for the worker'))
+            return
+
         if clear:
             deleted_count = User.objects.filter(role='USER').delete()[0]
             self.stdout.write(self.style.WARNING(f'Deleted {deleted_count} existing users'))
@@ -0,0 +1,63 @@
+"""
+Management command to deactivate or flag dormant accounts
+Usage: python manage.py sweep_dormant_users --days 90 --batch-size 1000 --sleep 0.1
+
+Safe to schedule (e.g. a daily cron job); an interrupted run resumes from
+its last checkpoint. With --background the sweep is queued as a task for
+`runworker` instead. Admin accounts are never touched.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from apps.users.maintenance import DORMANT_ACTIONS, sweep_dormant_users
+
+
+class Command(BaseCommand):
+    help = 'Deactivate or flag users with no login for a number of days'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90, help='Idle days before an account is dormant')
+        parser.add_argument('--action', choices=DORMANT_ACTIONS, default='deactivate', help='What to do with dormant accounts')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Primary keys scanned per batch')
+        parser.add_argument('--sleep', type=float, default=0.0, help='Seconds to pause between batches')
+        parser.add_argument('--dry-run', action='store_true', help='Only count dormant accounts')
+        parser.add_argument('--restart', action='store_true', help='Ignore the saved checkpoint and start over')
+        parser.add_argument('--background', action='store_true', help='Queue the sweep for `runworker` and return')
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError('--days must be at least 1')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        if options['background']:
+            if options['dry_run']:
+                raise CommandError('--dry-run cannot be combined with --background')
+            from apps.users.tasks import sweep_dormant_users as sweep_task
+            sweep_task.enqueue(
+                days=options['days'],
+                action=options['action'],
+                batch_size=options['batch_size'],
+                sleep=options['sleep'],
+                restart=options['restart'],
+            )
+            self.stdout.write(self.style.SUCCESS('Queued the dormant account sweep for the worker'))
+            return
+
+        result = sweep_dormant_users(
+            days=options['days'],
+            action=options['action'],
+            batch_size=options['batch_size'],
+            sleep=options['sleep'],
+            dry_run=options['dry_run'],
+            restart=options['restart'],
+            log=self.stdout.write if options['verbosity'] > 1 else None,
+        )
+
+        verb = 'deactivated' if options['action'] == 'deactivate' else 'flagged'
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(
+                f"Dry run: {result['matched']} dormant user(s) would be {verb}"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"{result['matched']} dormant user(s) {verb} in {result['batches']} batch(es)"
+            ))
@@ -1,7 +1,72 @@
 from django.contrib.auth.models import BaseUserManager
+from django.db import IntegrityError, models, transaction
+from django.utils import timezone
+from .sharding import new_user_id, shard_for_email, sharding_enabled, user_databases
 
 
-class UserManager(BaseUserManager):
+def get_email_domain(email):
+    """Return the lowercased domain part of an email address"""
+    return email.rpartition('@')[2].lower() if email and '@' in email else ''
+
+
+# Unique constraints on the email: the case-insensitive index, and the
+# unique column as PostgreSQL names and SQLite describes it
+EMAIL_CONSTRAINTS = frozenset({'users_email_ci_uniq', 'users_user_email_key'})
+EMAIL_SQLITE_MESSAGES = ("index 'users_email_ci_uniq'", 'users_user.email')
+
+
+def is_email_conflict(error):
+    """Whether an IntegrityError was raised by one of the email unique constraints"""
+    diag = getattr(error.__cause__, 'diag', None)
+    if diag is not None:
+        # psycopg reports the violated constraint by name
+        return diag.constraint_name in EMAIL_CONSTRAINTS
+    return str(error).endswith(EMAIL_SQLITE_MESSAGES)
+
+
+# Ids drawn for a new sharded user before a primary key clash is given up on
+ID_ATTEMPTS = 5
+
+# Columns the change feed publishes; writing any of them must bump updated_at
+CHANGE_FEED_FIELDS = frozenset({'email', 'full_name', 'role', 'status', 'profile_picture', 'last_login'})
+
+
+class UserQuerySet(models.QuerySet):
+    """QuerySet that keeps the derived email_domain column in sync on bulk writes"""
+    
+    def bulk_create(self, objs, *args, **kwargs):
+        """Fill email_domain before inserting, since bulk_create skips save()"""
+        objs = list(objs)
+        for obj in objs:
+            obj.email_domain = get_email_domain(obj.email)
+        return super().bulk_create(objs, *args, **kwargs)
+    
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        """Update email_domain alongside email, and updated_at for published columns"""
+        objs = list(objs)
+        fields = list(fields)
+        if 'email' in fields:
+            for obj in objs:
+                obj.email_domain = get_email_domain(obj.email)
+            if 'email_domain' not in fields:
+                fields.append('email_domain')
+        if CHANGE_FEED_FIELDS.intersection(fields) and 'updated_at' not in fields:
+            now = timezone.now()
+            for obj in objs:
+                obj.updated_at = now
+            fields.append('updated_at')
+        return super().bulk_update(objs, fields, *args, **kwargs)
+    
+    def update(self, **kwargs):
+        """Update email_domain alongside a literal email value, and updated_at for published columns"""
+        if isinstance(kwargs.get('email'), str):
+            kwargs.setdefault('email_domain', get_email_domain(kwargs['email']))
+        if CHANGE_FEED_FIELDS.intersection(kwargs):
+            kwargs.setdefault('updated_at', timezone.now())
+        return super().update(**kwargs)
+
+
+class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
     """Custom user manager where email is the unique identifier"""
     
     def create_user(self, email, full_name, password=None, **extra_fields):
@@ -10,12 +75,47 @@ class UserManager(BaseUserManager):
             raise ValueError('The Email field must be set')
         if not full_name:
             raise ValueError('The Full Name field must be set')
-            
+        
         email = self.normalize_email(email)
-        user = self.model(email=email, full_name=full_name, **extra_fields)
+        user = self.model(
+            email=email,
+            email_domain=get_email_domain(email),
+            full_name=full_name,
+            **extra_fields
+        )
         user.set_password(password)
-        user.save(using=self._db)
-        return user
+        if not sharding_enabled():
+            # A savepoint, so a duplicate email leaves the caller's transaction usable
+            with transaction.atomic(using=self.db):
+                user.save(using=self.db)
+            return user
+        
+        using = shard_for_email(email)
+        for attempt in range(ID_ATTEMPTS):
+            user.id = new_user_id(using)
+            try:
+                # force_insert, so a taken id fails instead of overwriting that row
+                with transaction.atomic(using=using):
+                    user.save(using=using, force_insert=True)
+                return user
+            except IntegrityError:
+                # Another process issued the same id in the same second: draw again
+                if attempt + 1 == ID_ATTEMPTS or not self.db_manager(using).filter(pk=user.id).exists():
+                    raise
+    
+    def get_by_natural_key(self, username):
+        """Look the user up on the shard their email hashes to"""
+        if not sharding_enabled():
+            return super().get_by_natural_key(username)
+        
+        home = shard_for_email(username)
+        # Users who changed email stay on their original shard
+        for alias in [home] + [alias for alias in user_databases() if alias != home]:
+            try:
+                return self.db_manager(alias).get(**{self.model.USERNAME_FIELD: username})
+            except self.model.DoesNotExist:
+                continue
+        raise self.model.DoesNotExist(f'No user with {self.model.USERNAME_FIELD} {username!r}')
     
     def create_superuser(self, email, full_name, password=None, **extra_fields):
         """Create and save a superuser with the given email and password"""
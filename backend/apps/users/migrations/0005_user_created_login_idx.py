@@ -0,0 +1,17 @@
+# Generated by Django 5.0 on 2026-10-19 06:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_dormant_sweep'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['created_at', 'last_login'], name='users_created_login_idx'),
+        ),
+    ]
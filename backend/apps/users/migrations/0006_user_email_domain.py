@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-19 06:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_user_created_login_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='email_domain',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+    ]
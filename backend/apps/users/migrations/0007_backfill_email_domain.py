@@ -0,0 +1,38 @@
+from django.db import migrations, transaction
+
+BATCH_SIZE = 2000
+
+
+def backfill_email_domain(apps, schema_editor):
+    """Populate email_domain in primary-key batches, committing each batch"""
+    User = apps.get_model('users', 'User')
+    db_alias = schema_editor.connection.alias
+    last_pk = 0
+    while True:
+        batch = list(
+            User.objects.using(db_alias)
+            .filter(pk__gt=last_pk)
+            .order_by('pk')
+            .only('pk', 'email')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        for user in batch:
+            user.email_domain = user.email.rpartition('@')[2].lower() if '@' in user.email else ''
+        with transaction.atomic(using=db_alias):
+            User.objects.using(db_alias).bulk_update(batch, ['email_domain'])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    # Each batch commits on its own so large tables are not locked in one transaction
+    atomic = False
+
+    dependencies = [
+        ('users', '0006_user_email_domain'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_email_domain, migrations.RunPython.noop),
+    ]
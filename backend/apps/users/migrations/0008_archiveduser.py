@@ -0,0 +1,43 @@
+# Generated by Django 5.0 on 2026-10-19 06:28
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_backfill_email_domain'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedUser',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('password', models.CharField(max_length=128)),
+                ('email', models.EmailField(max_length=254, unique=True)),
+                ('email_domain', models.CharField(blank=True, max_length=255)),
+                ('full_name', models.CharField(max_length=255)),
+                ('role', models.CharField(choices=[('ADMIN', 'Admin'), ('USER', 'User')], max_length=10)),
+                ('status', models.CharField(choices=[('ACTIVE', 'Active'), ('INACTIVE', 'Inactive')], max_length=10)),
+                ('profile_picture', models.CharField(blank=True, max_length=100, null=True)),
+                ('token_version', models.PositiveIntegerField(default=0)),
+                ('last_login', models.DateTimeField(blank=True, null=True)),
+                ('dormant_flagged_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('is_staff', models.BooleanField(default=False)),
+                ('is_active', models.BooleanField(default=False)),
+                ('is_superuser', models.BooleanField(default=False)),
+                ('group_ids', models.JSONField(blank=True, default=list)),
+                ('permission_ids', models.JSONField(blank=True, default=list)),
+                ('archived_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Archived user',
+                'verbose_name_plural': 'Archived users',
+                'ordering': ['-archived_at'],
+            },
+        ),
+    ]
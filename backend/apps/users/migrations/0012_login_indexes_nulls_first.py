@@ -0,0 +1,38 @@
+from django.db import migrations
+
+# last_login indexes of the user list, as (name, leading columns)
+LOGIN_INDEXES = [
+    ('users_login_id_idx', []),
+    ('users_status_login_idx', ['status']),
+    ('users_role_login_idx', ['role']),
+]
+
+
+def rebuild_login_indexes(nulls):
+    """Recreate the last_login indexes on PostgreSQL with NULLs in the given position.
+
+    The list sorts never-logged-in users first ascending and last descending,
+    which a PostgreSQL index only serves in order when built NULLS FIRST.
+    SQLite always sorts NULLs first and has no NULLS clause in CREATE INDEX.
+    """
+    def rebuild(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        quote = schema_editor.quote_name
+        for name, leading in LOGIN_INDEXES:
+            columns = [quote(column) for column in leading]
+            columns += [f'{quote("last_login")} {nulls}', quote('id')]
+            schema_editor.execute(f'DROP INDEX IF EXISTS {quote(name)}')
+            schema_editor.execute(f'CREATE INDEX {quote(name)} ON {quote("users_user")} ({", ".join(columns)})')
+    return rebuild
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0011_email_ci_unique'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_login_indexes('NULLS FIRST'), rebuild_login_indexes('NULLS LAST')),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-19 09:02
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0012_login_indexes_nulls_first'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='archiveduser',
+            index=models.Index(django.db.models.functions.text.Lower('email'), name='users_archived_email_ci_idx'),
+        ),
+    ]
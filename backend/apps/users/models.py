@@ -1,9 +1,11 @@
+from django.contrib.auth.hashers import acheck_password, check_password
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Lower
 from django.utils import timezone
-from PIL import Image
 import os
-from .managers import UserManager
+from .managers import CHANGE_FEED_FIELDS, UserManager, get_email_domain
 
 
 def user_profile_picture_path(instance, filename):
@@ -25,6 +27,8 @@ class User(AbstractBaseUser, PermissionsMixin):
         INACTIVE = 'INACTIVE', 'Inactive'
     
     email = models.EmailField(unique=True, db_index=True)
+    # Derived from email on every save; indexed for per-domain filtering and counts
+    email_domain = models.CharField(max_length=255, blank=True, db_index=True, editable=False)
     full_name = models.CharField(max_length=255)
     role = models.CharField(
         max_length=10,
@@ -45,7 +49,11 @@ class User(AbstractBaseUser, PermissionsMixin):
         help_text='Profile picture (max 5MB, 400x400px recommended)'
     )
     
+    # Bumped to revoke every outstanding JWT issued to this user
+    token_version = models.PositiveIntegerField(default=0)
+    
     last_login = models.DateTimeField(null=True, blank=True)
+    dormant_flagged_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -63,47 +71,156 @@ class User(AbstractBaseUser, PermissionsMixin):
         ordering = ['-created_at']
         verbose_name = 'User'
         verbose_name_plural = 'Users'
+        indexes = [
+            # Covers the cohort retention GROUP BY
+            models.Index(fields=['created_at', 'last_login'], name='users_created_login_idx'),
+            # Keyset order of the change feed
+            models.Index(fields=['updated_at', 'id'], name='users_updated_id_idx'),
+            # Filtered and sorted admin user list; id breaks ties between equal sort keys
+            models.Index(fields=['created_at', 'id'], name='users_created_id_idx'),
+            models.Index(fields=['last_login', 'id'], name='users_login_id_idx'),
+            models.Index(fields=['status', 'created_at', 'id'], name='users_status_created_idx'),
+            models.Index(fields=['status', 'last_login', 'id'], name='users_status_login_idx'),
+            models.Index(fields=['role', 'created_at', 'id'], name='users_role_created_idx'),
+            models.Index(fields=['role', 'last_login', 'id'], name='users_role_login_idx'),
+        ]
+        constraints = [
+            # Registration relies on this instead of checking first (see is_email_conflict)
+            models.UniqueConstraint(Lower('email'), name='users_email_ci_uniq'),
+        ]
     
     def __str__(self):
         return self.email
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the stored status and picture so saves can detect changes"""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_status = instance.__dict__.get('status')
+        instance._loaded_picture = instance.__dict__.get('profile_picture')
+        return instance
+    
     @property
     def is_admin(self):
         """Check if user has admin role"""
         return self.role == self.Role.ADMIN
     
+    def revoke_tokens(self):
+        """Invalidate all outstanding JWTs for this user with a single UPDATE"""
+        User.objects.using(self._state.db).filter(pk=self.pk).update(token_version=F('token_version') + 1)
+        self.refresh_from_db(fields=['token_version'])
+    
+    def record_login(self):
+        """Stamp last_login with a single UPDATE instead of save()"""
+        self.last_login = timezone.now()
+        User.objects.using(self._state.db).filter(pk=self.pk).update(last_login=self.last_login)
+    
+    def check_password(self, raw_password):
+        """Verify the password, upgrading a stale hash with a single-column UPDATE"""
+        return check_password(raw_password, self.password, self._upgrade_password)
+    
+    async def acheck_password(self, raw_password):
+        """See check_password()"""
+        return await acheck_password(raw_password, self.password, self._aupgrade_password)
+    
+    def _rehash(self, raw_password):
+        """Re-encode with the preferred hasher; not a password change"""
+        self.set_password(raw_password)
+        self._password = None
+        return User.objects.using(self._state.db).filter(pk=self.pk)
+    
+    def _upgrade_password(self, raw_password):
+        """Store a rehashed password without save() and its signals"""
+        self._rehash(raw_password).update(password=self.password)
+    
+    async def _aupgrade_password(self, raw_password):
+        """See _upgrade_password()"""
+        await self._rehash(raw_password).aupdate(password=self.password)
+    
     def save(self, *args, **kwargs):
-        """Optimize profile picture on save"""
+        """Sync email_domain and updated_at, and queue optimization of a new profile picture"""
+        self.email_domain = get_email_domain(self.email)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'email' in update_fields:
+            kwargs['update_fields'] = update_fields = {*update_fields, 'email_domain'}
+        if update_fields is not None and CHANGE_FEED_FIELDS.intersection(update_fields):
+            # auto_now only reaches the database when updated_at is saved too
+            kwargs['update_fields'] = {*update_fields, 'updated_at'}
         super().save(*args, **kwargs)
         
-        if self.profile_picture:
-            try:
-                img_path = self.profile_picture.path
-                img = Image.open(img_path)
-                
-                # Convert RGBA to RGB (PNG to JPEG)
-                if img.mode in ('RGBA', 'LA', 'P'):
-                    background = Image.new('RGB', img.size, (255, 255, 255))
-                    if img.mode == 'RGBA':
-                        background.paste(img, mask=img.split()[-1])
-                    else:
-                        background.paste(img)
-                    img = background
-                
-                # Resize if larger than 400x400
-                max_size = (400, 400)
-                if img.height > max_size[0] or img.width > max_size[1]:
-                    img.thumbnail(max_size, Image.Resampling.LANCZOS)
-                
-                # Save optimized image
-                img.save(img_path, 'JPEG', quality=85, optimize=True, progressive=True)
-            except Exception as e:
-                print(f'Error optimizing profile picture: {e}')
+        picture = self.profile_picture.name or ''
+        if picture and picture != getattr(self, '_loaded_picture', None):
+            from .tasks import optimize_profile_picture
+            optimize_profile_picture.enqueue(self.pk, picture)
+        self._loaded_picture = picture
     
     def delete_profile_picture(self):
-        """Delete profile picture file from storage"""
+        """Clear the profile picture and queue removal of its file"""
         if self.profile_picture:
-            if os.path.isfile(self.profile_picture.path):
-                os.remove(self.profile_picture.path)
+            from .tasks import delete_media_file
+            delete_media_file.enqueue(self.profile_picture.name)
             self.profile_picture = None
             self.save()
+
+
+class SweepCheckpoint(models.Model):
+    """Last processed primary key of a chunked maintenance job, for resuming"""
+    
+    name = models.CharField(max_length=100, unique=True)
+    last_pk = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f'{self.name} @ {self.last_pk}'
+
+
+class ArchivedUser(models.Model):
+    """Cold-storage copy of a User moved out of the hot table by the archive job"""
+    
+    id = models.BigIntegerField(primary_key=True)
+    password = models.CharField(max_length=128)
+    email = models.EmailField(unique=True)
+    email_domain = models.CharField(max_length=255, blank=True)
+    full_name = models.CharField(max_length=255)
+    role = models.CharField(max_length=10, choices=User.Role.choices)
+    status = models.CharField(max_length=10, choices=User.Status.choices)
+    profile_picture = models.CharField(max_length=100, blank=True, null=True)
+    token_version = models.PositiveIntegerField(default=0)
+    last_login = models.DateTimeField(null=True, blank=True)
+    dormant_flagged_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    is_staff = models.BooleanField(default=False)
+    is_active = models.BooleanField(default=False)
+    is_superuser = models.BooleanField(default=False)
+    # Group and permission ids, restored into the M2M tables on restore
+    group_ids = models.JSONField(default=list, blank=True)
+    permission_ids = models.JSONField(default=list, blank=True)
+    archived_at = models.DateTimeField(default=timezone.now, db_index=True)
+    
+    class Meta:
+        ordering = ['-archived_at']
+        verbose_name = 'Archived user'
+        verbose_name_plural = 'Archived users'
+        indexes = [
+            # Case-insensitive lookups when checking whether an email is taken
+            models.Index(Lower('email'), name='users_archived_email_ci_idx'),
+        ]
+    
+    def __str__(self):
+        return self.email
+
+
+class UserTombstone(models.Model):
+    """Marks a deleted or archived user so the change feed can report the deletion"""
+    
+    user_id = models.BigIntegerField(unique=True)
+    deleted_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at', 'user_id'], name='users_tombstone_feed_idx'),
+        ]
+    
+    def __str__(self):
+        return f'User {self.user_id} deleted at {self.deleted_at}'
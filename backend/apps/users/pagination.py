@@ -0,0 +1,82 @@
+"""
+Keyset pagination of the admin user list when users are sharded.
+
+Page numbers would make every shard read all rows before the page; a
+cursor names the last row seen instead (see ShardedSequence.page). The
+response keeps the count/next/previous/results shape of the page number
+pagination, with ?cursor= links in place of ?page=.
+"""
+import base64
+import binascii
+import json
+from django.core.exceptions import ValidationError
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from .models import User
+
+
+def encode_cursor(position, backwards=False):
+    """Opaque cursor for the rows after (or before) a keyset position"""
+    values = [value.isoformat() if hasattr(value, 'isoformat') else value for value in position]
+    raw = json.dumps({'position': values, 'backwards': backwards}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, ordering):
+    """(position, backwards) encoded in a cursor over `ordering`"""
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        values = raw['position']
+        if len(values) != len(ordering):
+            raise ValueError('Cursor does not match the ordering')
+        position = tuple(
+            None if value is None else User._meta.get_field(name).to_python(value)
+            for (name, _), value in zip(ordering, values)
+        )
+        return position, bool(raw['backwards'])
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, KeyError, ValidationError) as e:
+        raise NotFound('Invalid cursor') from e
+
+
+class ShardedCursorPagination(BasePagination):
+    """Pages a ShardedSequence by keyset cursor"""
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.count = queryset.count()
+        cursor = request.query_params.get(self.cursor_query_param)
+        position, backwards = decode_cursor(cursor, queryset.ordering) if cursor else (None, False)
+
+        users = queryset.page(position, self.page_size + 1, backwards)
+        has_more = len(users) > self.page_size
+        if has_more:
+            users = users[1:] if backwards else users[:-1]
+        # A backwards page ends where a page already seen began
+        has_next = has_more or backwards
+        has_previous = has_more if backwards else position is not None
+
+        self.next_cursor = encode_cursor(queryset.position(users[-1])) if has_next and users else None
+        self.previous_cursor = None
+        if has_previous:
+            first = queryset.position(users[0]) if users else position
+            self.previous_cursor = encode_cursor(first, backwards=True)
+        return users
+
+    def _link(self, cursor):
+        if cursor is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), 'page')
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.count,
+            'next': self._link(self.next_cursor),
+            'previous': self._link(self.previous_cursor),
+            'results': data,
+        })
@@ -8,7 +8,7 @@ class IsAdminUser(permissions.BasePermission):
         return (
             request.user and 
             request.user.is_authenticated and 
-            request.user.role == 'ADMIN'
+            request.user.is_admin
         )
 
 
@@ -17,7 +17,7 @@ class IsOwnerOrAdmin(permissions.BasePermission):
     
     def has_object_permission(self, request, view, obj):
         # Admin can access anything
-        if request.user.role == 'ADMIN':
+        if request.user.is_admin:
             return True
         # Users can only access their own data
         return obj == request.user
@@ -1,7 +1,28 @@
 from rest_framework import serializers
 from django.contrib.auth.password_validation import validate_password
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-from .models import User
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Lower
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from .authentication import (
+    TOKEN_VERSION_CLAIM, USER_SHARD_CLAIM, ShardedRefreshToken, user_database_for_token,
+)
+from .emailfilter import email_archived, email_ruled_out
+from .managers import is_email_conflict
+from .models import ArchivedUser, User
+from .sharding import scatter, shard_for_email, sharding_enabled, user_databases
+
+
+def email_in_use(email, exclude_pk=None, aliases=None):
+    """Whether any user database (or any of `aliases`) already holds this email, ignoring case"""
+    # Every shard is checked since a user keeps their shard when changing email
+    return any(scatter(
+        lambda alias: User.objects.using(alias).exclude(pk=exclude_pk)
+        .alias(email_lower=Lower('email')).filter(email_lower=email.lower()).exists(),
+        aliases,
+    ))
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -21,6 +42,8 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ('email', 'full_name', 'password', 'confirm_password')
+        # Uniqueness is left to the database; see create()
+        extra_kwargs = {'email': {'validators': []}}
     
     def validate(self, attrs):
         """Validate that passwords match"""
@@ -31,15 +54,32 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         return attrs
     
     def validate_email(self, value):
-        """Validate email uniqueness"""
-        if User.objects.filter(email=value).exists():
+        """Reject emails of archived accounts and of users who moved to another shard.
+        
+        Live users on the email's own database are caught by the
+        case-insensitive unique index on insert instead (see create). The
+        archive is only queried when this process's email filter cannot
+        rule the email out.
+        """
+        if not email_ruled_out(value) and email_archived(value):
             raise serializers.ValidationError("Email already exists.")
+        if sharding_enabled():
+            home = shard_for_email(value)
+            others = [alias for alias in user_databases() if alias != home]
+            if others and email_in_use(value, aliases=others):
+                raise serializers.ValidationError("Email already exists.")
         return value
     
     def create(self, validated_data):
         """Create and return a new user"""
         validated_data.pop('confirm_password')
-        user = User.objects.create_user(**validated_data)
+        try:
+            user = User.objects.create_user(**validated_data)
+        except IntegrityError as e:
+            # Taken by a concurrent sign-up, or differs from an existing one only in case
+            if not is_email_conflict(e):
+                raise
+            raise serializers.ValidationError({'email': ["Email already exists."]}) from e
         return user
 
 
@@ -66,6 +106,17 @@ class UserSerializer(serializers.ModelSerializer):
         return None
 
 
+class ArchivedUserSerializer(serializers.ModelSerializer):
+    """Serializer for archived user display"""
+    class Meta:
+        model = ArchivedUser
+        fields = (
+            'id', 'email', 'full_name', 'role', 'status',
+            'last_login', 'created_at', 'archived_at'
+        )
+        read_only_fields = fields
+
+
 class UserUpdateSerializer(serializers.ModelSerializer):
     """Serializer for updating user profile"""
     class Meta:
@@ -75,9 +126,77 @@ class UserUpdateSerializer(serializers.ModelSerializer):
     def validate_email(self, value):
         """Validate email uniqueness excluding current user"""
         user = self.context['request'].user
-        if User.objects.exclude(pk=user.pk).filter(email=value).exists():
+        if email_in_use(value, exclude_pk=user.pk) or email_archived(value):
             raise serializers.ValidationError("Email already in use.")
         return value
+    
+    def update(self, instance, validated_data):
+        """Save the profile, reporting an email taken in the meantime as invalid"""
+        try:
+            with transaction.atomic(using=instance._state.db):
+                return super().update(instance, validated_data)
+        except IntegrityError as e:
+            if not is_email_conflict(e):
+                raise
+            raise serializers.ValidationError({'email': ["Email already in use."]}) from e
+
+
+class UserListQuerySerializer(serializers.Serializer):
+    """Filters and ordering of the admin user list.
+
+    status and role with any ordering read an index in order, so a page
+    stops after its rows; a creation window is read by index range.
+    Users who never logged in sort before everyone else on every database.
+    """
+    # Sort key -> full ORDER BY; id keeps pages stable across equal keys
+    ORDERINGS = {
+        'created_at': ('created_at', 'id'),
+        '-created_at': ('-created_at', '-id'),
+        'last_login': (F('last_login').asc(nulls_first=True), 'id'),
+        '-last_login': (F('last_login').desc(nulls_last=True), '-id'),
+    }
+    
+    domain = serializers.CharField(required=False)
+    status = serializers.ChoiceField(choices=User.Status.choices, required=False)
+    role = serializers.ChoiceField(choices=User.Role.choices, required=False)
+    created_after = serializers.DateTimeField(required=False)
+    created_before = serializers.DateTimeField(required=False)
+    last_login_before = serializers.DateTimeField(required=False)
+    ordering = serializers.ChoiceField(choices=list(ORDERINGS), default='-created_at')
+    
+    def validate(self, attrs):
+        """Reject empty creation windows"""
+        after, before = attrs.get('created_after'), attrs.get('created_before')
+        if after and before and after >= before:
+            raise serializers.ValidationError({'created_before': 'Must be later than created_after.'})
+        return attrs
+    
+    def filter(self, queryset):
+        """Apply the validated filters (not the ordering) to a User queryset.
+
+        created_after is inclusive and created_before exclusive, so adjacent
+        windows do not overlap. Users who never logged in have no
+        last_login and do not match last_login_before.
+        """
+        data = self.validated_data
+        if data.get('domain'):
+            queryset = queryset.filter(email_domain=data['domain'].strip().lower())
+        if 'status' in data:
+            queryset = queryset.filter(status=data['status'])
+        if 'role' in data:
+            queryset = queryset.filter(role=data['role'])
+        if 'created_after' in data:
+            queryset = queryset.filter(created_at__gte=data['created_after'])
+        if 'created_before' in data:
+            queryset = queryset.filter(created_at__lt=data['created_before'])
+        if 'last_login_before' in data:
+            queryset = queryset.filter(last_login__lt=data['last_login_before'])
+        return queryset
+    
+    @property
+    def order_by(self):
+        """ORDER BY fields of the requested ordering"""
+        return self.ORDERINGS[self.validated_data['ordering']]
 
 
 class ProfilePictureUploadSerializer(serializers.Serializer):
@@ -157,6 +276,7 @@ class ChangePasswordSerializer(serializers.Serializer):
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     """Custom JWT serializer with additional user data and role"""
+    token_class = ShardedRefreshToken
     
     @classmethod
     def get_token(cls, user):
@@ -168,12 +288,16 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         token['full_name'] = user.full_name
         token['role'] = user.role
         token['status'] = user.status
+        token[TOKEN_VERSION_CLAIM] = user.token_version
+        if sharding_enabled():
+            token[USER_SHARD_CLAIM] = user._state.db
         
         return token
     
     def validate(self, attrs):
         """Validate credentials and check user status"""
         data = super().validate(attrs)
+        self.user.record_login()
         
         # Check if user is active
         if self.user.status == 'INACTIVE':
@@ -200,3 +324,22 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         }
         
         return data
+
+
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refresh serializer that refuses tokens revoked by a version bump"""
+    
+    def validate(self, attrs):
+        """Check the token version before issuing new tokens"""
+        refresh = self.token_class(attrs['refresh'])
+        
+        current_version = (
+            User.objects.using(user_database_for_token(refresh) if sharding_enabled() else None)
+            .filter(pk=refresh.get(api_settings.USER_ID_CLAIM))
+            .values_list('token_version', flat=True)
+            .first()
+        )
+        if current_version is None or refresh.get(TOKEN_VERSION_CLAIM, 0) != current_version:
+            raise InvalidToken('Token has been revoked.')
+        
+        return super().validate(attrs)
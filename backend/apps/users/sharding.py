@@ -0,0 +1,261 @@
+"""
+Optional hash sharding of the User table across several database aliases.
+
+With USER_SHARDS empty (the default) every helper here degrades to the
+single 'default' database. When shards are configured, a user lives on the
+shard picked by a stable hash of their email, and user ids embed the shard
+index so a row can be found from its id alone:
+
+    | 32 bits: seconds since 2024-01-01 | 6 bits: shard index | 15 bits: sequence |
+
+Ids stay within 53 bits, so JavaScript clients hold them exactly as numbers.
+Ids issued before sharding was enabled have no timestamp as long as they
+are below 2**21, and decode to the first shard.
+
+Content types, permissions and groups stay managed on 'default' and are
+copied to every shard (sync_auth_tables), so a user's group and permission
+rows live on the user's shard next to valid foreign keys. Migrate 'default'
+before the shards.
+"""
+import hashlib
+import itertools
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import F, Q
+
+ID_EPOCH = 1704067200  # 2024-01-01T00:00:00Z
+SHARD_BITS = 6
+SEQUENCE_BITS = 15
+
+# Sequence numbers handed out in the current second, from a random start so
+# other processes issuing ids in the same second rarely pick the same ones
+_clock = {'second': None, 'start': 0, 'issued': 0}
+_clock_lock = threading.Lock()
+
+# Models whose tables every shard holds a copy of
+AUTH_MODELS = frozenset({'contenttypes.contenttype', 'auth.permission', 'auth.group'})
+
+# Users fetched from each shard per round while iterating a ShardedSequence
+ITERATION_BATCH = 500
+
+
+def sharding_enabled():
+    return bool(settings.USER_SHARDS)
+
+
+def user_databases():
+    """Aliases that hold User rows"""
+    return list(settings.USER_SHARDS) or [DEFAULT_DB_ALIAS]
+
+
+def shard_for_email(email):
+    """Database alias for the user with this email"""
+    shards = user_databases()
+    digest = hashlib.sha1(email.strip().lower().encode()).digest()
+    return shards[int.from_bytes(digest[:8], 'big') % len(shards)]
+
+
+def shard_for_user_id(user_id):
+    """Database alias encoded in a user id"""
+    shards = user_databases()
+    user_id = int(user_id)
+    if user_id >> (SHARD_BITS + SEQUENCE_BITS) == 0:
+        # Issued by the database before sharding was enabled
+        return shards[0]
+    index = (user_id >> SEQUENCE_BITS) & ((1 << SHARD_BITS) - 1)
+    return shards[index] if index < len(shards) else shards[0]
+
+
+def new_user_id(alias):
+    """Globally unique user id that records which shard the row lives on"""
+    index = user_databases().index(alias)
+    if index >= 1 << SHARD_BITS:
+        raise ImproperlyConfigured(f'User ids have room for {1 << SHARD_BITS} shards at most')
+    with _clock_lock:
+        while True:
+            second = int(time.time()) - ID_EPOCH
+            if second != _clock['second']:
+                _clock.update(second=second, start=random.randrange(1 << SEQUENCE_BITS), issued=0)
+            if _clock['issued'] < 1 << SEQUENCE_BITS:
+                break
+            # Every sequence number of this second is taken: wait for the next one
+            time.sleep(1 - time.time() % 1)
+        sequence = (_clock['start'] + _clock['issued']) & ((1 << SEQUENCE_BITS) - 1)
+        _clock['issued'] += 1
+    return (second << (SHARD_BITS + SEQUENCE_BITS)) | (index << SEQUENCE_BITS) | sequence
+
+
+def sync_auth_tables(alias):
+    """Make a shard's content types, permissions and groups match the default database.
+
+    Rows missing from 'default' or stored there under another id are
+    deleted, along with the shard's memberships that point at them.
+    """
+    from django.contrib.auth.models import Group, Permission
+    from django.contrib.contenttypes.models import ContentType
+
+    models = [ContentType, Permission, Group, Group.permissions.through]
+    with transaction.atomic(using=alias):
+        for model in models:
+            fields = [model._meta.pk.attname] + [
+                field.attname for field in model._meta.concrete_fields if not field.primary_key
+            ]
+            source = {row[0]: row for row in model.objects.using(DEFAULT_DB_ALIAS).values_list(*fields)}
+            target = {row[0]: row for row in model.objects.using(alias).values_list(*fields)}
+            stale = [pk for pk, row in target.items() if source.get(pk) != row]
+            model.objects.using(alias).filter(pk__in=stale).delete()
+            model.objects.using(alias).bulk_create([
+                model(**dict(zip(fields, row)))
+                for pk, row in source.items() if pk not in target or pk in stale
+            ])
+        # Rows were inserted with explicit ids
+        connection = connections[alias]
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), models):
+                cursor.execute(sql)
+    ContentType.objects.clear_cache()
+
+
+def sync_shard_auth_tables():
+    """sync_auth_tables for every shard"""
+    for alias in user_databases():
+        if alias != DEFAULT_DB_ALIAS:
+            sync_auth_tables(alias)
+
+
+def scatter(func, aliases=None):
+    """Call func(alias) for every user database, in parallel when there are several"""
+    aliases = aliases or user_databases()
+    if len(aliases) == 1:
+        return [func(aliases[0])]
+
+    def run(alias):
+        try:
+            return func(alias)
+        finally:
+            connections[alias].close()
+
+    with ThreadPoolExecutor(max_workers=len(aliases)) as pool:
+        return list(pool.map(run, aliases))
+
+
+class UserShardRouter:
+    """Route User rows to the shard chosen by their email hash.
+
+    Rows created against a user (outstanding tokens, group memberships) are
+    kept on that user's shard so foreign keys never cross databases; groups
+    and permissions from 'default' may be related to any user, since every
+    shard holds a copy of them.
+    """
+
+    def _db_for_user(self, model, **hints):
+        instance = hints.get('instance')
+        if not sharding_enabled() or instance is None:
+            return None
+        if instance._meta.label != settings.AUTH_USER_MODEL:
+            # Django falls back to the instance's own database
+            return None
+        if instance._state.db:
+            return instance._state.db
+        if getattr(instance, 'email', None):
+            return shard_for_email(instance.email)
+        return None
+
+    db_for_read = _db_for_user
+    db_for_write = _db_for_user
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """Objects may only be related within one database, or to the copied auth tables"""
+        if sharding_enabled() and AUTH_MODELS & {obj1._meta.label_lower, obj2._meta.label_lower}:
+            return True
+        if obj1._state.db and obj2._state.db:
+            return obj1._state.db == obj2._state.db
+        return None
+
+
+class ShardedSequence:
+    """Read-only view of a User queryset merged across all shards.
+
+    Pages are read by keyset: every shard returns at most one page of rows
+    after a position in `ordering`, and the results are merged, so a page
+    costs the same however deep it is. NULLs sort before any value, as in
+    UserListQuerySerializer.ORDERINGS (never-logged-in users).
+    """
+
+    def __init__(self, queryset, ordering=('-created_at', '-id')):
+        self.queryset = queryset
+        # (field name, descending) pairs, from names or F() orderings
+        self.ordering = [
+            (field.lstrip('-'), field.startswith('-')) if isinstance(field, str)
+            else (field.expression.name, field.descending)
+            for field in ordering
+        ]
+
+    def count(self):
+        return sum(scatter(lambda alias: self.queryset.using(alias).count()))
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        position = None
+        while True:
+            users = self.page(position, ITERATION_BATCH)
+            yield from users
+            if len(users) < ITERATION_BATCH:
+                return
+            position = self.position(users[-1])
+
+    def position(self, user):
+        """Keyset position of a user, for page()"""
+        return tuple(getattr(user, name) for name, _ in self.ordering)
+
+    def _directions(self, backwards):
+        return [(name, descending != backwards) for name, descending in self.ordering]
+
+    def _after(self, position, directions):
+        """Rows strictly after `position` in `directions` order"""
+        after = Q(pk__in=[])
+        equal = Q()
+        for (name, descending), value in zip(directions, position):
+            if value is None:
+                # Nothing sorts below NULL; every value sorts above it
+                beyond = Q(pk__in=[]) if descending else Q(**{f'{name}__isnull': False})
+                same = Q(**{f'{name}__isnull': True})
+            elif descending:
+                beyond = Q(**{f'{name}__lt': value}) | Q(**{f'{name}__isnull': True})
+                same = Q(**{name: value})
+            else:
+                beyond = Q(**{f'{name}__gt': value})
+                same = Q(**{name: value})
+            after |= equal & beyond
+            equal &= same
+        return after
+
+    def _sort(self, users, directions):
+        # Stable sorts from the last key to the first give the full ordering
+        for name, descending in reversed(directions):
+            users.sort(key=lambda user: (getattr(user, name) is not None, getattr(user, name)), reverse=descending)
+        return users
+
+    def page(self, position=None, size=10, backwards=False):
+        """Up to `size` users after `position` (before it, if backwards), in ordering"""
+        directions = self._directions(backwards)
+        order_by = [
+            F(name).desc(nulls_last=True) if descending else F(name).asc(nulls_first=True)
+            for name, descending in directions
+        ]
+        queryset = self.queryset.order_by(*order_by)
+        if position is not None:
+            queryset = queryset.filter(self._after(position, directions))
+        users = list(itertools.chain.from_iterable(
+            scatter(lambda alias: list(queryset.using(alias)[:size]))
+        ))
+        users = self._sort(users, directions)[:size]
+        return users[::-1] if backwards else users
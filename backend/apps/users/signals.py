@@ -0,0 +1,131 @@
+from django.contrib.auth.models import Group, Permission
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from .backends import bump_permissions_version, invalidate_user_permissions
+from .emailfilter import remember_email
+from .events import metrics_bus
+from .models import User, UserTombstone
+from .sharding import sharding_enabled, sync_auth_tables, sync_shard_auth_tables, user_databases
+
+# User fields that change what a permission check resolves to
+PERMISSION_FIELDS = {'role', 'is_superuser', 'is_active'}
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def user_permissions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Invalidate cached permissions of users whose groups or permissions changed"""
+    if not action.startswith('post_'):
+        return
+    if isinstance(instance, User):
+        invalidate_user_permissions([instance.pk])
+    elif action == 'post_clear':
+        # Cleared from the group/permission side: affected users are unknown
+        bump_permissions_version()
+    else:
+        invalidate_user_permissions(pk_set or [])
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def group_permissions_changed(sender, action, **kwargs):
+    """A group's permissions affect all of its members"""
+    if action.startswith('post_'):
+        bump_permissions_version()
+
+
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Permission)
+def permission_source_deleted(sender, **kwargs):
+    """Deleting a group or permission cascades without m2m signals"""
+    bump_permissions_version()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(m2m_changed, sender=Group.permissions.through)
+def group_changed(sender, using, action='post_', **kwargs):
+    """Copy group changes made on the default database to every shard"""
+    if sharding_enabled() and using == DEFAULT_DB_ALIAS and action.startswith('post_'):
+        transaction.on_commit(sync_shard_auth_tables, using=using)
+
+
+@receiver(post_migrate)
+def shard_migrated(sender, using, **kwargs):
+    """A migrated shard receives the default database's content types, permissions and groups"""
+    if sender.name == 'apps.users' and using != DEFAULT_DB_ALIAS and using in user_databases():
+        sync_auth_tables(using)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields, **kwargs):
+    """Role, superuser or active flag may have changed"""
+    if created or (update_fields is not None and not PERMISSION_FIELDS & set(update_fields)):
+        return
+    invalidate_user_permissions([instance.pk])
+
+
+def publish_metrics(**deltas):
+    """Publish a metrics delta once the surrounding transaction commits"""
+    deltas = {name: value for name, value in deltas.items() if value}
+    if deltas:
+        transaction.on_commit(lambda: metrics_bus.publish(**deltas))
+
+
+@receiver(post_save, sender=User)
+def user_metrics_on_save(sender, instance, created, **kwargs):
+    """Report registrations and status transitions to the live dashboard"""
+    active = instance.status == User.Status.ACTIVE
+    if created and getattr(instance, '_restored_from_archive', False):
+        # Restored users were already counted while archived
+        pass
+    elif created:
+        publish_metrics(
+            registrations=1,
+            total_users=1,
+            active_users=1 if active else 0,
+            inactive_users=0 if active else 1,
+        )
+    else:
+        previous = getattr(instance, '_loaded_status', None)
+        if previous is not None and previous != instance.status:
+            publish_metrics(
+                activations=1 if active else 0,
+                deactivations=0 if active else 1,
+                active_users=1 if active else -1,
+                inactive_users=-1 if active else 1,
+            )
+    instance._loaded_status = instance.status
+
+
+@receiver(post_delete, sender=User)
+def user_metrics_on_delete(sender, instance, **kwargs):
+    """Report deleted users to the live dashboard"""
+    active = instance.status == User.Status.ACTIVE
+    publish_metrics(
+        total_users=-1,
+        active_users=-1 if active else 0,
+        inactive_users=0 if active else -1,
+    )
+
+
+@receiver(post_delete, sender=User)
+def record_tombstone(sender, instance, **kwargs):
+    """Leave a tombstone so change feed consumers learn about the deletion"""
+    UserTombstone.objects.update_or_create(user_id=instance.pk, defaults={'deleted_at': timezone.now()})
+
+
+@receiver(post_save, sender=User)
+def clear_tombstone(sender, instance, created, **kwargs):
+    """A restored user is live again; its later updated_at supersedes the deletion"""
+    if created and getattr(instance, '_restored_from_archive', False):
+        UserTombstone.objects.filter(user_id=instance.pk).delete()
+
+
+@receiver(post_save, sender=User)
+def user_email_taken(sender, instance, created, update_fields, **kwargs):
+    """Let this process's email filter know about a new or changed email at once"""
+    if created or update_fields is None or 'email' in update_fields:
+        email = instance.email
+        transaction.on_commit(lambda: remember_email(email), using=instance._state.db)
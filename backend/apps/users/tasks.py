@@ -0,0 +1,57 @@
+"""Background tasks of the users app (run by `manage.py runworker`)"""
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from PIL import Image
+from apps.core.taskqueue import task
+from . import maintenance
+from .models import User
+from .sharding import shard_for_user_id, sharding_enabled
+
+
+def optimize_image(path):
+    """Convert an image to a progressive JPEG of at most 400x400, in place"""
+    img = Image.open(path)
+    
+    # Convert RGBA to RGB (PNG to JPEG)
+    if img.mode in ('RGBA', 'LA', 'P'):
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        if img.mode == 'RGBA':
+            background.paste(img, mask=img.split()[-1])
+        else:
+            background.paste(img)
+        img = background
+    
+    # Resize if larger than 400x400
+    max_size = (400, 400)
+    if img.height > max_size[0] or img.width > max_size[1]:
+        img.thumbnail(max_size, Image.Resampling.LANCZOS)
+    
+    # Save optimized image
+    img.save(path, 'JPEG', quality=85, optimize=True, progressive=True)
+
+
+@task(queue='media')
+def optimize_profile_picture(user_id, name):
+    """Optimize a newly uploaded profile picture unless it was replaced meanwhile"""
+    using = shard_for_user_id(user_id) if sharding_enabled() else 'default'
+    current = User.objects.using(using).filter(pk=user_id).values_list('profile_picture', flat=True).first()
+    if current == name and default_storage.exists(name):
+        optimize_image(default_storage.path(name))
+
+
+@task(queue='media')
+def delete_media_file(name):
+    """Remove a file that is no longer referenced"""
+    default_storage.delete(name)
+
+
+@task(max_attempts=1)
+def seed_users(count, clear=False):
+    """Run `manage.py seed_users` from a worker"""
+    call_command('seed_users', count=count, clear=clear)
+
+
+@task
+def sweep_dormant_users(days=90, action='deactivate', batch_size=1000, sleep=0.0, restart=False):
+    """Run the dormant account sweep from a worker; a retry resumes from its checkpoint"""
+    maintenance.sweep_dormant_users(days=days, action=action, batch_size=batch_size, sleep=sleep, restart=restart)
@@ -54,6 +54,100 @@ class TestAuthentication:
         assert response.status_code == 400
         assert 'email' in response.data
     
+    def test_registration_duplicate_email_ignores_case(self, api_client, create_user):
+        """Test the unique index rejects an email differing only in case with a 400"""
+        create_user(email='existing@example.com')
+        
+        response = api_client.post(reverse('register'), {
+            'email': 'Existing@Example.com',
+            'full_name': 'New User',
+            'password': 'StrongPass123!@#',
+            'confirm_password': 'StrongPass123!@#',
+        }, format='json')
+        
+        assert response.status_code == 400
+        assert response.data['email'] == ['Email already exists.']
+        assert User.objects.count() == 1
+    
+    def test_email_conflict_detected_by_constraint_name(self):
+        """Test only violations of the email constraints count as a taken email"""
+        from types import SimpleNamespace
+        from django.db import IntegrityError
+        from apps.users.managers import is_email_conflict
+        
+        def postgres_error(constraint, message):
+            cause = Exception(message)
+            cause.diag = SimpleNamespace(constraint_name=constraint)
+            error = IntegrityError(message)
+            error.__cause__ = cause
+            return error
+        
+        assert is_email_conflict(postgres_error('users_email_ci_uniq', 'duplicate key'))
+        assert is_email_conflict(postgres_error('users_user_email_key', 'duplicate key'))
+        assert not is_email_conflict(postgres_error('users_user_pkey', 'Key (email_domain)=(x) conflicts'))
+        assert is_email_conflict(IntegrityError("UNIQUE constraint failed: index 'users_email_ci_uniq'"))
+        assert not is_email_conflict(IntegrityError('UNIQUE constraint failed: users_user.id'))
+        assert not is_email_conflict(IntegrityError('NOT NULL constraint failed: users_user.email_domain'))
+    
+    def test_registration_skips_email_lookup(self, api_client):
+        """Test registration inserts without first querying live users by email"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.post(reverse('register'), {
+                'email': 'fast@example.com',
+                'full_name': 'Fast User',
+                'password': 'StrongPass123!@#',
+                'confirm_password': 'StrongPass123!@#',
+            }, format='json')
+        
+        assert response.status_code == 201
+        lookups = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('SELECT') and 'FROM "users_user"' in query['sql']
+        ]
+        assert lookups == []
+    
+    def test_registration_rejects_archived_email_ignoring_case(self, api_client, create_user):
+        """Test an archived account's email is taken whatever its case"""
+        from apps.users.archive import ARCHIVED_FIELDS
+        from apps.users.models import ArchivedUser
+        user = create_user(email='archived@example.com')
+        ArchivedUser.objects.create(**{field: getattr(user, field) for field in ARCHIVED_FIELDS})
+        user.delete()
+        
+        response = api_client.post(reverse('register'), {
+            'email': 'Archived@Example.com',
+            'full_name': 'Returning User',
+            'password': 'StrongPass123!@#',
+            'confirm_password': 'StrongPass123!@#',
+        }, format='json')
+        
+        assert response.status_code == 400
+        assert 'email' in response.data
+    
+    def test_registration_skips_archive_lookup_ruled_out_by_filter(self, api_client):
+        """Test an email the current email filter rules out costs no query of the archive"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from apps.users.emailfilter import refresh_email_filter, reset_email_filter
+        refresh_email_filter()
+        
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                response = api_client.post(reverse('register'), {
+                    'email': 'new@example.com',
+                    'full_name': 'New User',
+                    'password': 'StrongPass123!@#',
+                    'confirm_password': 'StrongPass123!@#',
+                }, format='json')
+        finally:
+            reset_email_filter()
+        
+        assert response.status_code == 201
+        assert not [query for query in queries.captured_queries if 'users_archiveduser' in query['sql']]
+    
     def test_user_login_success(self, api_client, create_user):
         """Test successful login"""
         user = create_user(email='login@example.com', password='TestPass123!@#')
@@ -98,3 +192,44 @@ class TestAuthentication:
         response = api_client.post(url, data, format='json')
         
         assert response.status_code == 400
+    
+    def test_change_password_revokes_existing_tokens(self, api_client, create_user):
+        """Test tokens issued before a password change stop working"""
+        create_user(email='revoke@example.com')
+        login = api_client.post(reverse('login'), {
+            'email': 'revoke@example.com',
+            'password': 'TestPass123!@#',
+        }, format='json')
+        old_access = login.data['access']
+        old_refresh = login.data['refresh']
+        
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {old_access}')
+        response = api_client.post(reverse('user-change-password'), {
+            'old_password': 'TestPass123!@#',
+            'new_password': 'NewPass123!@#',
+        }, format='json')
+        assert response.status_code == 200
+        new_access = response.data['tokens']['access']
+        
+        # Old access and refresh tokens are rejected
+        assert api_client.get(reverse('user-me')).status_code == 401
+        response = api_client.post(reverse('token_refresh'), {'refresh': old_refresh}, format='json')
+        assert response.status_code == 401
+        
+        # The freshly issued tokens keep working
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {new_access}')
+        assert api_client.get(reverse('user-me')).status_code == 200
+    
+    def test_revoke_tokens_bumps_version(self, api_client, create_user):
+        """Test revoking tokens invalidates a previously valid refresh token"""
+        user = create_user(email='bump@example.com')
+        login = api_client.post(reverse('login'), {
+            'email': 'bump@example.com',
+            'password': 'TestPass123!@#',
+        }, format='json')
+        
+        user.revoke_tokens()
+        
+        assert user.token_version == 1
+        response = api_client.post(reverse('token_refresh'), {'refresh': login.data['refresh']}, format='json')
+        assert response.status_code == 401
@@ -0,0 +1,82 @@
+import pytest
+from django.urls import reverse
+from apps.users.models import User
+
+
+@pytest.mark.django_db
+class TestBatch:
+    """Tests for the batch request endpoint"""
+    
+    def test_batch_runs_sub_requests_as_current_user(self, admin_client, create_user):
+        """Test several calls are answered in one response"""
+        client, admin = admin_client
+        create_user(email='batched@example.com')
+        
+        response = client.post(reverse('batch'), {'requests': [
+            {'id': 'me', 'method': 'GET', 'path': '/api/users/me/'},
+            {'id': 'list', 'method': 'GET', 'path': '/api/users/?page=1'},
+            {'id': 'stats', 'method': 'GET', 'path': '/api/users/statistics/?refresh=1'},
+            {'id': 'missing', 'method': 'GET', 'path': '/api/users/does/not/exist/'},
+        ]}, format='json')
+        
+        assert response.status_code == 200
+        me, users, stats, missing = response.data['responses']
+        assert me == {'id': 'me', 'status': 200, 'body': me['body']}
+        assert me['body']['email'] == admin.email
+        assert users['body']['count'] == 2
+        assert stats['body']['total_users'] == 2
+        assert missing['status'] == 404
+    
+    def test_batch_writes_and_permissions(self, authenticated_client):
+        """Test write sub-requests apply and sub-request permissions still hold"""
+        client, user = authenticated_client
+        
+        response = client.post(reverse('batch'), {'requests': [
+            {'method': 'PATCH', 'path': '/api/users/update_profile/', 'body': {'full_name': 'Batched Name'}},
+            {'method': 'GET', 'path': '/api/users/retention/'},
+        ]}, format='json')
+        
+        update, retention = response.data['responses']
+        assert update['status'] == 200
+        assert retention['status'] == 403
+        user.refresh_from_db()
+        assert user.full_name == 'Batched Name'
+    
+    @pytest.mark.parametrize('payload', [
+        {'requests': []},
+        {'requests': [{'method': 'GET', 'path': '/admin/'}]},
+        {'requests': [{'method': 'GET', 'path': '/api/batch/'}]},
+        {'requests': [{'method': 'POST', 'path': '/api/auth/login/', 'body': {}}]},
+        {'requests': [{'method': 'GET', 'path': '/api/users/../auth/email-available/'}]},
+        {'requests': [{'method': 'TRACE', 'path': '/api/users/me/'}]},
+    ])
+    def test_invalid_batches_rejected(self, authenticated_client, payload):
+        """Test malformed batches and disallowed paths are rejected"""
+        client, user = authenticated_client
+        
+        response = client.post(reverse('batch'), payload, format='json')
+        
+        assert response.status_code == 400
+    
+    def test_batch_requires_authentication(self, api_client):
+        """Test anonymous clients cannot use the batch endpoint"""
+        response = api_client.post(reverse('batch'), {'requests': [
+            {'method': 'GET', 'path': '/api/users/me/'},
+        ]}, format='json')
+        
+        assert response.status_code == 401
+
+
+@pytest.mark.django_db(transaction=True)
+def test_parallel_read_batch(api_client, admin_user):
+    """Test a read-only batch can run its sub-requests in parallel"""
+    api_client.force_authenticate(user=admin_user)
+    
+    response = api_client.post(reverse('batch'), {'parallel': True, 'requests': [
+        {'method': 'GET', 'path': '/api/users/me/'},
+        {'method': 'GET', 'path': f'/api/users/{admin_user.pk}/'},
+        {'method': 'GET', 'path': '/api/users/domains/'},
+    ]}, format='json')
+    
+    assert [item['status'] for item in response.data['responses']] == [200, 200, 200]
+    assert response.data['responses'][1]['body']['email'] == admin_user.email
@@ -0,0 +1,111 @@
+from datetime import timedelta
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from apps.users.archive import archive_users, restore_user
+from apps.users.models import ArchivedUser, User
+
+
+@pytest.fixture(autouse=True)
+def no_lag(settings):
+    """Serve changes immediately"""
+    settings.CHANGE_FEED_LAG_SECONDS = 0
+
+
+@pytest.fixture
+def feed_client(admin_client):
+    """Admin API client"""
+    client, _ = admin_client
+    return client
+
+
+def read_feed(client, **params):
+    """Fetch one page of the change feed"""
+    response = client.get(reverse('user-changes'), params)
+    assert response.status_code == 200
+    return response.data
+
+
+def ops(page):
+    """(op, email or id) pairs of a feed page"""
+    return [(change['op'], change['user']['email'] if change['user'] else change['id']) for change in page['changes']]
+
+
+@pytest.mark.django_db
+class TestChangeFeed:
+    """Tests for the admin change feed"""
+
+    def test_pages_in_order_and_resumes_from_cursor(self, feed_client, create_user):
+        """Test consumers page through everything once and then only see deltas"""
+        first = create_user(email='first@example.com')
+        create_user(email='second@example.com')
+
+        page = read_feed(feed_client, limit=2)
+        assert ops(page) == [('upsert', 'admin@example.com'), ('upsert', 'first@example.com')]
+        assert page['has_more']
+        page = read_feed(feed_client, cursor=page['next_cursor'])
+        assert ops(page) == [('upsert', 'second@example.com')]
+        assert not page['has_more']
+
+        cursor = page['next_cursor']
+        assert read_feed(feed_client, cursor=cursor)['changes'] == []
+
+        first.full_name = 'Renamed'
+        first.save(update_fields=['full_name'])
+        page = read_feed(feed_client, cursor=cursor)
+        assert ops(page) == [('upsert', 'first@example.com')]
+        assert page['changes'][0]['user']['full_name'] == 'Renamed'
+
+    def test_bulk_updates_and_deletes_are_reported(self, feed_client, create_user):
+        """Test queryset updates bump updated_at and deletions leave tombstones"""
+        user = create_user(email='bulk@example.com')
+        gone = create_user(email='gone@example.com')
+        cursor = read_feed(feed_client)['next_cursor']
+
+        User.objects.filter(pk=user.pk).update(status=User.Status.INACTIVE)
+        User.objects.filter(pk=user.pk).update(dormant_flagged_at=timezone.now())
+        gone_id = gone.pk
+        gone.delete()
+
+        page = read_feed(feed_client, cursor=cursor)
+        assert ops(page) == [('upsert', 'bulk@example.com'), ('delete', gone_id)]
+        assert page['changes'][0]['user']['status'] == 'INACTIVE'
+
+    def test_archive_and_restore(self, feed_client, create_user):
+        """Test archiving reports a delete and restoring reports the user again"""
+        user = create_user(email='idle@example.com', status=User.Status.INACTIVE)
+        long_ago = timezone.now() - timedelta(days=400)
+        User.objects.filter(pk=user.pk).update(created_at=long_ago, last_login=long_ago)
+        cursor = read_feed(feed_client)['next_cursor']
+
+        archive_users(days=365)
+        page = read_feed(feed_client, cursor=cursor)
+        assert ops(page) == [('delete', user.pk)]
+
+        restore_user(ArchivedUser.objects.get(pk=user.pk))
+        page = read_feed(feed_client, cursor=page['next_cursor'])
+        assert ops(page) == [('upsert', 'idle@example.com')]
+
+    def test_updated_since_and_lag(self, feed_client, create_user, settings):
+        """Test starting from a timestamp, and that fresh changes are held back"""
+        create_user(email='old@example.com')
+        User.objects.update(updated_at=timezone.now() - timedelta(days=2))
+        create_user(email='new@example.com')
+
+        since = (timezone.now() - timedelta(days=1)).isoformat()
+        assert ops(read_feed(feed_client, updated_since=since)) == [('upsert', 'new@example.com')]
+
+        settings.CHANGE_FEED_LAG_SECONDS = 60
+        assert ops(read_feed(feed_client)) == [('upsert', 'admin@example.com'), ('upsert', 'old@example.com')]
+
+    def test_validation_and_permissions(self, feed_client, regular_user):
+        """Test bad parameters are rejected and regular users are refused"""
+        url = reverse('user-changes')
+        user_client = APIClient()
+        user_client.force_authenticate(user=regular_user)
+
+        assert feed_client.get(url, {'cursor': 'not-a-cursor'}).status_code == 400
+        assert feed_client.get(url, {'updated_since': 'yesterday'}).status_code == 400
+        assert feed_client.get(url, {'limit': 0}).status_code == 400
+        assert user_client.get(url).status_code == 403
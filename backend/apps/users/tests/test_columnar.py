@@ -0,0 +1,80 @@
+import json
+from datetime import timedelta
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from apps.users.analytics import database_statistics
+from apps.users.columnar import UserSnapshot, read_pointer, refresh_snapshot, reset_user_snapshot
+from apps.users.models import User
+
+
+@pytest.fixture
+def snapshot_dir(settings, tmp_path):
+    """Serve statistics from a columnar snapshot in a temporary directory"""
+    settings.ANALYTICS_SNAPSHOT_DIR = str(tmp_path)
+    settings.CHANGE_FEED_LAG_SECONDS = 0
+    reset_user_snapshot()
+    yield tmp_path
+    reset_user_snapshot()
+
+
+@pytest.fixture
+def population(create_user):
+    """Users spread over signup dates, logins, statuses and roles"""
+    now = timezone.now()
+    users = []
+    for index in range(40):
+        user = create_user(
+            email=f'user{index}@example.com',
+            password=None,
+            status=User.Status.INACTIVE if index % 3 == 0 else User.Status.ACTIVE,
+            role=User.Role.ADMIN if index % 7 == 0 else User.Role.USER,
+        )
+        created_at = now - timedelta(days=index * 17, hours=index)
+        last_login = None if index % 4 == 0 else now - timedelta(days=index * 3)
+        User.objects.filter(pk=user.pk).update(created_at=created_at, last_login=last_login)
+        users.append(user)
+    return users
+
+
+@pytest.mark.django_db
+class TestUserSnapshot:
+    """Tests for the columnar statistics engine"""
+
+    def test_matches_orm_statistics(self, population):
+        """Test vectorized histograms equal the grouped ORM queries"""
+        now = timezone.now()
+
+        snapshot = UserSnapshot.build(now)
+
+        assert len(snapshot) == 40
+        assert snapshot.statistics(now) == database_statistics('default', now)
+
+    def test_incremental_refresh(self, population, snapshot_dir):
+        """Test a refresh applies only changed and deleted users"""
+        first = refresh_snapshot()
+        assert refresh_snapshot().version == first.version
+
+        User.objects.filter(pk=population[1].pk).update(status=User.Status.INACTIVE, last_login=None)
+        population[2].delete()
+        User.objects.create_user(email='new@example.com', full_name='New User')
+
+        snapshot = refresh_snapshot()
+
+        assert snapshot.version != first.version
+        assert read_pointer(snapshot_dir)['version'] == snapshot.version
+        assert [path.name for path in snapshot_dir.iterdir() if path.is_dir()] == [snapshot.version]
+        now = timezone.now()
+        assert UserSnapshot.load(snapshot_dir).statistics(now) == database_statistics('default', now)
+
+    def test_statistics_endpoint_uses_snapshot(self, admin_client, population, snapshot_dir, settings):
+        """Test the endpoint payload is the same with and without the snapshot"""
+        client, _ = admin_client
+
+        columnar = client.get(reverse('user-statistics'), {'refresh': '1'})
+        assert read_pointer(snapshot_dir) is not None
+        settings.ANALYTICS_SNAPSHOT_DIR = ''
+        orm = client.get(reverse('user-statistics'), {'refresh': '1'})
+
+        assert columnar.status_code == orm.status_code == 200
+        assert json.loads(columnar.content) == json.loads(orm.content)
@@ -0,0 +1,314 @@
+import json
+import pytest
+from datetime import timedelta
+from io import StringIO
+from django.contrib.auth.models import Group, Permission
+from django.core.management import CommandError, call_command
+from django.urls import reverse
+from django.utils import timezone
+from apps.users.models import ArchivedUser, User, SweepCheckpoint, UserTombstone
+
+
+@pytest.mark.django_db
+class TestSweepDormantUsers:
+    """Tests for the dormant account sweeper command"""
+    
+    @pytest.fixture
+    def dormant_setup(self, create_user):
+        """Create a mix of dormant, recent and admin users"""
+        long_ago = timezone.now() - timedelta(days=200)
+        dormant = create_user(email='dormant@example.com')
+        recent = create_user(email='recent@example.com')
+        admin = create_user(email='admin@example.com', role=User.Role.ADMIN)
+        User.objects.filter(pk__in=[dormant.pk, admin.pk]).update(
+            last_login=long_ago, created_at=long_ago
+        )
+        User.objects.filter(pk=recent.pk).update(last_login=timezone.now())
+        return dormant, recent, admin
+    
+    def test_deactivates_dormant_users_only(self, dormant_setup):
+        """Test dormant users are deactivated in batches and admins are skipped"""
+        dormant, recent, admin = dormant_setup
+        
+        call_command('sweep_dormant_users', '--days', '90', '--batch-size', '1', stdout=StringIO())
+        
+        dormant.refresh_from_db()
+        recent.refresh_from_db()
+        admin.refresh_from_db()
+        assert dormant.status == User.Status.INACTIVE
+        assert dormant.is_active is False
+        assert dormant.token_version == 1
+        assert recent.status == User.Status.ACTIVE
+        assert admin.status == User.Status.ACTIVE
+        assert SweepCheckpoint.objects.get(name='dormant-sweep:deactivate:90d').last_pk == 0
+    
+    def test_dry_run_changes_nothing(self, dormant_setup):
+        """Test dry run only reports the dormant count"""
+        dormant, _, _ = dormant_setup
+        out = StringIO()
+        
+        call_command('sweep_dormant_users', '--dry-run', stdout=out)
+        
+        dormant.refresh_from_db()
+        assert dormant.status == User.Status.ACTIVE
+        assert '1 dormant user(s) would be deactivated' in out.getvalue()
+    
+    def test_resumes_from_checkpoint(self, dormant_setup):
+        """Test a run skips rows below the saved checkpoint"""
+        dormant, _, _ = dormant_setup
+        SweepCheckpoint.objects.create(name='dormant-sweep:flag:90d', last_pk=dormant.pk)
+        
+        call_command('sweep_dormant_users', '--action', 'flag', stdout=StringIO())
+        
+        dormant.refresh_from_db()
+        assert dormant.dormant_flagged_at is None
+    
+    def test_checkpoint_is_per_cutoff(self, dormant_setup):
+        """Test a run with other --days ignores the checkpoint of an interrupted run"""
+        dormant, _, _ = dormant_setup
+        SweepCheckpoint.objects.create(name='dormant-sweep:flag:30d', last_pk=dormant.pk)
+        
+        call_command('sweep_dormant_users', '--action', 'flag', '--days', '90', stdout=StringIO())
+        
+        dormant.refresh_from_db()
+        assert dormant.dormant_flagged_at is not None
+        assert SweepCheckpoint.objects.get(name='dormant-sweep:flag:30d').last_pk == dormant.pk
+    
+    def test_background_queues_task(self, dormant_setup, settings):
+        """Test --background leaves the sweep to the worker"""
+        from apps.core.models import Task
+        from apps.core.taskqueue import claim, execute
+        dormant, _, _ = dormant_setup
+        settings.TASKS_EAGER = False
+        
+        call_command('sweep_dormant_users', '--background', '--days', '90', stdout=StringIO())
+        
+        job = Task.objects.get()
+        assert job.name == 'apps.users.tasks.sweep_dormant_users'
+        assert job.kwargs['days'] == 90
+        dormant.refresh_from_db()
+        assert dormant.status == User.Status.ACTIVE
+        
+        assert execute(claim('test-worker')[0]) == Task.Status.SUCCEEDED
+        
+        dormant.refresh_from_db()
+        assert dormant.status == User.Status.INACTIVE
+
+
+@pytest.mark.django_db
+class TestArchiveUsers:
+    """Tests for the archive tier"""
+    
+    @pytest.fixture
+    def stale_user(self, create_user):
+        """An inactive user idle for over a year, member of a group"""
+        long_ago = timezone.now() - timedelta(days=400)
+        user = create_user(email='stale@example.com', status=User.Status.INACTIVE, is_active=False)
+        user.groups.add(Group.objects.create(name='Legacy'))
+        User.objects.filter(pk=user.pk).update(last_login=long_ago, created_at=long_ago)
+        return user
+    
+    def test_archives_and_restores(self, stale_user, create_user, admin_client):
+        """Test stale users leave the hot table and can be restored intact"""
+        active = create_user(email='active@example.com')
+        client, admin = admin_client
+        
+        call_command('archive_users', '--days', '365', stdout=StringIO())
+        
+        assert not User.objects.filter(pk=stale_user.pk).exists()
+        assert User.objects.filter(pk=active.pk).exists()
+        stats = client.get(reverse('user-statistics'), {'refresh': '1'})
+        assert stats.status_code == 200
+        data = json.loads(stats.content)
+        assert data['archived_users'] == 1
+        assert data['total_users'] == 3
+        assert data['inactive_users'] == 1
+        
+        archived = ArchivedUser.objects.get(pk=stale_user.pk)
+        response = client.post(reverse('archived-user-restore', kwargs={'pk': archived.pk}))
+        
+        assert response.status_code == 200
+        restored = User.objects.get(pk=stale_user.pk)
+        assert restored.check_password('TestPass123!@#')
+        assert restored.created_at < timezone.now() - timedelta(days=399)
+        assert list(restored.groups.values_list('name', flat=True)) == ['Legacy']
+        assert not ArchivedUser.objects.exists()
+    
+    def test_archived_email_cannot_register(self, stale_user, api_client):
+        """Test an archived account's email stays reserved"""
+        call_command('archive_users', stdout=StringIO())
+        
+        response = api_client.post(reverse('register'), {
+            'email': 'stale@example.com',
+            'full_name': 'New Stale',
+            'password': 'StrongPass123!@#',
+            'confirm_password': 'StrongPass123!@#',
+        }, format='json')
+        
+        assert response.status_code == 400
+        assert 'email' in response.data
+
+
+@pytest.mark.django_db(transaction=True)
+class TestLoadtest:
+    """Tests for the in-process load generation command"""
+    
+    @pytest.mark.parametrize('mode', ['threads', 'asyncio'])
+    def test_reports_percentiles_per_endpoint(self, mode, tmp_path):
+        """Test every endpoint is driven without errors and summarised"""
+        report_path = tmp_path / 'report.json'
+        out = StringIO()
+        
+        call_command(
+            'loadtest', '--users', '2', '--concurrency', '2', '--requests', '2',
+            '--mode', mode, '--json', str(report_path), stdout=out,
+        )
+        
+        report = json.loads(report_path.read_text())
+        rows = {row['endpoint']: row for row in report['endpoints']}
+        assert list(rows) == ['login', 'refresh', 'me', 'users', 'statistics', 'total']
+        for name in ('login', 'refresh', 'me', 'users', 'statistics'):
+            assert rows[name]['requests'] == 4
+            assert rows[name]['errors'] == 0
+            assert rows[name]['p50_ms'] <= rows[name]['p95_ms'] <= rows[name]['p99_ms']
+        assert rows['total']['requests'] == 20
+        assert 'p99_ms' in out.getvalue()
+    
+    def test_reuses_kept_users_and_cleans_up_by_default(self):
+        """Test kept users get a fresh random password on reuse and are removed afterwards by default"""
+        args = ['loadtest', '--users', '1', '--concurrency', '1', '--requests', '1', '--endpoints', 'me']
+        call_command(*args, '--keep-users', stdout=StringIO())
+        admin = User.objects.get(email='loadtest-admin@loadtest.invalid')
+        assert User.objects.filter(email_domain='loadtest.invalid').count() == 2
+        assert not admin.check_password('LoadTest123!@#')
+        
+        call_command(*args, '--keep-users', stdout=StringIO())
+        assert User.objects.get(pk=admin.pk).password != admin.password
+        
+        call_command(*args, stdout=StringIO())
+        
+        assert not User.objects.filter(email_domain='loadtest.invalid').exists()
+    
+    def test_register_endpoint_signs_up_users(self):
+        """Test the optional register endpoint adds a user per request"""
+        call_command(
+            'loadtest', '--users', '1', '--concurrency', '1', '--requests', '2',
+            '--endpoints', 'register', '--keep-users', stdout=StringIO(),
+        )
+        
+        assert User.objects.filter(email_domain='loadtest.invalid').count() == 4
+    
+    def test_rejects_unknown_endpoint(self):
+        """Test a typo in --endpoints fails before any user is seeded"""
+        with pytest.raises(CommandError):
+            call_command('loadtest', '--endpoints', 'me,profile', stdout=StringIO())
+        
+        assert not User.objects.exists()
+
+
+@pytest.mark.django_db
+class TestDumpRestoreUsers:
+    """Tests for the bulk user dump and restore commands"""
+    
+    @pytest.fixture
+    def members(self, create_user):
+        """A group member with a permission and a past login, and an inactive user"""
+        long_ago = timezone.now() - timedelta(days=30)
+        editor = create_user(email='editor@example.com', full_name='Edith Editor', password=None)
+        editor.groups.add(Group.objects.create(name='Editors'))
+        editor.user_permissions.add(Permission.objects.get(codename='view_user'))
+        reader = create_user(email='reader@example.com', full_name='Rita Reader', password=None, is_active=False)
+        User.objects.filter(pk=editor.pk).update(last_login=long_ago, created_at=long_ago)
+        return editor, reader
+    
+    def snapshot(self):
+        return [
+            (user.pk, user.email, user.full_name, user.password, user.is_active, user.last_login,
+             user.created_at, user.profile_picture.name,
+             sorted(user.groups.values_list('name', flat=True)),
+             sorted(user.user_permissions.values_list('codename', flat=True)))
+            for user in User.objects.order_by('pk')
+        ]
+    
+    @pytest.mark.parametrize('compress', [False, True])
+    def test_round_trip(self, members, tmp_path, compress):
+        """Test a dump restored over a wiped table reproduces every user and membership"""
+        before = self.snapshot()
+        args = ['--compress'] if compress else []
+        
+        call_command('dump_users', str(tmp_path), *args, stdout=StringIO())
+        Group.objects.all().delete()
+        out = StringIO()
+        call_command('restore_users', str(tmp_path), '--truncate', '--batch-size', '1', '--progress-every', '1', stdout=out)
+        
+        assert self.snapshot() == before
+        assert 'users: 1 rows' in out.getvalue()
+        assert 'Restored 2 user(s)' in out.getvalue()
+    
+    def test_scrub_removes_personal_data(self, members, tmp_path):
+        """Test scrubbed dumps keep ids and memberships but no emails, names or passwords"""
+        editor, reader = members
+        
+        call_command('dump_users', str(tmp_path), '--scrub', stdout=StringIO())
+        
+        dumped = (tmp_path / 'users.csv').read_text()
+        assert 'example.com' not in dumped
+        assert 'Edith' not in dumped
+        assert editor.password not in dumped
+        call_command('restore_users', str(tmp_path), '--truncate', stdout=StringIO())
+        restored = User.objects.get(pk=editor.pk)
+        assert restored.email == f'user{editor.pk}@scrubbed.invalid'
+        assert restored.email_domain == 'scrubbed.invalid'
+        assert not restored.has_usable_password()
+        assert list(restored.groups.values_list('name', flat=True)) == ['Editors']
+    
+    def test_clashing_users_abort_restore(self, members, tmp_path):
+        """Test restoring over existing users without --truncate changes nothing"""
+        call_command('dump_users', str(tmp_path), stdout=StringIO())
+        before = self.snapshot()
+        
+        with pytest.raises(CommandError, match='clashes with existing users'):
+            call_command('restore_users', str(tmp_path), stdout=StringIO())
+        
+        assert self.snapshot() == before
+    
+    def test_restore_reaches_change_feed(self, members, create_user, tmp_path):
+        """Test truncated users leave tombstones and restored users look freshly updated"""
+        call_command('dump_users', str(tmp_path), stdout=StringIO())
+        dropped = create_user(email='dropped@example.com', password=None)
+        started = timezone.now()
+        
+        call_command('restore_users', str(tmp_path), '--truncate', stdout=StringIO())
+        
+        assert UserTombstone.objects.filter(user_id=dropped.pk, deleted_at__gte=started).exists()
+        assert UserTombstone.objects.count() == 3
+        restored = User.objects.all()
+        assert len(restored) == 2
+        assert all(user.updated_at > UserTombstone.objects.get(user_id=user.pk).deleted_at for user in restored)
+    
+    def test_restore_without_truncate_stamps_only_restored_users(self, members, create_user, tmp_path):
+        """Test users already present keep their updated_at"""
+        call_command('dump_users', str(tmp_path), stdout=StringIO())
+        User.objects.all().delete()
+        kept = create_user(email='kept@example.com', password=None)
+        
+        call_command('restore_users', str(tmp_path), stdout=StringIO())
+        
+        assert User.objects.get(pk=kept.pk).updated_at == kept.updated_at
+        assert User.objects.exclude(pk=kept.pk).filter(updated_at__gt=kept.updated_at).count() == 2
+    
+    def test_unknown_permissions_skipped(self, members, tmp_path):
+        """Test permissions missing from the target database are counted, not fatal"""
+        call_command('dump_users', str(tmp_path), stdout=StringIO())
+        Permission.objects.filter(codename='view_user').delete()
+        out = StringIO()
+        
+        call_command('restore_users', str(tmp_path), '--truncate', stdout=out)
+        
+        assert User.objects.count() == 2
+        assert 'Skipped 1 permission assignment(s)' in out.getvalue()
+    
+    def test_rejects_missing_dump(self, tmp_path):
+        """Test a directory without a manifest is refused"""
+        with pytest.raises(CommandError):
+            call_command('restore_users', str(tmp_path), stdout=StringIO())
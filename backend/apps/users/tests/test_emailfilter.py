@@ -0,0 +1,119 @@
+import pytest
+from django.urls import reverse
+from apps.users.emailfilter import BloomFilter, reset_email_filter
+from apps.users.models import User
+
+
+@pytest.fixture(autouse=True)
+def fresh_filter(monkeypatch):
+    """Build the email filter from the test database, inside the request for determinism"""
+    reset_email_filter()
+    monkeypatch.setattr('apps.users.emailfilter._start', lambda func: func())
+    yield
+    reset_email_filter()
+
+
+def available(api_client, email):
+    response = api_client.get(reverse('email-available'), {'email': email})
+    assert response.status_code == 200
+    return response.data['available']
+
+
+class TestBloomFilter:
+    """Tests for the Bloom filter itself"""
+
+    def test_no_false_negatives_and_few_false_positives(self):
+        """Test every added value is found and strangers mostly are not"""
+        bloom = BloomFilter(5000, error_rate=0.01)
+        for index in range(5000):
+            bloom.add(f'user{index}@example.com')
+
+        assert all(f'user{index}@example.com' in bloom for index in range(5000))
+        false_positives = sum(f'other{index}@example.com' in bloom for index in range(10000))
+        assert false_positives < 300
+
+
+@pytest.mark.django_db
+class TestEmailAvailable:
+    """Tests for the signup form's email availability check"""
+
+    def test_taken_and_free_emails(self, api_client, create_user):
+        """Test taken emails are reported regardless of case"""
+        create_user(email='taken@example.com', password=None)
+
+        assert available(api_client, 'taken@example.com') is False
+        assert available(api_client, 'Taken@Example.COM') is False
+        assert available(api_client, 'free@example.com') is True
+
+    def test_miss_answered_without_queries(self, api_client, create_user, django_assert_num_queries):
+        """Test an email absent from the filter needs no database query"""
+        create_user(email='taken@example.com', password=None)
+        available(api_client, 'warm@example.com')
+
+        with django_assert_num_queries(0):
+            assert available(api_client, 'free@example.com') is True
+
+    def test_hit_confirmed_in_database(self, api_client, create_user):
+        """Test a deleted user's email, still in the filter, is reported free"""
+        user = create_user(email='gone@example.com', password=None)
+        assert available(api_client, 'gone@example.com') is False
+
+        user.delete()
+
+        assert available(api_client, 'gone@example.com') is True
+
+    def test_new_registration_seen_at_once(self, api_client, django_capture_on_commit_callbacks):
+        """Test users created by this process are added to the filter on commit"""
+        assert available(api_client, 'new@example.com') is True
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = api_client.post(reverse('register'), {
+                'email': 'new@example.com',
+                'full_name': 'New User',
+                'password': 'StrongPass123!@#',
+                'confirm_password': 'StrongPass123!@#',
+            }, format='json')
+        assert response.status_code == 201
+
+        assert available(api_client, 'new@example.com') is False
+
+    def test_other_processes_picked_up_on_refresh(self, api_client, settings):
+        """Test users written without signals, as by another process, show up after a refresh"""
+        assert available(api_client, 'elsewhere@example.com') is True
+        User.objects.bulk_create([User(email='elsewhere@example.com', full_name='Elsewhere')])
+
+        assert available(api_client, 'elsewhere@example.com') is True
+        settings.EMAIL_FILTER_REFRESH = 0
+        assert available(api_client, 'elsewhere@example.com') is False
+
+    def test_unknown_until_built_in_background(self, api_client, monkeypatch):
+        """Test requests never build the filter themselves and answer null until it exists"""
+        started = []
+        monkeypatch.setattr('apps.users.emailfilter._start', started.append)
+
+        assert available(api_client, 'early@example.com') is None
+        assert available(api_client, 'early@example.com') is None
+        assert len(started) == 1
+
+        started[0]()
+
+        assert available(api_client, 'early@example.com') is True
+
+    @pytest.mark.parametrize('email', ['', 'not-an-email'])
+    def test_invalid_email_rejected(self, api_client, email):
+        """Test a missing or malformed email returns 400"""
+        response = api_client.get(reverse('email-available'), {'email': email})
+
+        assert response.status_code == 400
+        assert 'error' in response.data
+
+    def test_throttled_per_client(self, api_client, monkeypatch):
+        """Test one client cannot probe emails beyond the configured rate"""
+        from rest_framework.throttling import ScopedRateThrottle
+        monkeypatch.setattr(ScopedRateThrottle, 'THROTTLE_RATES', {'email_available': '2/minute'})
+
+        for _ in range(2):
+            available(api_client, 'probe@example.com')
+        response = api_client.get(reverse('email-available'), {'email': 'probe@example.com'})
+
+        assert response.status_code == 429
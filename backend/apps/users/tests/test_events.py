@@ -0,0 +1,106 @@
+import pytest
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+from apps.users.authentication import MetricsStreamTicket
+from apps.users.events import MetricsEventBus, MetricsStream, metrics_bus
+from apps.users.models import User
+
+
+class TestMetricsEventBus:
+    """Tests for the shared metrics ring buffer"""
+    
+    def test_events_since_cursor(self):
+        """Test readers only get events after their cursor"""
+        bus = MetricsEventBus()
+        bus.publish(registrations=1)
+        cursor = bus.last_id
+        bus.publish(deactivations=1)
+        
+        events = bus.events_since(cursor)
+        
+        assert [event['deactivations'] for event in events] == [1]
+    
+    def test_overflow_requires_resync(self):
+        """Test a reader that fell behind the buffer is told to resync"""
+        bus = MetricsEventBus(maxlen=2)
+        for _ in range(3):
+            bus.publish(registrations=1)
+        
+        assert bus.events_since(0) is None
+
+
+@pytest.mark.django_db
+class TestMetricsStream:
+    """Tests for live metrics published from user changes"""
+    
+    def test_registration_and_deactivation_publish_deltas(
+        self, admin_client, create_user, django_capture_on_commit_callbacks
+    ):
+        """Test signals publish registration and status transition deltas"""
+        client, admin = admin_client
+        cursor = metrics_bus.last_id
+        
+        with django_capture_on_commit_callbacks(execute=True):
+            user = create_user(email='live@example.com')
+        with django_capture_on_commit_callbacks(execute=True):
+            client.post(reverse('user-deactivate', kwargs={'pk': user.pk}))
+        
+        registered, deactivated = metrics_bus.events_since(cursor)
+        assert registered['registrations'] == 1
+        assert registered['active_users'] == 1
+        assert deactivated['deactivations'] == 1
+        assert deactivated['active_users'] == -1
+    
+    def test_stream_starts_with_snapshot_and_streams_deltas(self, create_user):
+        """Test a stream sends a snapshot and then pending deltas"""
+        create_user(email='snap@example.com')
+        bus = MetricsEventBus()
+        iterator = iter(MetricsStream(bus=bus, heartbeat=0.01, max_seconds=5))
+        
+        assert next(iterator) == b'retry: 5000\n\n'
+        assert b'"total_users":1' in next(iterator)
+        bus.publish(registrations=1)
+        assert next(iterator).startswith(b'event: delta\nid: 1\n')
+    
+    def test_stream_endpoint_accepts_ticket(self, api_client, admin_user, settings):
+        """Test EventSource clients exchange their access token for a ?ticket="""
+        settings.METRICS_STREAM_MAX_SECONDS = 0
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(admin_user)}')
+        ticket = api_client.post(reverse('user-statistics-stream-ticket')).data['ticket']
+        api_client.credentials()
+        
+        response = api_client.get(reverse('user-statistics-stream'), {'ticket': ticket})
+        
+        assert response.status_code == 200
+        assert response['Content-Type'] == 'text/event-stream'
+        assert b'event: snapshot' in b''.join(response.streaming_content)
+    
+    def test_access_token_not_accepted_in_query(self, api_client, admin_user):
+        """Test the general access token never authenticates from the URL"""
+        token = AccessToken.for_user(admin_user)
+        
+        response = api_client.get(reverse('user-statistics-stream'), {'ticket': str(token)})
+        assert response.status_code == 401
+        response = api_client.get(reverse('user-statistics-stream'), {'token': str(token)})
+        assert response.status_code == 401
+    
+    def test_ticket_only_opens_the_stream(self, api_client, admin_user, settings):
+        """Test a ticket is refused as a bearer token and once expired"""
+        ticket = MetricsStreamTicket.for_user(admin_user)
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {ticket}')
+        
+        assert api_client.get(reverse('user-list')).status_code == 401
+        
+        settings.METRICS_STREAM_TICKET_LIFETIME = -1
+        api_client.credentials()
+        expired = MetricsStreamTicket.for_user(admin_user)
+        response = api_client.get(reverse('user-statistics-stream'), {'ticket': str(expired)})
+        assert response.status_code == 401
+    
+    def test_regular_user_cannot_stream(self, authenticated_client):
+        """Test regular users cannot open the metrics stream"""
+        client, user = authenticated_client
+        
+        response = client.get(reverse('user-statistics-stream'))
+        
+        assert response.status_code == 403
@@ -0,0 +1,89 @@
+from io import StringIO
+from unittest import mock
+import pytest
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.db.models.signals import post_save
+from django.urls import reverse
+from apps.users.models import User
+
+PASSWORD = 'TestPass123!@#'
+
+
+def login(api_client, user):
+    """Log in through the API"""
+    return api_client.post(reverse('login'), {'email': user.email, 'password': PASSWORD})
+
+
+@pytest.mark.django_db
+class TestRehashOnLogin:
+    """Tests for upgrading stale password hashes at login"""
+
+    def test_legacy_hash_upgraded_without_save(self, api_client, regular_user):
+        """Test login upgrades a PBKDF2 hash and stamps last_login without save()"""
+        User.objects.filter(pk=regular_user.pk).update(password=make_password(PASSWORD, hasher='pbkdf2_sha256'))
+        saved = mock.Mock()
+        post_save.connect(saved, sender=User)
+
+        try:
+            with mock.patch.object(User, 'save', side_effect=AssertionError('save() called')):
+                response = login(api_client, regular_user)
+        finally:
+            post_save.disconnect(saved, sender=User)
+
+        assert response.status_code == 200
+        assert not saved.called
+        regular_user.refresh_from_db()
+        assert regular_user.password.startswith('argon2$')
+        assert regular_user.last_login is not None
+        assert regular_user.check_password(PASSWORD)
+
+    def test_cost_change_makes_hashes_stale(self, api_client, regular_user, settings):
+        """Test raising the Argon2 cost upgrades hashes on the next login"""
+        settings.ARGON2_TIME_COST = 3
+
+        assert '1 of 1 user(s) will be rehashed' in self.report()
+        assert login(api_client, regular_user).status_code == 200
+
+        regular_user.refresh_from_db()
+        assert ',t=3,' in regular_user.password
+        assert '0 of 1 user(s) will be rehashed' in self.report()
+
+    def test_report_groups_by_algorithm_and_cost(self, create_user):
+        """Test the hash mix lists each algorithm and cost with its share"""
+        create_user(email='current@example.com')
+        legacy = create_user(email='legacy@example.com')
+        User.objects.filter(pk=legacy.pk).update(password=make_password(PASSWORD, hasher='pbkdf2_sha1'))
+        unusable = create_user(email='unusable@example.com')
+        User.objects.filter(pk=unusable.pk).update(password=make_password(None))
+
+        output = self.report()
+
+        assert 'argon2' in output and 'memory_cost=102400,parallelism=8' in output
+        assert 'pbkdf2_sha1       iterations=720000' in output
+        assert 'unusable' in output
+        assert '1 of 3 user(s) will be rehashed' in output
+
+    @staticmethod
+    def report():
+        out = StringIO()
+        call_command('password_hashes', stdout=out)
+        return out.getvalue()
+
+
+class TestCalibration:
+    """Tests for the hasher calibration command"""
+
+    def test_prints_settings_for_target(self):
+        """Test calibration reports costs within the target latency"""
+        out = StringIO()
+
+        call_command(
+            'calibrate_hashers', '--target-ms', '40', '--memory-kib', '8192', '--parallelism', '1',
+            '--rounds', '1', stdout=out,
+        )
+
+        output = out.getvalue()
+        assert 'ARGON2_MEMORY_COST=8192' in output
+        assert 'ARGON2_TIME_COST=' in output
+        assert 'PBKDF2_ITERATIONS=' in output
@@ -0,0 +1,85 @@
+import json
+import pytest
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from apps.core import renderers
+from apps.core.renderers import FastJSONRenderer
+
+
+def assert_stdlib_compatible(response):
+    """The served bytes must equal what DRF's stdlib JSONRenderer produces"""
+    assert response['Content-Type'].startswith('application/json')
+    assert response.content == JSONRenderer().render(response.data)
+    assert FastJSONRenderer().render(response.data) == response.content
+
+
+@pytest.mark.django_db
+class TestJSONCompatibility:
+    """Every endpoint renders byte-for-byte the same as with the stdlib renderer"""
+    
+    def test_auth_endpoints(self, api_client, create_user):
+        """Test register, login, refresh, error and logout responses"""
+        register = api_client.post(reverse('register'), {
+            'email': 'compat@example.com',
+            'full_name': 'Compat Ü',
+            'password': 'StrongPass123!@#',
+            'confirm_password': 'StrongPass123!@#',
+        }, format='json')
+        assert_stdlib_compatible(register)
+        
+        duplicate = api_client.post(reverse('register'), {
+            'email': 'compat@example.com',
+            'full_name': 'Compat',
+            'password': 'StrongPass123!@#',
+            'confirm_password': 'StrongPass123!@#',
+        }, format='json')
+        assert_stdlib_compatible(duplicate)
+        
+        login = api_client.post(reverse('login'), {
+            'email': 'compat@example.com',
+            'password': 'StrongPass123!@#',
+        }, format='json')
+        assert_stdlib_compatible(login)
+        
+        refresh = api_client.post(reverse('token_refresh'), {'refresh': login.data['refresh']}, format='json')
+        assert_stdlib_compatible(refresh)
+        
+        api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.data['access']}")
+        logout = api_client.post(reverse('logout'), {'refresh': refresh.data['refresh']}, format='json')
+        assert_stdlib_compatible(logout)
+    
+    def test_user_endpoints(self, admin_client, create_user):
+        """Test profile, list, detail and admin action responses"""
+        client, admin = admin_client
+        other = create_user(email='other@example.com')
+        
+        responses = [
+            client.get(reverse('user-me')),
+            client.get(reverse('user-list')),
+            client.get(reverse('user-list'), {'domain': 'example.com'}),
+            client.get(reverse('user-detail', kwargs={'pk': other.pk})),
+            client.patch(reverse('user-update-profile'), {'full_name': 'Admin “Quoted”'}, format='json'),
+            client.post(reverse('user-deactivate', kwargs={'pk': other.pk})),
+            client.post(reverse('user-activate', kwargs={'pk': other.pk})),
+            client.get(reverse('user-domains')),
+            client.get(reverse('user-retention'), {'refresh': '1'}),
+            client.post(reverse('user-change-password'), {
+                'old_password': 'TestPass123!@#',
+                'new_password': 'NewPass123!@#',
+            }, format='json'),
+            client.delete(reverse('user-delete-profile-picture')),
+        ]
+        for response in responses:
+            assert_stdlib_compatible(response)
+    
+    def test_statistics(self, admin_client, create_user, monkeypatch):
+        """Test the cached statistics payload matches the stdlib rendering"""
+        client, admin = admin_client
+        create_user(email='stats@example.com')
+        
+        fast = client.get(reverse('user-statistics'), {'refresh': '1'})
+        monkeypatch.setattr(renderers, 'orjson', None)
+        stdlib = client.get(reverse('user-statistics'), {'refresh': '1'})
+        
+        assert fast.content == stdlib.content
+        assert json.loads(fast.content)['total_users'] == 2
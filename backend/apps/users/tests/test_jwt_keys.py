@@ -0,0 +1,151 @@
+from io import StringIO
+import jwt
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework_simplejwt import state
+from rest_framework_simplejwt.backends import TokenBackend
+from rest_framework_simplejwt.tokens import AccessToken
+from apps.users.checks import check_jwt_accept_hs256, check_jwt_keys_dir
+from apps.users.jwt_keys import generate_private_key, install_key_ring_backend, key_ring, reset_key_ring
+
+
+@pytest.fixture
+def key_dir(settings, tmp_path):
+    """Sign tokens with keys from a temporary directory"""
+    settings.JWT_KEYS_DIR = str(tmp_path)
+    settings.JWT_KEY_ACTIVATION_DELAY = 600
+    reset_key_ring()
+    original_backend = state.token_backend
+    install_key_ring_backend()
+    yield tmp_path
+    state.token_backend = original_backend
+    reset_key_ring()
+
+
+def login(api_client, user):
+    """Log in through the API and return the access token"""
+    response = api_client.post(reverse('login'), {'email': user.email, 'password': 'TestPass123!@#'})
+    assert response.status_code == 200
+    return response.data['access']
+
+
+@pytest.mark.django_db
+class TestAsymmetricSigning:
+    """Tests for RS256/EdDSA signing with a published JWKS"""
+
+    def test_tokens_verify_offline_against_jwks(self, api_client, regular_user, key_dir):
+        """Test a downstream service can verify an access token with only the JWKS"""
+        call_command('rotate_jwt_key', '--algorithm', 'EdDSA', stdout=StringIO())
+
+        access = login(api_client, regular_user)
+        jwks = api_client.get(reverse('jwks')).json()
+
+        header = jwt.get_unverified_header(access)
+        assert header['alg'] == 'EdDSA'
+        signing_key = jwt.PyJWKSet.from_dict(jwks)[header['kid']]
+        claims = jwt.decode(access, signing_key.key, algorithms=[header['alg']])
+        assert claims['user_id'] == regular_user.id
+
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        assert api_client.get(reverse('user-me')).status_code == 200
+
+    def test_new_key_published_before_it_signs(self, api_client, regular_user, key_dir, settings):
+        """Test rotation publishes the new key first and old tokens stay valid"""
+        (key_dir / '20240101T000000Z.pem').write_bytes(generate_private_key('RS256'))
+        call_command('rotate_jwt_key', '--algorithm', 'EdDSA', stdout=StringIO())
+        new_kid = max(path.stem for path in key_dir.glob('*.pem'))
+
+        old_access = login(api_client, regular_user)
+        kids = [key['kid'] for key in api_client.get(reverse('jwks')).json()['keys']]
+        assert kids == ['20240101T000000Z', new_kid]
+        assert jwt.get_unverified_header(old_access) == {'alg': 'RS256', 'kid': '20240101T000000Z', 'typ': 'JWT'}
+
+        settings.JWT_KEY_ACTIVATION_DELAY = 0
+        new_access = login(api_client, regular_user)
+
+        assert jwt.get_unverified_header(new_access)['kid'] == new_kid
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {old_access}')
+        assert api_client.get(reverse('user-me')).status_code == 200
+
+    def test_retired_key_rejects_its_tokens(self, api_client, regular_user, key_dir):
+        """Test pruning a key invalidates the tokens it signed"""
+        (key_dir / '20240101T000000Z.pem').write_bytes(generate_private_key('RS256'))
+        old_access = login(api_client, regular_user)
+
+        (key_dir / '20240101T000000Z.pem').unlink()
+        call_command('rotate_jwt_key', stdout=StringIO())
+
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {old_access}')
+        assert api_client.get(reverse('user-me')).status_code == 401
+
+    def test_legacy_hs256_tokens(self, api_client, regular_user, key_dir, settings):
+        """Test HS256 tokens from before the switch are refused unless explicitly accepted"""
+        call_command('rotate_jwt_key', stdout=StringIO())
+        payload = AccessToken.for_user(regular_user).payload
+        payload['token_version'] = regular_user.token_version
+        legacy = TokenBackend('HS256', settings.SECRET_KEY).encode(payload)
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {legacy}')
+
+        assert api_client.get(reverse('user-me')).status_code == 401
+        assert check_jwt_accept_hs256(None) == []
+
+        settings.JWT_ACCEPT_HS256 = True
+        assert api_client.get(reverse('user-me')).status_code == 200
+        assert [warning.id for warning in check_jwt_accept_hs256(None)] == ['users.W002']
+
+
+class TestKeyDirectory:
+    """Tests for which files of JWT_KEYS_DIR count as keys"""
+
+    def test_files_not_named_by_key_id_ignored(self, key_dir):
+        """Test hand-named keys never sign, are never pruned and are flagged"""
+        (key_dir / 'manual.pem').write_bytes(generate_private_key('EdDSA'))
+        (key_dir / '2024011T000000Z.pem').write_bytes(generate_private_key('EdDSA'))
+        (key_dir / '20240101T000000Z.pem').write_bytes(generate_private_key('EdDSA'))
+        (key_dir / '20240102T000000Z.pem').write_bytes(generate_private_key('EdDSA'))
+        call_command('rotate_jwt_key', '--keep', '2', stdout=StringIO())
+        reset_key_ring()
+
+        assert not (key_dir / '20240101T000000Z.pem').exists()
+        assert list(key_ring().keys)[0] == '20240102T000000Z'
+        assert (key_dir / 'manual.pem').exists()
+        assert [error.id for error in check_jwt_keys_dir(None)] == ['users.W001']
+        assert '2024011T000000Z.pem, manual.pem' in check_jwt_keys_dir(None)[0].msg
+
+    def test_missing_directory_reported_by_check(self, key_dir, settings):
+        """Test a missing JWT_KEYS_DIR is a startup error rather than an exception per request"""
+        settings.JWT_KEYS_DIR = str(key_dir / 'missing')
+
+        assert not key_ring().keys
+        assert [error.id for error in check_jwt_keys_dir(None)] == ['users.E001']
+
+        call_command('rotate_jwt_key', stdout=StringIO())
+
+        assert check_jwt_keys_dir(None) == []
+
+
+@pytest.mark.django_db
+class TestJWKSEndpoint:
+    """Tests for the cached /.well-known/jwks.json document"""
+
+    def test_etag_and_cache_headers(self, api_client, key_dir):
+        """Test the JWKS is cacheable and revalidates with 304"""
+        call_command('rotate_jwt_key', '--algorithm', 'RS256', stdout=StringIO())
+
+        response = api_client.get(reverse('jwks'))
+
+        assert response.status_code == 200
+        assert response['Cache-Control'] == 'public, max-age=300'
+        assert response.json()['keys'][0]['kty'] == 'RSA'
+        assert 'd' not in response.json()['keys'][0]
+
+        response = api_client.get(reverse('jwks'), HTTP_IF_NONE_MATCH=response['ETag'])
+
+        assert response.status_code == 304
+
+    def test_empty_without_keys(self, api_client, settings):
+        """Test HS256 deployments publish an empty key set"""
+        settings.JWT_KEYS_DIR = ''
+
+        assert api_client.get(reverse('jwks')).json() == {'keys': []}
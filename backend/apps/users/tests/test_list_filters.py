@@ -0,0 +1,164 @@
+from datetime import timedelta
+import pytest
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+from apps.users.models import User
+from apps.users.serializers import UserListQuerySerializer
+
+
+def list_plan(**params):
+    """SQLite query plan of the first page of the user list for these parameters"""
+    query = UserListQuerySerializer(data=params)
+    query.is_valid(raise_exception=True)
+    return query.filter(User.objects.all()).order_by(*query.order_by)[:10].explain()
+
+
+@pytest.mark.django_db
+class TestUserListFilters:
+    """Tests for filtering and ordering the admin user list"""
+
+    @pytest.fixture
+    def users(self, create_user):
+        """Users spread over creation months, logins, statuses and roles"""
+        now = timezone.now()
+        specs = [
+            ('old-inactive@example.com', User.Status.INACTIVE, User.Role.USER, 60, 50),
+            ('new-inactive@example.com', User.Status.INACTIVE, User.Role.USER, 10, 40),
+            ('new-active@example.com', User.Status.ACTIVE, User.Role.USER, 20, 1),
+            ('new-admin@example.com', User.Status.ACTIVE, User.Role.ADMIN, 5, None),
+        ]
+        created = {}
+        for email, status, role, created_days, login_days in specs:
+            user = create_user(email=email, password=None, status=status, role=role)
+            User.objects.filter(pk=user.pk).update(
+                created_at=now - timedelta(days=created_days),
+                last_login=None if login_days is None else now - timedelta(days=login_days),
+            )
+            created[email.split('@')[0]] = user
+        return created
+
+    def emails(self, response):
+        return [user['email'] for user in response.data['results']]
+
+    def test_inactive_created_in_window_sorted_by_last_login(self, admin_client, users):
+        """Test the filters combine and the ordering is applied"""
+        client, admin = admin_client
+        now = timezone.now()
+
+        response = client.get(reverse('user-list'), {
+            'status': 'INACTIVE',
+            'created_after': (now - timedelta(days=90)).isoformat(),
+            'created_before': now.isoformat(),
+            'ordering': 'last_login',
+        })
+
+        assert response.status_code == 200
+        assert self.emails(response) == ['old-inactive@example.com', 'new-inactive@example.com']
+
+    def test_created_window_is_half_open(self, admin_client, users):
+        """Test created_after is inclusive and created_before exclusive"""
+        client, admin = admin_client
+        cutoff = User.objects.get(email='new-admin@example.com').created_at
+        window = {'created_after': cutoff.isoformat(), 'created_before': (cutoff + timedelta(days=1)).isoformat()}
+
+        after = client.get(reverse('user-list'), window)
+        before = client.get(reverse('user-list'), {'created_before': cutoff.isoformat(), 'role': 'ADMIN'})
+
+        assert self.emails(after) == ['new-admin@example.com']
+        assert self.emails(before) == []
+
+    def test_last_login_before(self, admin_client, users):
+        """Test dormant users are found by last_login, newest login first"""
+        client, admin = admin_client
+        cutoff = timezone.now() - timedelta(days=30)
+
+        response = client.get(reverse('user-list'), {
+            'last_login_before': cutoff.isoformat(), 'ordering': '-last_login',
+        })
+
+        assert self.emails(response) == ['new-inactive@example.com', 'old-inactive@example.com']
+
+    def test_never_logged_in_sort_first_ascending_last_descending(self, admin_client, users):
+        """Test users without last_login sort as if before every login, on any database"""
+        client, admin = admin_client
+
+        ascending = client.get(reverse('user-list'), {'ordering': 'last_login', 'status': 'ACTIVE'})
+        descending = client.get(reverse('user-list'), {'ordering': '-last_login', 'status': 'ACTIVE'})
+
+        never = {'new-admin@example.com', admin.email}
+        assert set(self.emails(ascending)[:2]) == never
+        assert set(self.emails(descending)[-2:]) == never
+        assert self.emails(ascending)[2:] == self.emails(descending)[:-2][::-1]
+
+    def test_default_ordering_newest_first(self, admin_client, users):
+        """Test the list is ordered by creation time, newest first, by default"""
+        client, admin = admin_client
+
+        response = client.get(reverse('user-list'), {'role': 'USER'})
+
+        assert self.emails(response) == [
+            'new-inactive@example.com', 'new-active@example.com', 'old-inactive@example.com',
+        ]
+        assert response.data['count'] == 3
+
+    @pytest.mark.parametrize('params', [
+        {'status': 'DELETED'},
+        {'role': 'owner'},
+        {'created_after': 'last month'},
+        {'ordering': 'password'},
+        {'ordering': 'full_name'},
+        {'created_after': '2024-02-01', 'created_before': '2024-01-01'},
+    ])
+    def test_invalid_parameters_rejected(self, admin_client, params):
+        """Test unknown values and sort keys outside the whitelist return 400"""
+        client, admin = admin_client
+
+        response = client.get(reverse('user-list'), params)
+
+        assert response.status_code == 400
+
+    def test_filters_apply_across_shards(self, admin_client, users, settings):
+        """Test the sharded list merges shards in the requested ordering"""
+        client, admin = admin_client
+        settings.USER_SHARDS = ['default']
+
+        response = client.get(reverse('user-list'), {'ordering': 'last_login', 'role': 'USER'})
+
+        assert self.emails(response) == [
+            'old-inactive@example.com', 'new-inactive@example.com', 'new-active@example.com',
+        ]
+
+
+@pytest.mark.django_db
+@pytest.mark.skipif(connection.vendor != 'sqlite', reason='query plans are checked on SQLite')
+class TestUserListQueryPlans:
+    """Tests that every filter and ordering combination is served by an index"""
+
+    @pytest.mark.parametrize('ordering', list(UserListQuerySerializer.ORDERINGS))
+    @pytest.mark.parametrize('filters', [
+        {},
+        {'status': 'INACTIVE'},
+        {'role': 'ADMIN'},
+        {'status': 'INACTIVE', 'role': 'USER'},
+        {'last_login_before': '2024-01-01T00:00:00Z'},
+    ])
+    def test_page_read_in_index_order(self, filters, ordering):
+        """Test a page is read in index order without sorting the matches"""
+        plan = list_plan(**filters, ordering=ordering)
+
+        assert 'USING INDEX users_' in plan
+        assert 'TEMP B-TREE' not in plan
+
+    @pytest.mark.parametrize('ordering', list(UserListQuerySerializer.ORDERINGS))
+    @pytest.mark.parametrize('filters', [
+        {'created_after': '2024-01-01T00:00:00Z', 'created_before': '2024-02-01T00:00:00Z'},
+        {'status': 'INACTIVE', 'created_after': '2024-01-01T00:00:00Z'},
+        {'role': 'USER', 'created_before': '2024-02-01T00:00:00Z'},
+    ])
+    def test_creation_window_searched_by_index(self, filters, ordering):
+        """Test a creation window is a range search, never a table scan"""
+        plan = list_plan(**filters, ordering=ordering)
+
+        assert 'SEARCH users_user USING INDEX users_' in plan
+        assert 'created_at>' in plan or 'created_at<' in plan
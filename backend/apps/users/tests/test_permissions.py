@@ -0,0 +1,51 @@
+import pytest
+from django.contrib.auth.models import Group, Permission
+from apps.users.models import User
+
+
+@pytest.fixture
+def change_user_perm(db):
+    """The users.change_user permission"""
+    return Permission.objects.get(codename='change_user', content_type__app_label='users')
+
+
+@pytest.mark.django_db
+class TestPermissionCache:
+    """Tests for cached permission resolution"""
+    
+    def test_no_queries_after_warm_up(self, regular_user, change_user_perm, django_assert_num_queries):
+        """Test a fresh user instance resolves permissions from the cache"""
+        regular_user.user_permissions.add(change_user_perm)
+        assert User.objects.get(pk=regular_user.pk).has_perm('users.change_user')
+        
+        user = User.objects.get(pk=regular_user.pk)
+        with django_assert_num_queries(0):
+            assert user.has_perm('users.change_user')
+            assert not user.has_perm('users.delete_user')
+    
+    def test_user_permission_change_invalidates(self, regular_user, change_user_perm):
+        """Test granting a permission is visible on the next check"""
+        assert not User.objects.get(pk=regular_user.pk).has_perm('users.change_user')
+        
+        regular_user.user_permissions.add(change_user_perm)
+        
+        assert User.objects.get(pk=regular_user.pk).has_perm('users.change_user')
+    
+    def test_group_permission_change_invalidates(self, regular_user, change_user_perm):
+        """Test changing a group's permissions reaches its members"""
+        group = Group.objects.create(name='Editors')
+        regular_user.groups.add(group)
+        assert not User.objects.get(pk=regular_user.pk).has_perm('users.change_user')
+        
+        group.permissions.add(change_user_perm)
+        
+        assert User.objects.get(pk=regular_user.pk).has_perm('users.change_user')
+    
+    def test_superuser_change_invalidates(self, regular_user):
+        """Test promoting a user is reflected despite a warm cache"""
+        assert User.objects.get(pk=regular_user.pk).get_all_permissions() == set()
+        
+        regular_user.is_superuser = True
+        regular_user.save()
+        
+        assert 'users.change_user' in User.objects.get(pk=regular_user.pk).get_all_permissions()
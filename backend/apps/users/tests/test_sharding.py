@@ -0,0 +1,253 @@
+import pytest
+from datetime import timedelta
+from django.contrib.auth.models import Group, Permission
+from django.core.management import call_command
+from django.db import connections
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
+from apps.users.analytics import cohort_retention
+from apps.users.archive import ARCHIVED_FIELDS, archive_users, restore_user
+from apps.users.events import metrics_snapshot
+from apps.users.loadtest import seed_loadtest_users
+from apps.users.maintenance import sweep_dormant_users
+from apps.users.models import ArchivedUser, User
+from apps.users.sharding import new_user_id, shard_for_email, shard_for_user_id
+
+SHARD_ALIASES = ['users_shard_0', 'users_shard_1']
+
+
+@pytest.fixture
+def user_shards(db, settings, tmp_path, django_db_blocker):
+    """Spread users across two throwaway SQLite databases"""
+    settings.USER_SHARDS = SHARD_ALIASES
+    for alias in SHARD_ALIASES:
+        connections.settings[alias] = {
+            **connections['default'].settings_dict,
+            'NAME': str(tmp_path / f'{alias}.sqlite3'),
+            'TEST': {'NAME': str(tmp_path / f'{alias}.sqlite3')},
+        }
+        with django_db_blocker.unblock():
+            call_command('migrate', database=alias, run_syncdb=True, verbosity=0)
+    yield SHARD_ALIASES
+    for alias in SHARD_ALIASES:
+        connections[alias].close()
+        del connections[alias]
+        del connections.settings[alias]
+
+
+def shard_emails():
+    """Two emails that hash to different shards"""
+    emails = {}
+    for index in range(100):
+        email = f'user{index}@example.com'
+        emails.setdefault(shard_for_email(email), email)
+        if len(emails) == len(SHARD_ALIASES):
+            return [emails[alias] for alias in SHARD_ALIASES]
+
+
+@pytest.mark.django_db
+class TestUserSharding:
+    """Tests for users spread across several databases"""
+
+    def test_create_user_stores_row_on_hashed_shard(self, user_shards):
+        """Test create_user picks the shard and encodes it in the id"""
+        for email in shard_emails():
+            user = User.objects.create_user(email=email, full_name='Sharded User', password='TestPass123!@#')
+            alias = shard_for_email(email)
+
+            assert user._state.db == alias
+            assert shard_for_user_id(user.pk) == alias
+            assert User.objects.using(alias).filter(pk=user.pk).exists()
+            assert User.objects.get_by_natural_key(email).pk == user.pk
+
+        assert not User.objects.using('default').exists()
+
+    def test_user_ids_fit_javascript_numbers(self, user_shards):
+        """Test ids stay below 2**53 and ids from before sharding map to the first shard"""
+        ids = [new_user_id(alias) for alias in user_shards for _ in range(100)]
+
+        assert len(set(ids)) == len(ids)
+        assert max(ids) < 2 ** 53
+        assert [shard_for_user_id(user_id) for user_id in ids[::100]] == user_shards
+        assert shard_for_user_id(42) == user_shards[0]
+
+    def test_create_user_retries_taken_id(self, user_shards, monkeypatch):
+        """Test an id already issued by another process is drawn again rather than overwritten"""
+        email = shard_emails()[0]
+        existing = User.objects.create_user(email='existing@example.com', full_name='Existing User', password=None)
+        alias = existing._state.db
+        ids = iter([existing.pk, existing.pk + 1])
+        monkeypatch.setattr('apps.users.managers.new_user_id', lambda using: next(ids))
+        monkeypatch.setattr('apps.users.managers.shard_for_email', lambda email: alias)
+
+        user = User.objects.create_user(email=email, full_name='Sharded User', password=None)
+
+        assert user.pk == existing.pk + 1
+        assert User.objects.using(alias).get(pk=existing.pk).email == 'existing@example.com'
+
+    def test_groups_grant_permissions_on_every_shard(self, user_shards, django_capture_on_commit_callbacks):
+        """Test users on any shard join groups kept on the default database"""
+        with django_capture_on_commit_callbacks(execute=True):
+            group = Group.objects.create(name='Support')
+            group.permissions.add(Permission.objects.get(codename='view_user'))
+
+        for email in shard_emails():
+            user = User.objects.create_user(email=email, full_name='Sharded User', password=None)
+            user.groups.add(group)
+            user = User.objects.get_by_natural_key(email)
+
+            assert list(user.groups.values_list('name', flat=True)) == ['Support']
+            assert user.has_perm('users.view_user')
+
+        with django_capture_on_commit_callbacks(execute=True):
+            group.delete()
+
+        for alias in user_shards:
+            assert not Group.objects.using(alias).exists()
+            assert not User.groups.through.objects.using(alias).exists()
+
+    def test_login_and_authenticate_on_shard(self, api_client, user_shards):
+        """Test JWTs carry the shard and authenticate against it"""
+        email = shard_emails()[1]
+        User.objects.create_user(email=email, full_name='Sharded User', password='TestPass123!@#')
+
+        response = api_client.post(reverse('login'), {
+            'email': email,
+            'password': 'TestPass123!@#',
+        })
+
+        assert response.status_code == status.HTTP_200_OK
+        assert AccessToken(response.data['access'])['shard'] == shard_for_email(email)
+
+        api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        response = api_client.get(reverse('user-me'))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['email'] == email
+
+    def test_list_and_statistics_gather_all_shards(self, api_client, user_shards):
+        """Test admin list and statistics merge users from every shard"""
+        first, second = shard_emails()
+        admin = User.objects.create_user(
+            email=first, full_name='Admin User', password='TestPass123!@#', role=User.Role.ADMIN
+        )
+        other = User.objects.create_user(email=second, full_name='Other User', password='TestPass123!@#')
+        api_client.force_authenticate(user=admin)
+
+        response = api_client.get(reverse('user-list'))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['count'] == 2
+        assert {user['email'] for user in response.data['results']} == {first, second}
+
+        response = api_client.get(reverse('user-statistics'), {'refresh': 1})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()['total_users'] == 2
+        assert response.json()['admin_users'] == 1
+        assert response.json()['email_domains'] == [{'domain': 'example.com', 'count': 2}]
+
+        response = api_client.post(reverse('user-deactivate', kwargs={'pk': other.pk}))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert User.objects.using(other._state.db).get(pk=other.pk).status == User.Status.INACTIVE
+
+    def test_list_pages_by_cursor_across_shards(self, api_client, user_shards):
+        """Test next and previous links walk every user exactly once, never-logged-in users first"""
+        admin = User.objects.create_user(
+            email='admin@example.com', full_name='Admin User', password=None, role=User.Role.ADMIN
+        )
+        now = timezone.now()
+        for index in range(24):
+            user = User.objects.create_user(email=f'user{index}@example.com', full_name='Sharded User', password=None)
+            if index % 3:
+                User.objects.using(user._state.db).filter(pk=user.pk).update(last_login=now - timedelta(hours=index))
+        users = [user for alias in user_shards for user in User.objects.using(alias).all()]
+        expected = [user.email for user in sorted(
+            users, key=lambda user: (user.last_login is not None, user.last_login, user.pk)
+        )]
+        api_client.force_authenticate(user=admin)
+
+        pages = []
+        url = reverse('user-list') + '?ordering=last_login'
+        while url:
+            response = api_client.get(url)
+            assert response.status_code == status.HTTP_200_OK
+            assert response.data['count'] == 25
+            pages.append([user['email'] for user in response.data['results']])
+            url = response.data['next']
+
+        assert [len(page) for page in pages] == [10, 10, 5]
+        assert sum(pages, []) == expected
+
+        backwards = []
+        url = response.data['previous']
+        while url:
+            response = api_client.get(url)
+            backwards.insert(0, [user['email'] for user in response.data['results']])
+            url = response.data['previous']
+
+        assert backwards == pages[:-1]
+
+        emails = []
+        url = reverse('user-list') + '?ordering=-last_login'
+        while url:
+            response = api_client.get(url)
+            emails += [user['email'] for user in response.data['results']]
+            url = response.data['next']
+
+        assert emails == expected[::-1]
+
+        response = api_client.get(reverse('user-list'), {'cursor': 'not-a-cursor'})
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_restore_user_onto_its_shard(self, user_shards):
+        """Test a restored user returns to the shard in their id with the signup date kept"""
+        email = shard_emails()[1]
+        user = User.objects.create_user(email=email, full_name='Sharded User', password=None)
+        signed_up = timezone.now() - timedelta(days=400)
+        User.objects.using(user._state.db).filter(pk=user.pk).update(created_at=signed_up)
+        user.refresh_from_db()
+        archived = ArchivedUser.objects.create(
+            group_ids=[], permission_ids=[], **{field: getattr(user, field) for field in ARCHIVED_FIELDS}
+        )
+        User.objects.using(user._state.db).filter(pk=user.pk).delete()
+
+        restored = restore_user(archived)
+
+        assert restored._state.db == user_shards[1]
+        assert User.objects.using(user_shards[1]).get(pk=user.pk).created_at == signed_up
+        assert not User.objects.using('default').exists()
+        assert not ArchivedUser.objects.exists()
+
+    def test_maintenance_jobs_cover_every_shard(self, user_shards):
+        """Test the sweep, archive, retention and metrics see users on all shards"""
+        long_ago = timezone.now() - timedelta(days=400)
+        users = [
+            User.objects.create_user(email=email, full_name='Sharded User', password=None)
+            for email in shard_emails()
+        ]
+        for user in users:
+            User.objects.using(user._state.db).filter(pk=user.pk).update(last_login=long_ago, created_at=long_ago)
+
+        assert metrics_snapshot()['active_users'] == 2
+        assert sum(cohort['size'] for cohort in cohort_retention(months=24)) == 2
+        assert sweep_dormant_users(days=90, batch_size=1) == {'matched': 2, 'batches': 2}
+        assert metrics_snapshot()['inactive_users'] == 2
+
+        assert archive_users(days=365) == 2
+        assert ArchivedUser.objects.count() == 2
+        assert not any(User.objects.using(alias).exists() for alias in user_shards)
+        assert metrics_snapshot()['total_users'] == 2
+
+    def test_loadtest_seed_reuses_users_on_shards(self, user_shards):
+        """Test reseeding finds existing load test users on their shards"""
+        emails, created = seed_loadtest_users(4, 'FirstPass123!@#')
+        _, created_again = seed_loadtest_users(4, 'OtherPass123!@#')
+
+        assert (created, created_again) == (5, 0)
+        user = User.objects.get_by_natural_key(emails[0])
+        assert user.check_password('OtherPass123!@#')
@@ -145,3 +145,99 @@ class TestUserViews:
         response = client.post(url)
         
         assert response.status_code == 403
+    
+    def test_retention_matrix_as_admin(self, admin_client, create_user):
+        """Test admin gets a cohort retention matrix"""
+        client, admin = admin_client
+        create_user(email='cohort@example.com')
+        
+        url = reverse('user-retention')
+        response = client.get(url, {'months': 3, 'refresh': '1'})
+        
+        assert response.status_code == 200
+        assert response.data['months'] == 3
+        cohort = response.data['cohorts'][-1]
+        assert cohort['size'] == 2
+        assert cohort['retention'] == [2]
+        assert cohort['retention_rate'] == [100.0]
+    
+    def test_retention_invalid_months(self, admin_client):
+        """Test retention rejects an out of range months parameter"""
+        client, admin = admin_client
+        
+        response = client.get(reverse('user-retention'), {'months': 'abc'})
+        
+        assert response.status_code == 400
+    
+    def test_regular_user_cannot_view_retention(self, authenticated_client):
+        """Test regular users cannot see retention analytics"""
+        client, user = authenticated_client
+        
+        response = client.get(reverse('user-retention'))
+        
+        assert response.status_code == 403
+    
+    def test_retention_counts_returning_users(self, admin_client, create_user):
+        """Test a user who logs in months after signup is retained in each month"""
+        from datetime import timedelta
+        from django.utils import timezone
+        client, admin = admin_client
+        returning = create_user(email='returning@example.com')
+        signup = timezone.now().replace(day=15) - timedelta(days=62)
+        User.objects.filter(pk=returning.pk).update(created_at=signup, last_login=timezone.now())
+        
+        response = client.get(reverse('user-retention'), {'months': 6, 'refresh': '1'})
+        
+        cohort = response.data['cohorts'][0]
+        assert cohort['size'] == 1
+        assert cohort['retention'] == [1, 1, 1]
+    
+    def test_email_domain_kept_in_sync(self, authenticated_client):
+        """Test email_domain follows email changes made through the API"""
+        client, user = authenticated_client
+        assert user.email_domain == 'example.com'
+        
+        client.patch(reverse('user-update-profile'), {'email': 'moved@Other.ORG'}, format='json')
+        
+        user.refresh_from_db()
+        assert user.email_domain == 'other.org'
+    
+    def test_filter_users_by_domain(self, admin_client, create_user):
+        """Test admin can list users of a single email domain"""
+        client, admin = admin_client
+        create_user(email='one@acme.com')
+        create_user(email='two@acme.com')
+        
+        response = client.get(reverse('user-list'), {'domain': 'ACME.com'})
+        
+        assert response.status_code == 200
+        assert response.data['count'] == 2
+    
+    def test_domain_counts(self, admin_client, create_user):
+        """Test the domain aggregate endpoint groups users by domain"""
+        client, admin = admin_client
+        create_user(email='one@acme.com')
+        create_user(email='two@acme.com')
+        
+        response = client.get(reverse('user-domains'))
+        
+        assert response.status_code == 200
+        assert response.data['domains'][0] == {'domain': 'acme.com', 'count': 2}
+        assert {'domain': 'example.com', 'count': 1} in response.data['domains']
+    
+    def test_statistics_served_precompressed(self, admin_client, create_user, settings):
+        """Test statistics are returned compressed for clients that accept gzip"""
+        import gzip
+        import json
+        settings.COMPRESSION_MIN_SIZE = 0
+        client, admin = admin_client
+        create_user(email='stats@example.com')
+        
+        response = client.get(reverse('user-statistics'), {'refresh': '1'}, HTTP_ACCEPT_ENCODING='gzip')
+        cached = client.get(reverse('user-statistics'), HTTP_ACCEPT_ENCODING='gzip')
+        
+        assert response.status_code == 200
+        assert response['Content-Encoding'] == 'gzip'
+        data = json.loads(gzip.decompress(response.content))
+        assert data['total_users'] == 2
+        assert cached.content == response.content
@@ -1,10 +1,12 @@
 from django.urls import path
-from rest_framework_simplejwt.views import TokenRefreshView
-from apps.users.views import RegisterView, CustomTokenObtainPairView, LogoutView
+from apps.users.views import (
+    RegisterView, EmailAvailableView, CustomTokenObtainPairView, CustomTokenRefreshView, LogoutView,
+)
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
+    path('email-available/', EmailAvailableView.as_view(), name='email-available'),
     path('login/', CustomTokenObtainPairView.as_view(), name='login'),
-    path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('token/refresh/', CustomTokenRefreshView.as_view(), name='token_refresh'),
     path('logout/', LogoutView.as_view(), name='logout'),
 ]
@@ -1,10 +1,14 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from apps.users.views import UserViewSet
+from apps.users.views import ArchivedUserViewSet, MetricsStreamTicketView, MetricsStreamView, UserViewSet
 
 router = DefaultRouter()
+# Registered before the catch-all user routes so 'archived' is not read as a pk
+router.register(r'archived', ArchivedUserViewSet, basename='archived-user')
 router.register(r'', UserViewSet, basename='user')
 
 urlpatterns = [
+    path('statistics/stream/', MetricsStreamView.as_view(), name='user-statistics-stream'),
+    path('statistics/stream/ticket/', MetricsStreamTicketView.as_view(), name='user-statistics-stream-ticket'),
     path('', include(router.urls)),
 ]
@@ -1,23 +1,42 @@
-from rest_framework import viewsets, status
+from rest_framework import serializers, viewsets, status
+from rest_framework.exceptions import ValidationError
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
-from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.throttling import ScopedRateThrottle
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.db.models import Count, Q, F
-from django.db.models.functions import TruncDate, TruncMonth, ExtractWeekDay, ExtractHour
 from django.utils import timezone
-from datetime import timedelta
-from .models import User
+import itertools
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import parse_etags
+from apps.core.compression import precompressed_json_response
+from .analytics import cached_cohort_retention, database_statistics
+from .changefeed import InvalidCursor, decode_cursor, encode_cursor, read_changes, start_position
+from .columnar import user_snapshot
+from .emailfilter import email_available
+from .authentication import MetricsStreamTicket, StreamTicketAuthentication, VersionedJWTAuthentication
+from .events import MetricsStream
+from .jwt_keys import key_ring
+from .archive import RestoreConflict, restore_user
+from .models import ArchivedUser, User
+from .pagination import ShardedCursorPagination
+from .sharding import ShardedSequence, scatter, shard_for_user_id, sharding_enabled, user_databases
 from .serializers import (
     UserRegistrationSerializer,
     UserSerializer,
     UserUpdateSerializer,
+    UserListQuerySerializer,
     ChangePasswordSerializer,
     CustomTokenObtainPairSerializer,
-    ProfilePictureUploadSerializer
+    CustomTokenRefreshSerializer,
+    ProfilePictureUploadSerializer,
+    ArchivedUserSerializer
 )
 from .permissions import IsAdminUser
 
@@ -33,7 +52,7 @@ class RegisterView(APIView):
         user = serializer.save()
         
         # Generate tokens for new user
-        refresh = RefreshToken.for_user(user)
+        refresh = CustomTokenObtainPairSerializer.get_token(user)
         
         return Response({
             'user': UserSerializer(user).data,
@@ -45,11 +64,39 @@ class RegisterView(APIView):
         }, status=status.HTTP_201_CREATED)
 
 
+class EmailAvailableView(APIView):
+    """Cheap availability check of an email for the signup form.
+
+    Throttled per client address, since it tells anyone whether an account exists.
+    """
+    permission_classes = [AllowAny]
+    authentication_classes = []
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = 'email_available'
+    
+    def get(self, request):
+        """Answer from the in-process email filter, confirming possible matches in the database.
+
+        available is null while this process is still building its filter.
+        """
+        field = serializers.EmailField()
+        try:
+            email = field.run_validation(request.query_params.get('email', ''))
+        except ValidationError as e:
+            return Response({'error': e.detail[0]}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'email': email, 'available': email_available(email)})
+
+
 class CustomTokenObtainPairView(TokenObtainPairView):
     """Custom login view with additional user data"""
     serializer_class = CustomTokenObtainPairSerializer
 
 
+class CustomTokenRefreshView(TokenRefreshView):
+    """Token refresh view that honours per-user token revocation"""
+    serializer_class = CustomTokenRefreshSerializer
+
+
 class LogoutView(APIView):
     """API view for user logout"""
     permission_classes = [IsAuthenticated]
@@ -77,23 +124,135 @@ class LogoutView(APIView):
             )
 
 
+class JWKSView(APIView):
+    """Public keys other services use to verify our access tokens offline"""
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    
+    def get(self, request):
+        """Return the JWKS document, or 304 if the caller's copy is current"""
+        ring = key_ring()
+        if ring.etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(ring.jwks, content_type='application/json')
+        response['ETag'] = ring.etag
+        response['Cache-Control'] = f'public, max-age={settings.JWKS_CACHE_MAX_AGE}'
+        return response
+
+
+class MetricsStreamTicketView(APIView):
+    """Admin: Exchange the access token for a ticket opening the metrics stream"""
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    
+    def post(self, request):
+        """Issue a short-lived ?ticket= for the EventSource URL"""
+        ticket = MetricsStreamTicket.for_user(request.user)
+        return Response({
+            'ticket': str(ticket),
+            'expires_in': settings.METRICS_STREAM_TICKET_LIFETIME,
+        }, status=status.HTTP_201_CREATED)
+
+
+class MetricsStreamView(APIView):
+    """Admin: Server-Sent Events stream of live user metrics"""
+    authentication_classes = [VersionedJWTAuthentication, StreamTicketAuthentication]
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    
+    def get(self, request):
+        """Stream a metrics snapshot followed by deltas as users change"""
+        stream = MetricsStream(
+            heartbeat=settings.METRICS_STREAM_HEARTBEAT,
+            max_seconds=settings.METRICS_STREAM_MAX_SECONDS,
+        )
+        # Async iteration under ASGI, a plain generator under WSGI workers
+        content = aiter(stream) if isinstance(request._request, ASGIRequest) else iter(stream)
+        response = StreamingHttpResponse(content, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Stop proxies such as nginx from buffering the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class ArchivedUserViewSet(viewsets.ReadOnlyModelViewSet):
+    """Admin: Browse and restore archived users"""
+    queryset = ArchivedUser.objects.all()
+    serializer_class = ArchivedUserSerializer
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    
+    @action(detail=True, methods=['post'])
+    def restore(self, request, pk=None):
+        """Admin: Move an archived user back into the live table"""
+        archived_user = self.get_object()
+        try:
+            user = restore_user(archived_user)
+        except RestoreConflict as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'message': f'User {user.email} restored successfully',
+            'user': UserSerializer(user, context={'request': request}).data
+        }, status=status.HTTP_200_OK)
+
+
 class UserViewSet(viewsets.ModelViewSet):
     """ViewSet for user operations"""
     queryset = User.objects.all()
     serializer_class = UserSerializer
-    parser_classes = [MultiPartParser, FormParser, JSONParser]
     
     def get_permissions(self):
         """Set permissions based on action"""
-        if self.action in ['list', 'retrieve', 'activate', 'deactivate']:
+        if self.action in ['list', 'retrieve', 'activate', 'deactivate', 'retention', 'domains', 'changes']:
             return [IsAuthenticated(), IsAdminUser()]
         return [IsAuthenticated()]
     
+    @property
+    def paginator(self):
+        """Keyset pagination for the sharded admin list, page numbers otherwise"""
+        if not hasattr(self, '_paginator') and self.action == 'list' and sharding_enabled():
+            self._paginator = ShardedCursorPagination()
+        return super().paginator
+    
     def get_queryset(self):
         """Admins see all users, regular users see only themselves"""
         if self.request.user.is_admin:
-            return User.objects.all()
-        return User.objects.filter(id=self.request.user.id)
+            queryset = User.objects.all()
+            if self.action == 'list':
+                params = UserListQuerySerializer(data=self.request.query_params)
+                params.is_valid(raise_exception=True)
+                queryset = params.filter(queryset)
+                if sharding_enabled():
+                    return ShardedSequence(queryset, params.order_by)
+                queryset = queryset.order_by(*params.order_by)
+            elif sharding_enabled() and 'pk' in self.kwargs:
+                # User ids encode their shard, so detail lookups hit one database
+                try:
+                    queryset = queryset.using(shard_for_user_id(self.kwargs['pk']))
+                except ValueError:
+                    pass
+            return queryset
+        return User.objects.using(self.request.user._state.db).filter(id=self.request.user.id)
+    
+    def _domain_counts(self, using=None):
+        """Users per email domain, most common first"""
+        return (
+            User.objects.using(using).values('email_domain')
+            .annotate(domain=F('email_domain'), count=Count('id'))
+            .values('domain', 'count')
+            .order_by('-count', 'domain')
+        )
+    
+    def _top_domains(self, limit):
+        """Top email domains merged across all user databases"""
+        if not sharding_enabled():
+            return list(self._domain_counts()[:limit])
+        
+        totals = {}
+        for rows in scatter(lambda alias: list(self._domain_counts(alias))):
+            for row in rows:
+                totals[row['domain']] = totals.get(row['domain'], 0) + row['count']
+        ranked = sorted(totals.items(), key=lambda item: (-item[1], item[0]))
+        return [{'domain': domain, 'count': count} for domain, count in ranked[:limit]]
     
     @action(detail=False, methods=['get'])
     def me(self, request):
@@ -130,8 +289,16 @@ class UserViewSet(viewsets.ModelViewSet):
         request.user.set_password(serializer.validated_data['new_password'])
         request.user.save()
         
+        # Log out every other session and hand this one fresh tokens
+        request.user.revoke_tokens()
+        refresh = CustomTokenObtainPairSerializer.get_token(request.user)
+        
         return Response({
-            'message': 'Password updated successfully'
+            'message': 'Password updated successfully',
+            'tokens': {
+                'refresh': str(refresh),
+                'access': str(refresh.access_token),
+            },
         }, status=status.HTTP_200_OK)
     
     @action(detail=False, methods=['post'], parser_classes=[MultiPartParser, FormParser])
@@ -206,6 +373,7 @@ class UserViewSet(viewsets.ModelViewSet):
         user.status = User.Status.INACTIVE
         user.is_active = False
         user.save()
+        user.revoke_tokens()
         
         return Response({
             'message': f'User {user.email} deactivated successfully',
@@ -215,98 +383,149 @@ class UserViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def statistics(self, request):
         """Admin: Get comprehensive user statistics"""
-        now = timezone.now()
-        thirty_days_ago = now - timedelta(days=30)
-        
-        # Basic counts
-        total_users = User.objects.count()
-        active_users = User.objects.filter(status='ACTIVE').count()
-        inactive_users = User.objects.filter(status='INACTIVE').count()
-        admin_users = User.objects.filter(role='ADMIN').count()
-        regular_users = User.objects.filter(role='USER').count()
-        
-        # Recent registrations (last 30 days)
-        recent_registrations = User.objects.filter(
-            created_at__gte=thirty_days_ago
-        ).count()
-        
-        # Growth data (last 30 days, grouped by day)
-        growth_data = list(
-            User.objects.filter(created_at__gte=thirty_days_ago)
-            .annotate(date=TruncDate('created_at'))
-            .values('date')
-            .annotate(count=Count('id'))
-            .order_by('date')
+        # Cached already rendered and compressed, so repeat hits skip both steps
+        return precompressed_json_response(
+            request,
+            key=f'users:statistics:{request.get_host()}',
+            timeout=settings.STATISTICS_CACHE_TIMEOUT,
+            build_data=lambda: self._build_statistics(request),
+            refresh=request.query_params.get('refresh') == '1',
         )
+    
+    def _build_statistics(self, request):
+        """Compute the statistics payload, merging per-shard results"""
+        now = timezone.now()
+        snapshot = user_snapshot()
+        if snapshot is not None:
+            # One columnar snapshot already covers every user database
+            shards = [snapshot.statistics(now)]
+        else:
+            shards = scatter(lambda alias: database_statistics(alias, now))
         
-        # Monthly registrations (last 12 months)
-        twelve_months_ago = now - timedelta(days=365)
-        monthly_data = list(
-            User.objects.filter(created_at__gte=twelve_months_ago)
-            .annotate(month=TruncMonth('created_at'))
-            .values('month')
-            .annotate(count=Count('id'))
-            .order_by('month')
+        # Archived users still count towards the headline totals
+        archived = ArchivedUser.objects.aggregate(
+            total=Count('id'),
+            active=Count('id', filter=Q(status='ACTIVE')),
+            admins=Count('id', filter=Q(role='ADMIN')),
         )
         
-        # Day of week distribution
-        day_of_week_data = list(
-            User.objects.annotate(day_of_week=ExtractWeekDay('created_at'))
-            .values('day_of_week')
-            .annotate(count=Count('id'))
-            .order_by('day_of_week')
-        )
+        def total(key):
+            return sum(shard[key] for shard in shards)
         
-        # Account age distribution
-        account_ages = []
-        for user in User.objects.all():
-            days_old = (now - user.created_at).days
-            if days_old < 30:
-                category = '0-30 days'
-            elif days_old < 90:
-                category = '30-90 days'
-            elif days_old < 180:
-                category = '90-180 days'
-            elif days_old < 365:
-                category = '180-365 days'
-            else:
-                category = '1+ years'
-            account_ages.append(category)
+        def merge_counts(key, field):
+            merged = {}
+            for shard in shards:
+                for row in shard[key]:
+                    merged[row[field]] = merged.get(row[field], 0) + row['count']
+            return [{field: value, 'count': merged[value]} for value in sorted(merged)]
         
         age_distribution = {}
-        for age in account_ages:
-            age_distribution[age] = age_distribution.get(age, 0) + 1
-        
-        # Email domain analysis
-        email_domains = {}
-        for user in User.objects.all():
-            domain = user.email.split('@')[1] if '@' in user.email else 'unknown'
-            email_domains[domain] = email_domains.get(domain, 0) + 1
-        
-        # Sort and get top 10 domains
-        top_domains = sorted(email_domains.items(), key=lambda x: x[1], reverse=True)[:10]
-        
-        # Dormant accounts (no last_login or last login > 30 days ago)
-        dormant_count = User.objects.filter(
-            Q(last_login__isnull=True) | Q(last_login__lt=thirty_days_ago)
-        ).count()
+        for shard in shards:
+            for category, count in shard['age_distribution'].items():
+                age_distribution[category] = age_distribution.get(category, 0) + count
         
         # Recent users (last 10)
-        recent_users = User.objects.order_by('-created_at')[:10]
+        recent_users = sorted(
+            itertools.chain.from_iterable(
+                scatter(lambda alias: list(User.objects.using(alias).order_by('-created_at')[:10]))
+            ),
+            key=lambda user: user.created_at,
+            reverse=True,
+        )[:10]
         recent_users_data = UserSerializer(recent_users, many=True, context={'request': request}).data
         
-        return Response({
-            'total_users': total_users,
-            'active_users': active_users,
-            'inactive_users': inactive_users,
-            'admin_users': admin_users,
-            'regular_users': regular_users,
-            'recent_registrations': recent_registrations,
-            'dormant_accounts': dormant_count,
-            'growth_data': growth_data,
-            'monthly_data': monthly_data,
-            'day_of_week_data': day_of_week_data,
+        return {
+            'total_users': total('total_users') + archived['total'],
+            'active_users': total('active_users') + archived['active'],
+            'inactive_users': total('inactive_users') + archived['total'] - archived['active'],
+            'admin_users': total('admin_users') + archived['admins'],
+            'regular_users': total('regular_users') + archived['total'] - archived['admins'],
+            'recent_registrations': total('recent_registrations'),
+            'dormant_accounts': total('dormant_accounts') + archived['total'],
+            'archived_users': archived['total'],
+            'growth_data': merge_counts('growth_data', 'date'),
+            'monthly_data': merge_counts('monthly_data', 'month'),
+            'day_of_week_data': merge_counts('day_of_week_data', 'day_of_week'),
             'age_distribution': age_distribution,
-            'email_domains': [{'domain': domain, 'count': count} for domain, count in top_domains],
+            # Email domain analysis (top 10, grouped on the indexed email_domain column)
+            'email_domains': self._top_domains(10),
             'recent_users': recent_users_data,
+        }
+    
+    @action(detail=False, methods=['get'])
+    def retention(self, request):
+        """Admin: Monthly signup cohort retention matrix"""
+        try:
+            months = int(request.query_params.get('months', 12))
+        except ValueError:
+            months = 0
+        if not 1 <= months <= 36:
+            return Response(
+                {'error': 'months must be an integer between 1 and 36'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        snapshot = cached_cohort_retention(
+            months=months,
+            timeout=settings.RETENTION_CACHE_TIMEOUT,
+            refresh=request.query_params.get('refresh') == '1',
+        )
+        return Response(snapshot, status=status.HTTP_200_OK)
+    
+    @action(detail=False, methods=['get'])
+    def domains(self, request):
+        """Admin: User counts per email domain"""
+        try:
+            limit = int(request.query_params.get('limit', 50))
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= 500:
+            return Response(
+                {'error': 'limit must be an integer between 1 and 500'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response({
+            'domains': self._top_domains(limit),
+        }, status=status.HTTP_200_OK)
+    
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """Admin: Users changed or deleted after a cursor, oldest first"""
+        try:
+            limit = int(request.query_params.get('limit', 100))
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= 1000:
+            return Response(
+                {'error': 'limit must be an integer between 1 and 1000'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        cursor = request.query_params.get('cursor')
+        updated_since = request.query_params.get('updated_since')
+        try:
+            if cursor:
+                position = decode_cursor(cursor)
+            elif updated_since:
+                position = start_position(updated_since)
+            else:
+                position = None
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        changes, position, has_more = read_changes(position, limit)
+        context = {'request': request}
+        return Response({
+            'changes': [
+                {
+                    'op': op,
+                    'id': pk,
+                    'changed_at': changed_at,
+                    'user': UserSerializer(user, context=context).data if user else None,
+                }
+                for op, changed_at, pk, user in changes
+            ],
+            'next_cursor': encode_cursor(*position) if position else None,
+            'has_more': has_more,
         }, status=status.HTTP_200_OK)
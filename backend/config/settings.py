@@ -3,10 +3,12 @@ Django settings for User Management System project.
 """
 
 import os
+import tempfile
 from pathlib import Path
 from datetime import timedelta
 from decouple import config
 import dj_database_url
+from corsheaders.defaults import default_headers
 
 # Build paths inside the project
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -32,6 +34,7 @@ INSTALLED_APPS = [
     'corsheaders',
     
     # Local apps
+    'apps.core',
     'apps.users',
 ]
 
@@ -39,13 +42,27 @@ MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'corsheaders.middleware.CorsMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'apps.core.middleware.CompressionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'apps.core.middleware.PathMiddlewareDispatcher',
+    'apps.core.middleware.ProfilingMiddleware',
+]
+
+# Middleware only the admin and other browser pages need. PathMiddlewareDispatcher
+# runs it for every path except LEAN_MIDDLEWARE_PREFIXES, whose JWT-authenticated
+# views use no sessions, cookie-based CSRF or messages
+ADMIN_MIDDLEWARE = [
+    'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
+LEAN_MIDDLEWARE_PREFIXES = ('/api/', '/.well-known/')
+
+# The admin and security checks only look in MIDDLEWARE; core.E001 checks
+# MIDDLEWARE and ADMIN_MIDDLEWARE together instead
+SILENCED_SYSTEM_CHECKS = ['admin.E408', 'admin.E409', 'admin.E410', 'security.W002', 'security.W003']
 
 ROOT_URLCONF = 'config.urls'
 
@@ -76,9 +93,68 @@ DATABASES = {
     )
 }
 
+# Optional hash sharding of the User table: one database URL per shard.
+# Leave empty to keep every user in the default database.
+USER_SHARDS = []
+for index, url in enumerate(filter(None, config('USER_SHARD_DATABASE_URLS', default='').split(','))):
+    alias = f'users_shard_{index}'
+    DATABASES[alias] = dj_database_url.parse(url.strip(), conn_max_age=600, conn_health_checks=True)
+    USER_SHARDS.append(alias)
+
+DATABASE_ROUTERS = ['apps.users.sharding.UserShardRouter']
+
+# SQLite connection profile (see apps.core.sqlite): 'tuned' switches to WAL
+# journaling, synchronous=NORMAL, mmap, a larger page cache and BEGIN
+# IMMEDIATE transactions on every new connection; 'default' keeps SQLite's
+# own settings. The busy timeout default matches Python's sqlite3 (5 s).
+SQLITE_PROFILE = config('SQLITE_PROFILE', default='tuned')
+SQLITE_BUSY_TIMEOUT_MS = config('SQLITE_BUSY_TIMEOUT_MS', default=5000, cast=int)
+SQLITE_MMAP_SIZE = config('SQLITE_MMAP_SIZE', default=256 * 1024 * 1024, cast=int)
+SQLITE_CACHE_SIZE_KB = config('SQLITE_CACHE_SIZE_KB', default=64 * 1024, cast=int)
+
+# Caches: a per-process LRU (L1) in front of a cache shared by all workers
+# (L2, see apps.core.cache). CACHE_URL picks the L2: redis://host:6379/0,
+# file:///path/to/dir, db://table_name (run createcachetable) or locmem://
+CACHE_URL = config('CACHE_URL', default='file://' + os.path.join(tempfile.gettempdir(), 'user-management-cache'))
+
+
+def shared_cache(url):
+    """CACHES entry for a CACHE_URL"""
+    scheme, _, location = url.partition('://')
+    if scheme in ('redis', 'rediss'):
+        return {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': url}
+    if scheme == 'file':
+        return {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}
+    if scheme == 'db':
+        return {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': location}
+    if scheme == 'locmem':
+        return {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': location}
+    raise ValueError(f'Unsupported CACHE_URL scheme: {scheme}')
+
+
+CACHES = {
+    'default': {
+        'BACKEND': 'apps.core.cache.TieredCache',
+        'LOCATION': 'default',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'L1_MAX_ENTRIES': config('CACHE_L1_MAX_ENTRIES', default=1000, cast=int),
+            # Staleness bound for keys changed by another process
+            'L1_TIMEOUT': config('CACHE_L1_TIMEOUT', default=5, cast=int),
+        },
+    },
+    'shared': shared_cache(CACHE_URL),
+}
+
 # Custom User Model
 AUTH_USER_MODEL = 'users.User'
 
+# Authentication backends (permission sets are cached in the shared cache)
+AUTHENTICATION_BACKENDS = [
+    'apps.users.backends.CachedModelBackend',
+]
+PERMISSION_CACHE_TIMEOUT = config('PERMISSION_CACHE_TIMEOUT', default=3600, cast=int)
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -98,13 +174,18 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
-# Password hashers (Argon2 first for security)
+# Password hashers (Argon2 first for security). The calibrated hashers take
+# their cost from the settings below; tune them with `manage.py calibrate_hashers`.
 PASSWORD_HASHERS = [
-    'django.contrib.auth.hashers.Argon2PasswordHasher',
-    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'apps.users.hashers.CalibratedArgon2PasswordHasher',
+    'apps.users.hashers.CalibratedPBKDF2PasswordHasher',
     'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
     'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
 ]
+ARGON2_TIME_COST = config('ARGON2_TIME_COST', default=2, cast=int)
+ARGON2_MEMORY_COST = config('ARGON2_MEMORY_COST', default=102400, cast=int)  # KiB
+ARGON2_PARALLELISM = config('ARGON2_PARALLELISM', default=8, cast=int)
+PBKDF2_ITERATIONS = config('PBKDF2_ITERATIONS', default=720000, cast=int)
 
 # Internationalization
 LANGUAGE_CODE = 'en-us'
@@ -131,14 +212,32 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Django REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.users.authentication.VersionedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # Fast orjson-backed JSON (falls back to the stdlib when orjson is missing);
+    # use rest_framework.renderers.JSONRenderer / parsers.JSONParser to opt out
+    'DEFAULT_RENDERER_CLASSES': (
+        'apps.core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'apps.core.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
     'EXCEPTION_HANDLER': 'rest_framework.views.exception_handler',
+    # Per-client limits of views with a throttle_scope (counted in the default cache)
+    'DEFAULT_THROTTLE_RATES': {
+        'email_available': config('EMAIL_AVAILABLE_THROTTLE_RATE', default='20/minute'),
+    },
+    # Reverse proxies in front of the app (e.g. 1 on Render), so throttling
+    # keys on the client address they append to X-Forwarded-For
+    'NUM_PROXIES': config('NUM_PROXIES', default='', cast=lambda value: int(value) if value else None),
 }
 
 # Simple JWT Settings
@@ -147,7 +246,8 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
-    'UPDATE_LAST_LOGIN': True,
+    # last_login is stamped by CustomTokenObtainPairSerializer with a single UPDATE
+    'UPDATE_LAST_LOGIN': False,
     
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': SECRET_KEY,
@@ -158,12 +258,117 @@ SIMPLE_JWT = {
     'USER_ID_CLAIM': 'user_id',
 }
 
+# Asymmetric JWT signing: a directory of <kid>.pem RSA or Ed25519 private keys
+# (see `manage.py rotate_jwt_key`). Unset keeps HS256 with SECRET_KEY.
+JWT_KEYS_DIR = config('JWT_KEYS_DIR', default='')
+# Seconds a new key is published in the JWKS before tokens are signed with it;
+# keep it above JWKS_CACHE_MAX_AGE so verifiers have refreshed by then
+JWT_KEY_ACTIVATION_DELAY = config('JWT_KEY_ACTIVATION_DELAY', default=600, cast=int)
+# Also accept HS256 tokens signed with SECRET_KEY, only while switching to
+# asymmetric keys: those tokens cannot be rotated out, so turn it back off
+# once REFRESH_TOKEN_LIFETIME has passed (flagged by the users.W002 check)
+JWT_ACCEPT_HS256 = config('JWT_ACCEPT_HS256', default=False, cast=bool)
+JWKS_CACHE_MAX_AGE = config('JWKS_CACHE_MAX_AGE', default=300, cast=int)
+
+# Response compression for API JSON (Brotli is used when installed, else gzip)
+COMPRESSION_PATH_PREFIXES = ('/api/',)
+COMPRESSION_CONTENT_TYPES = ('application/json',)
+COMPRESSION_MIN_SIZE = config('COMPRESSION_MIN_SIZE', default=1024, cast=int)
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 5
+
+# Seconds the precompressed statistics payload is served from cache (0 disables caching)
+STATISTICS_CACHE_TIMEOUT = config('STATISTICS_CACHE_TIMEOUT', default=60, cast=int)
+
+# Live metrics stream: seconds between keepalives, and before the stream closes
+# so WSGI workers are released (the dashboard then reconnects). Keep the
+# maximum below gunicorn's worker timeout (30s by default), which would
+# otherwise kill sync workers mid-stream
+METRICS_STREAM_HEARTBEAT = 15
+METRICS_STREAM_MAX_SECONDS = config('METRICS_STREAM_MAX_SECONDS', default=25, cast=int)
+# Seconds a ?ticket= for opening the stream stays valid; clients fetch a new
+# one for every (re)connection instead of putting the access token in the URL
+METRICS_STREAM_TICKET_LIFETIME = config('METRICS_STREAM_TICKET_LIFETIME', default=30, cast=int)
+
+# Inactive users idle for this many days are moved to the archive table
+ARCHIVE_AFTER_DAYS = config('ARCHIVE_AFTER_DAYS', default=365, cast=int)
+
+# Change feed (/api/users/changes/): seconds changes are held back so that
+# late-committing transactions cannot slip behind a consumer's cursor
+CHANGE_FEED_LAG_SECONDS = config('CHANGE_FEED_LAG_SECONDS', default=5, cast=int)
+
+# Email availability check (/api/auth/email-available/): per-process Bloom
+# filter of taken emails, topped up from recently updated users every
+# EMAIL_FILTER_REFRESH seconds and rebuilt every EMAIL_FILTER_REBUILD seconds
+EMAIL_FILTER_ERROR_RATE = config('EMAIL_FILTER_ERROR_RATE', default=0.01, cast=float)
+EMAIL_FILTER_REFRESH = config('EMAIL_FILTER_REFRESH', default=30, cast=int)
+EMAIL_FILTER_REBUILD = config('EMAIL_FILTER_REBUILD', default=3600, cast=int)
+
+# Optional columnar snapshot for the statistics endpoint (needs NumPy): a
+# directory of memory-mapped column files shared by the workers of a host.
+# Empty computes statistics with ORM queries. The snapshot is refreshed
+# incrementally once older than ANALYTICS_SNAPSHOT_MAX_AGE seconds.
+ANALYTICS_SNAPSHOT_DIR = config('ANALYTICS_SNAPSHOT_DIR', default='')
+ANALYTICS_SNAPSHOT_MAX_AGE = config('ANALYTICS_SNAPSHOT_MAX_AGE', default=60, cast=int)
+
+# Batch endpoint (/api/batch/). The auth routes stay out: one batch could
+# otherwise carry a burst of login, registration or email lookup attempts
+BATCH_MAX_REQUESTS = 20
+BATCH_MAX_WORKERS = 4
+BATCH_ALLOWED_PATH_PREFIXES = ('/api/users/',)
+
+# Seconds a cohort retention snapshot is served from cache (0 disables caching)
+RETENTION_CACHE_TIMEOUT = config('RETENTION_CACHE_TIMEOUT', default=300, cast=int)
+
+# Request profiling: admins send "X-Profile: 1" to profile a request, and a
+# random fraction of requests is profiled as well (0 disables sampling)
+PROFILING_ENABLED = config('PROFILING_ENABLED', default=True, cast=bool)
+PROFILING_HEADER = 'HTTP_X_PROFILE'
+PROFILING_SAMPLE_RATE = config('PROFILING_SAMPLE_RATE', default=0.0, cast=float)
+PROFILING_PATH_PREFIXES = ('/api/',)
+PROFILING_INTERVAL = 0.005
+PROFILING_MAX_PROFILES = config('PROFILING_MAX_PROFILES', default=200, cast=int)
+
+# Slow-query log: statements at or above the threshold are aggregated by
+# fingerprint with an EXPLAIN plan (0, the default, disables it; 200 is a
+# reasonable threshold while investigating). EXPLAIN ANALYZE re-runs the
+# SELECT on PostgreSQL, so it is off unless explicitly enabled. Bound
+# parameters hold emails and password hashes, so they are only stored with
+# SLOW_QUERY_CAPTURE_PARAMS on.
+SLOW_QUERY_THRESHOLD_MS = config('SLOW_QUERY_THRESHOLD_MS', default=0, cast=float)
+SLOW_QUERY_EXPLAIN = True
+SLOW_QUERY_EXPLAIN_ANALYZE = config('SLOW_QUERY_EXPLAIN_ANALYZE', default=False, cast=bool)
+SLOW_QUERY_CAPTURE_PARAMS = config('SLOW_QUERY_CAPTURE_PARAMS', default=False, cast=bool)
+SLOW_QUERY_MAX_SQL_LENGTH = 5000
+
+# Background task queue: jobs are stored in core.Task and run by
+# `manage.py runworker`. TASKS_EAGER runs them inline after commit instead
+# (handy for local development without a worker).
+TASKS_EAGER = config('TASKS_EAGER', default=False, cast=bool)
+# Queues run inline after commit even with TASKS_EAGER off. 'media' jobs read
+# and write MEDIA_ROOT, which is on the web instance's local disk that a
+# separate worker cannot see; set this empty once media is on shared storage.
+TASKS_EAGER_QUEUES = list(filter(None, config('TASKS_EAGER_QUEUES', default='media').split(',')))
+# Seconds before the first retry of a failed job, doubled per attempt
+TASK_RETRY_BACKOFF = config('TASK_RETRY_BACKOFF', default=10, cast=int)
+TASK_RETRY_BACKOFF_MAX = 3600
+# Seconds after which a running job of a lost worker is retried. Workers
+# refresh the lock of their running jobs every TASK_HEARTBEAT_INTERVAL
+# seconds, so long jobs are not mistaken for lost ones; keep it well below
+# the timeout (checked as core.E003)
+TASK_LOCK_TIMEOUT = config('TASK_LOCK_TIMEOUT', default=900, cast=int)
+TASK_HEARTBEAT_INTERVAL = config('TASK_HEARTBEAT_INTERVAL', default=60, cast=int)
+TASK_HOUSEKEEPING_INTERVAL = 60
+TASK_SUCCEEDED_TTL_HOURS = config('TASK_SUCCEEDED_TTL_HOURS', default=24, cast=int)
+
 # CORS Settings
 CORS_ALLOWED_ORIGINS = config(
     'CORS_ALLOWED_ORIGINS',
     default='http://localhost:3000,http://localhost:5173'
 ).split(',')
 CORS_ALLOW_CREDENTIALS = True
+CORS_ALLOW_HEADERS = (*default_headers, 'x-profile')
+CORS_EXPOSE_HEADERS = ['X-Profile-Id']
 
 # Security settings for production
 if not DEBUG:
@@ -5,11 +5,17 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from apps.core.views import BatchView, CacheStatsView
+from apps.users.views import JWKSView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('.well-known/jwks.json', JWKSView.as_view(), name='jwks'),
     path('api/auth/', include('apps.users.urls.auth_urls')),
     path('api/users/', include('apps.users.urls.user_urls')),
+    path('api/batch/', BatchView.as_view(), name='batch'),
+    path('api/cache/stats/', CacheStatsView.as_view(), name='cache-stats'),
+    path('api/profiles/', include('apps.core.urls')),
 ]
 
 # Serve media files in development
@@ -0,0 +1,18 @@
+import pytest
+from django.conf import settings
+from django.core.cache import cache
+
+
+def pytest_configure(config):
+    """Keep tests off the cache CACHE_URL points at, e.g. a running dev server's or a shared redis"""
+    settings.CACHES['shared'] = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tests-shared',
+    }
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Keep entries cached by one test (or an earlier run) out of the next"""
+    cache.clear()
+    yield
@@ -10,6 +10,8 @@ export default function AdminDashboard() {
   const [users, setUsers] = useState([]);
   const [loading, setLoading] = useState(true);
   const [currentPage, setCurrentPage] = useState(1);
+  const [pageUrl, setPageUrl] = useState('/users/');
+  const [links, setLinks] = useState({ next: null, previous: null });
   const [totalPages, setTotalPages] = useState(1);
   const [totalCount, setTotalCount] = useState(0);
   const [selectedUser, setSelectedUser] = useState(null);
@@ -18,14 +20,15 @@ export default function AdminDashboard() {
   const [actionLoading, setActionLoading] = useState(false);
 
   useEffect(() => {
-    fetchUsers(currentPage);
-  }, [currentPage]);
+    fetchUsers(pageUrl);
+  }, [pageUrl]);
 
-  const fetchUsers = async (page) => {
+  const fetchUsers = async (url) => {
     setLoading(true);
     try {
-      const data = await userService.getAllUsers(page);
+      const data = await userService.getAllUsers(url);
       setUsers(data.results);
+      setLinks({ next: data.next, previous: data.previous });
       setTotalCount(data.count);
       setTotalPages(Math.ceil(data.count / 10));
     } catch (error) {
@@ -53,7 +56,7 @@ export default function AdminDashboard() {
       }
       
       // Refresh users list
-      await fetchUsers(currentPage);
+      await fetchUsers(pageUrl);
       setShowModal(false);
     } catch (error) {
       const errorMessage = error.response?.data?.error || 
@@ -207,8 +210,11 @@ export default function AdminDashboard() {
         <div className="mt-6 flex justify-center items-center space-x-4">
           <Button
             variant="secondary"
-            onClick={() => setCurrentPage(prev => Math.max(1, prev - 1))}
-            disabled={currentPage === 1}
+            onClick={() => {
+              setCurrentPage(prev => Math.max(1, prev - 1));
+              setPageUrl(links.previous);
+            }}
+            disabled={!links.previous}
           >
             Previous
           </Button>
@@ -219,8 +225,11 @@ export default function AdminDashboard() {
           
           <Button
             variant="secondary"
-            onClick={() => setCurrentPage(prev => Math.min(totalPages, prev + 1))}
-            disabled={currentPage === totalPages}
+            onClick={() => {
+              setCurrentPage(prev => Math.min(totalPages, prev + 1));
+              setPageUrl(links.next);
+            }}
+            disabled={!links.next}
           >
             Next
           </Button>
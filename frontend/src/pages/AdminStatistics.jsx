@@ -16,6 +16,9 @@ const COLORS = ['#3B82F6', '#10B981', '#F59E0B', '#EF4444', '#8B5CF6', '#EC4899'
 
 const DAY_NAMES = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday'];
 
+// Counters kept current by the live metrics stream
+const LIVE_FIELDS = ['total_users', 'active_users', 'inactive_users'];
+
 export default function AdminStatistics() {
   const [statistics, setStatistics] = useState(null);
   const [loading, setLoading] = useState(true);
@@ -29,7 +32,9 @@ export default function AdminStatistics() {
     }
 
     try {
-      const { data } = await api.get('/users/statistics/');
+      const { data } = await api.get('/users/statistics/', {
+        params: showRefreshing ? { refresh: 1 } : {},
+      });
       setStatistics(data);
       if (showRefreshing) {
         toast.success('Statistics refreshed');
@@ -47,6 +52,63 @@ export default function AdminStatistics() {
     fetchStatistics();
   }, []);
 
+  // Apply live deltas pushed by the server instead of polling
+  useEffect(() => {
+    let source = null;
+    let retryTimer = null;
+    let closed = false;
+
+    const listen = (events) => {
+      events.addEventListener('snapshot', (event) => {
+        const snapshot = JSON.parse(event.data);
+        setStatistics((prev) => (prev ? { ...prev, ...snapshot } : prev));
+      });
+
+      events.addEventListener('delta', (event) => {
+        const delta = JSON.parse(event.data);
+        setStatistics((prev) => {
+          if (!prev) return prev;
+          const next = { ...prev };
+          LIVE_FIELDS.forEach((field) => {
+            if (delta[field]) next[field] += delta[field];
+          });
+          if (delta.registrations) next.recent_registrations += delta.registrations;
+          return next;
+        });
+      });
+    };
+
+    // Every connection opens with a fresh short-lived ticket, so the access
+    // token itself never appears in a URL
+    const connect = async () => {
+      let ticket;
+      try {
+        ({ data: { ticket } } = await api.post('/users/statistics/stream/ticket/'));
+      } catch (error) {
+        console.error('Metrics stream error:', error);
+        return;
+      }
+      if (closed) return;
+
+      source = new EventSource(
+        `${api.defaults.baseURL}/users/statistics/stream/?ticket=${encodeURIComponent(ticket)}`
+      );
+      listen(source);
+      // The server ends the stream periodically; reconnect with a new ticket
+      source.onerror = () => {
+        source.close();
+        if (!closed) retryTimer = setTimeout(connect, 5000);
+      };
+    };
+
+    connect();
+    return () => {
+      closed = true;
+      clearTimeout(retryTimer);
+      if (source) source.close();
+    };
+  }, []);
+
   if (loading) {
     return (
       <div className="min-h-screen bg-gray-50 flex items-center justify-center">
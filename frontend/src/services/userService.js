@@ -1,8 +1,9 @@
 import api from './api';
 
 export const userService = {
-  getAllUsers: async (page = 1) => {
-    const { data } = await api.get(`/users/?page=${page}`);
+  // Pass the next/previous link of an earlier response to move between pages
+  getAllUsers: async (pageUrl = '/users/') => {
+    const { data } = await api.get(pageUrl);
     return data;
   },
 
@@ -28,6 +29,11 @@ export const userService = {
 
   changePassword: async (passwordData) => {
     const { data } = await api.post('/users/change_password/', passwordData);
+    // Other sessions are revoked server-side; keep this one with the new tokens
+    if (data.tokens) {
+      localStorage.setItem('access_token', data.tokens.access);
+      localStorage.setItem('refresh_token', data.tokens.refresh);
+    }
     return data;
   },
 